@@ -0,0 +1,247 @@
+# =============================================================
+# marketplace/accounts.py
+#
+# Запуск скиллов WB и Ozon сразу для многих кабинетов продавца:
+#   ✔ кабинеты обрабатываются параллельно, не больше max_concurrency
+#     одновременно — медленный кабинет не держит остальные
+#   ✔ один HTTP-клиент на маркетплейс, лимиты — на токен кабинета:
+#     кабинеты не делят лимиты, а два конфига с одним токеном — делят
+#   ✔ ошибка кабинета не валит остальные
+#   ✔ общий результат с временем по каждому кабинету
+#   ✔ {account} в путях хранилищ заменяется именем кабинета; общий для
+#     нескольких кабинетов путь — ошибка конфигурации
+#
+# Файл кабинетов (JSON или YAML):
+#   {
+#     "max_concurrency": 8,
+#     "wb":   {"http": {...}},            # настройки общих клиентов
+#     "ozon": {"http": {...}},
+#     "defaults": {"telegram": {...},     # общее для всех кабинетов
+#                  "finance": {"store_path": "data/{account}/finance.sqlite"}},
+#     "accounts": [
+#       {"name": "shop-1", "wb": {"enabled": true, "WB_API_TOKEN": {...}}},
+#       {"name": "shop-2", "ozon": {"client_id": "...", "api_key": "..."}}
+#     ]
+#   }
+#
+# Запуск из корня репозитория:
+#   python -m marketplace.accounts accounts.json --from 2026-10-01 --to 2026-10-07
+# =============================================================
+
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Пути хранилищ кабинета (секция, ключ): данные в них у каждого кабинета свои
+STORE_PATHS = (
+    ("analytics", "store_path"),
+    ("analytics", "cache_path"),
+    ("analytics", "cube_path"),
+    ("finance", "store_path"),
+    ("finance", "ledger_path"),
+    ("finance", "aggregates_path"),
+    ("warehouse", "index_path"),
+    ("answers", "checkpoint_path"),
+)
+
+
+# =============================================================
+# ОДИН КАБИНЕТ
+# =============================================================
+
+def account_name(account: dict, index: int) -> str:
+    return str(account.get("name") or f"account-{index + 1}")
+
+
+def account_config(defaults: dict, account: dict, name: str) -> dict:
+    """
+    Конфиг кабинета: defaults + настройки кабинета (секции верхнего уровня
+    заменяются целиком), {account} в путях хранилищ — имя кабинета.
+    """
+    config = {**defaults, **account, "name": name}
+    for section, key in STORE_PATHS:
+        path = config.get(section, {}).get(key)
+        if isinstance(path, str) and "{account}" in path:
+            config[section] = {**config[section], key: path.replace("{account}", name)}
+    return config
+
+
+def check_store_paths(configs: list[dict]) -> None:
+    """
+    Два кабинета с одним хранилищем смешали бы данные (курсоры, журнал,
+    агрегаты) — такой конфиг отклоняется до запуска.
+    """
+    for section, key in STORE_PATHS:
+        owners = {}
+        for config in configs:
+            path = config.get(section, {}).get(key)
+            if not path:
+                continue
+            if path in owners:
+                raise ValueError(
+                    f"{section}.{key} = {path!r} общий у кабинетов {owners[path]} и {config['name']} — "
+                    f"добавьте {{account}} в путь"
+                )
+            owners[path] = config["name"]
+
+
+def account_marketplaces(account: dict) -> list[str]:
+    """
+    Маркетплейсы кабинета: по наличию секций "wb" / "ozon"
+    (WB можно выключить флагом enabled=false, как в run_wb_skill).
+    """
+    marketplaces = []
+    if account.get("wb") and account["wb"].get("enabled", True):
+        marketplaces.append("wb")
+    if account.get("ozon"):
+        marketplaces.append("ozon")
+    return marketplaces
+
+
+def run_account(account: dict, date_from: str | None, date_to: str | None) -> dict:
+    """
+    Все скиллы одного кабинета. Время — по маркетплейсам и общее.
+    """
+    result = {}
+    errors = {}
+    timing = {}
+    start = time.perf_counter()
+
+    for marketplace in account_marketplaces(account):
+        mp_start = time.perf_counter()
+        try:
+            if marketplace == "wb":
+                from wb.main import run_wb_skill
+                result["wb"] = run_wb_skill(account, date_from, date_to, configure_http=False)
+            else:
+                from ozon.main import run_ozon_skill
+                result["ozon"] = run_ozon_skill(account, date_from, date_to, configure_http=False)
+        except Exception as e:
+            logger.exception(f"[accounts] {account.get('name')}: {marketplace} — ошибка")
+            errors[marketplace] = f"{type(e).__name__}: {e}"
+        timing[f"{marketplace}_seconds"] = round(time.perf_counter() - mp_start, 3)
+
+    timing["seconds"] = round(time.perf_counter() - start, 3)
+    result["_timing"] = timing
+    if errors:
+        result["_errors"] = errors
+    return result
+
+
+# =============================================================
+# ВСЕ КАБИНЕТЫ
+# =============================================================
+
+def configure_clients(settings: dict) -> None:
+    """
+    Общие HTTP-клиенты настраиваются один раз до запуска кабинетов.
+    """
+    if settings.get("wb", {}).get("http"):
+        from wb.client import configure_client
+        configure_client(settings)
+    if settings.get("ozon", {}).get("http"):
+        from ozon.client import configure_client
+        configure_client(settings)
+
+
+def http_stats() -> dict:
+    stats = {}
+    try:
+        from wb.client import get_client
+        stats["wb"] = get_client().stats()["total"]
+    except ImportError:
+        pass
+    try:
+        from ozon.client import get_client
+        stats["ozon"] = get_client().stats()["total"]
+    except ImportError:
+        pass
+    return stats
+
+
+def run_accounts(settings: dict, date_from: str | None = None, date_to: str | None = None) -> dict:
+    """
+    Запускает скиллы для всех кабинетов из settings["accounts"].
+
+    Возвращает:
+        {"accounts": {имя: {"wb": ..., "ozon": ..., "_timing": ..., "_errors": ...}},
+         "_summary": {"accounts", "failed", "wall_seconds", "sum_seconds", "slowest", "http"}}
+    """
+    accounts = settings.get("accounts", [])
+    defaults = settings.get("defaults", {})
+    max_concurrency = settings.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+
+    configure_clients(settings)
+
+    names = [account_name(account, i) for i, account in enumerate(accounts)]
+    if len(set(names)) != len(names):
+        raise ValueError("Имена кабинетов (name) должны быть уникальны")
+
+    configs = [account_config(defaults, account, name) for name, account in zip(names, accounts)]
+    check_store_paths(configs)
+
+    done = 0
+    done_lock = threading.Lock()
+
+    def run(name: str, config: dict) -> dict:
+        nonlocal done
+        result = run_account(config, date_from, date_to)
+        with done_lock:
+            done += 1
+            logger.info(f"[accounts] {name}: {result['_timing']['seconds']:.1f} с ({done}/{len(accounts)})")
+        return result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(accounts) or 1)),
+                            thread_name_prefix="account") as pool:
+        futures = {name: pool.submit(run, name, config) for name, config in zip(names, configs)}
+        results = {name: future.result() for name, future in futures.items()}
+    wall = time.perf_counter() - start
+
+    timings = {name: r["_timing"]["seconds"] for name, r in results.items()}
+    summary = {
+        "accounts": len(results),
+        "failed": [name for name, r in results.items() if r.get("_errors")],
+        "wall_seconds": round(wall, 3),
+        "sum_seconds": round(sum(timings.values()), 3),
+        "slowest": sorted(timings.items(), key=lambda item: item[1], reverse=True)[:5],
+        "http": http_stats(),
+    }
+
+    return {"accounts": results, "_summary": summary}
+
+
+# =============================================================
+# ЗАПУСК
+# =============================================================
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Скиллы WB и Ozon для многих кабинетов")
+    parser.add_argument("accounts", help="файл кабинетов (JSON или YAML)")
+    parser.add_argument("--from", dest="date_from", help="начало периода, YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="конец периода, YYYY-MM-DD")
+    parser.add_argument("--output", help="куда записать результат (JSON), по умолчанию — stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from marketplace.scheduler import load_config
+    result = run_accounts(load_config(args.accounts), args.date_from, args.date_to)
+
+    text = json.dumps(result, ensure_ascii=False, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# =============================================================
+# marketplace/aggregates.py
+#
+# Дневные агрегаты финансовых отчётов WB и Ozon:
+#   ✔ агрегат — словарь накопителей (суммы, счётчики, накопители по SKU);
+#     два агрегата складываются merge_state() в агрегат их суммы
+#   ✔ агрегат считается на каждый день и хранится в SQLite
+#   ✔ отчёт за любой период = сумма дневных агрегатов, без сырых строк:
+#     O(дней × SKU) вместо повторной загрузки
+#   ✔ догружаются только отсутствующие дни и «свежие» дни,
+#     которые маркетплейс ещё может поправить
+#   ✔ окончательным день становится, только если загрузка его отрезка
+#     завершилась; день без строк — только если источник подтвердил,
+#     что отрезок получен полностью
+#
+# Формат агрегата задаёт модуль финансов (new_report_state() в WB,
+# new_transactions_state() в Ozon) — здесь он не важен: числа
+# складываются, вложенные словари сливаются по ключам.
+# =============================================================
+
+import json
+import logging
+import sqlite3
+from collections.abc import Callable, Iterable
+from datetime import date, datetime, timedelta, timezone
+
+from marketplace import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_DAYS = 7
+
+
+# =============================================================
+# МОНОИД
+# =============================================================
+
+def merge_state(into: dict, other: dict) -> dict:
+    """
+    Добавляет агрегат other к into (изменяет into на месте).
+    Числа складываются, словари сливаются рекурсивно.
+    """
+    for key, value in other.items():
+        if isinstance(value, dict):
+            merge_state(into.setdefault(key, {}), value)
+        else:
+            into[key] = into.get(key, 0) + value
+    return into
+
+
+def _encode(value):
+    """
+    JSON не хранит нестроковые ключи (nm_id в WB — int),
+    поэтому словари пишутся списком пар.
+    """
+    if isinstance(value, dict):
+        return {"__items__": [[k, _encode(v)] for k, v in value.items()]}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        return {k: _decode(v) for k, v in value["__items__"]}
+    return value
+
+
+def dumps_state(state: dict) -> str:
+    return json.dumps(_encode(state), ensure_ascii=False, separators=(",", ":"))
+
+
+def loads_state(data: str) -> dict:
+    return _decode(json.loads(data))
+
+
+# =============================================================
+# ХРАНИЛИЩЕ
+# =============================================================
+
+def open_store(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS daily_aggregates (
+        source TEXT,
+        day TEXT,
+        state TEXT,
+        final INTEGER,
+        PRIMARY KEY (source, day)
+    )
+    """)
+    conn.commit()
+    return conn
+
+
+def load_days(conn: sqlite3.Connection, source: str, date_from: str, date_to: str) -> dict[str, dict]:
+    cur = conn.execute(
+        "SELECT day, state FROM daily_aggregates WHERE source = ? AND day >= ? AND day <= ? ORDER BY day",
+        (source, date_from, date_to),
+    )
+    return {day: loads_state(data) for day, data in cur}
+
+
+def save_days(conn: sqlite3.Connection, source: str, states: dict[str, dict], final_days: set[str]) -> None:
+    """
+    Пишет дневные агрегаты. Дни из final_days помечаются
+    окончательными и больше не перезагружаются.
+    """
+    conn.executemany(
+        "INSERT OR REPLACE INTO daily_aggregates (source, day, state, final) VALUES (?, ?, ?, ?)",
+        [(source, day, dumps_state(state), int(day in final_days)) for day, state in states.items()],
+    )
+    conn.commit()
+
+
+def _days(date_from: str, date_to: str) -> list[str]:
+    start, end = date.fromisoformat(date_from), date.fromisoformat(date_to)
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+def stale_ranges(conn: sqlite3.Connection, source: str, date_from: str, date_to: str) -> list[tuple[str, str]]:
+    """
+    Отрезки подряд идущих дней, которых нет в хранилище
+    или которые ещё не окончательные.
+    """
+    final = {
+        day for (day,) in conn.execute(
+            "SELECT day FROM daily_aggregates WHERE source = ? AND day >= ? AND day <= ? AND final = 1",
+            (source, date_from, date_to),
+        )
+    }
+
+    ranges = []
+    for day in _days(date_from, date_to):
+        if day in final:
+            continue
+        if ranges and date.fromisoformat(ranges[-1][1]) + timedelta(days=1) == date.fromisoformat(day):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+# =============================================================
+# СБОРКА ПЕРИОДА
+# =============================================================
+
+def fold_by_day(
+    pages: Iterable[list[dict]],
+    days: list[str],
+    new_state: Callable[[], dict],
+    fold: Callable[[dict, list[dict]], dict],
+    day_of: Callable[[dict], str],
+) -> tuple[dict[str, dict], set[str], bool | None]:
+    """
+    Сворачивает страницы в агрегаты по дням из days (строки других
+    дней пропускаются). Возвращает (агрегаты, дни со строками, итог
+    загрузки) — итог берётся из возвращаемого значения генератора
+    страниц: True — получено всё, False — загрузка прервалась,
+    None — неизвестно (обычный итератор).
+    """
+    states = {day: new_state() for day in days}
+    filled = set()
+    pages = iter(pages)
+
+    while True:
+        try:
+            rows = next(pages)
+        except StopIteration as stop:
+            return states, filled, stop.value
+
+        by_day = {}
+        for row in rows:
+            day = day_of(row)
+            if day in states:
+                by_day.setdefault(day, []).append(row)
+        filled.update(by_day)
+
+        with metrics.timer("analyze_seconds"):
+            for day, day_rows in by_day.items():
+                fold(states[day], day_rows)
+
+
+def period_state(
+    conn: sqlite3.Connection,
+    source: str,
+    date_from: str,
+    date_to: str,
+    fetch: Callable[[str, str], Iterable[list[dict]]],
+    new_state: Callable[[], dict],
+    fold: Callable[[dict, list[dict]], dict],
+    day_of: Callable[[dict], str],
+    refresh_days: int = DEFAULT_REFRESH_DAYS,
+    today: date | None = None,
+) -> dict:
+    """
+    Агрегат за период [date_from, date_to].
+
+    Недостающие и неокончательные дни загружаются через fetch(from, to)
+    (по отрезку на каждую дыру), сворачиваются по дням и сохраняются.
+    Дни старше refresh_days считаются окончательными: со строками —
+    если загрузка не прервалась, без строк — только если fetch вернул
+    True (отрезок получен полностью); иначе пустой день сохраняется
+    неокончательным и будет загружен снова.
+    Если загрузка отрезка не завершилась — его дни участвуют в итоге,
+    но не сохраняются.
+    """
+    final_before = ((today or datetime.now(timezone.utc).date()) - timedelta(days=refresh_days)).isoformat()
+    unsaved = {}
+
+    for range_from, range_to in stale_ranges(conn, source, date_from, date_to):
+        states, filled, result = fold_by_day(
+            fetch(range_from, range_to), _days(range_from, range_to), new_state, fold, day_of
+        )
+        if result is not False:
+            final_days = {
+                day for day in states
+                if day < final_before and (day in filled or result is True)
+            }
+            save_days(conn, source, states, final_days)
+        else:
+            # в итог всё равно попадают — как при обычной загрузке без хранилища
+            logger.warning(f"[aggregates] {source}: загрузка {range_from} → {range_to} не завершена, дни не сохранены")
+            unsaved.update(states)
+
+    return _merge_days({**load_days(conn, source, date_from, date_to), **unsaved}, new_state)
+
+
+def _merge_days(states: dict[str, dict], new_state: Callable[[], dict]) -> dict:
+    total = new_state()
+    for day in sorted(states):
+        merge_state(total, states[day])
+    return total
@@ -0,0 +1,171 @@
+# =============================================================
+# marketplace/benchmark.py
+#
+# Проверка триггеров на N синтетических отзывах: старый поиск
+# подстрок по списку слов против автомата TriggerEngine
+# (по одному тексту и пачкой), плюс регрессионные фразы, на которых
+# автомат обязан (или не должен) срабатывать, и проверка, что всё,
+# что ловил старый поиск подстрок, ловится и сейчас.
+#
+# Запуск из корня репозитория:
+#   python -m marketplace.benchmark            # 100 000 отзывов
+#   python -m marketplace.benchmark 20000
+# =============================================================
+
+import random
+import sys
+import time
+
+from marketplace.triggers import MARKETPLACE_TRIGGERS, build_phrases, drop_exception_words, get_trigger_engine
+
+WORDS = (
+    "товар пришёл быстро качество отличное размер подошёл цвет как на фото "
+    "спасибо продавцу ткань мягкая упаковка целая доставка курьер вовремя "
+    "немного маломерит рекомендую всем брала себе мужу подарок ребёнку "
+    "посуда кружка удобная ручка крышка шов ровный нитки торчат запах"
+).split()
+
+# формы, которые старый поиск подстрок не ловил или ловил по ошибке
+TRIGGER_FORMS = [
+    "подам в суд", "пойду в суд", "обращусь к юристу", "вызову полицию",
+    "напишу заявление", "вы мошенники", "верните деньги", "это обман",
+    "жалоба в прокуратуру", "судом пригрозили",
+]
+
+# (текст, должен ли сработать триггер) — формы, которые стеммер
+# когда-то терял или ловил по ошибке
+REGRESSION_CASES = [
+    ("вы обманщики", True),
+    ("продавцы обманывают", True),
+    ("готовлю судебный иск", True),
+    ("решу вопрос в судебном порядке", True),
+    ("пишу гневный отзыв", True),
+    ("сплошное мошенничество", True),
+    ("обращусь к юристу", True),
+    ("меня оштрафовали", True),
+    ("вас оштрафуют", True),
+    ("я разгневан", True),
+    ("хочу пожаловаться", True),
+    ("нажалуюсь", True),
+    ("пожалуйста, упакуйте получше", False),
+    ("всё как заявлено", False),
+    ("заявлено 5 штук, пришло 5", False),
+    ("отличная посуда", False),
+]
+
+
+def make_reviews(n: int, trigger_share: float = 0.02, seed: int = 42) -> list[str]:
+    rng = random.Random(seed)
+    reviews = []
+    for _ in range(n):
+        words = rng.choices(WORDS, k=rng.randint(3, 40))
+        if rng.random() < trigger_share:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(TRIGGER_FORMS))
+        reviews.append(" ".join(words).capitalize())
+    return reviews
+
+
+def substring_scan(texts: list[str], words: list[str]) -> list[bool]:
+    """
+    Прежний contains_trigger: lower() и поиск каждой подстроки.
+    """
+    result = []
+    for text in texts:
+        text = text.lower()
+        result.append(any(word in text for word in words))
+    return result
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def make_phrases(n: int, seed: int = 7) -> list[str]:
+    """
+    Дополнительные словарные слова — проверить, как время
+    растёт с размером словаря.
+    """
+    rng = random.Random(seed)
+    letters = "абвгдежзиклмнопрстуфхцчшэюя"
+    return ["".join(rng.choices(letters, k=rng.randint(5, 10))) for _ in range(n)]
+
+
+def check_regressions(config: dict | None = None) -> list[str]:
+    """
+    Регрессионные фразы, на которых автомат ошибся
+    (по одному тексту или пачкой). Пустой список — всё верно.
+    """
+    engine = get_trigger_engine(config, "wb")
+    texts = [text for text, _ in REGRESSION_CASES]
+    batch = engine.classify_batch(texts)
+
+    failed = []
+    for (text, expected), found in zip(REGRESSION_CASES, batch):
+        if engine.contains(text) != expected or bool(found) != expected:
+            failed.append(f"{text!r}: ожидалось {expected}, найдено {engine.match(text)}")
+    return failed
+
+
+def check_substring_recall(texts: list[str], config: dict | None = None) -> list[str]:
+    """
+    Тексты, которые старый поиск подстрок по словарю маркетплейса ловил,
+    а автомат — нет (слова-исключения вроде «посуда» не в счёт).
+    Проверяются все маркетплейсы. Пустой список — всё верно.
+    """
+    failed = []
+    for marketplace in MARKETPLACE_TRIGGERS:
+        engine = get_trigger_engine(config, marketplace)
+        words = build_phrases(marketplace, config)
+        cleaned = [drop_exception_words(text.lower().replace("ё", "е")) for text in texts]
+        old = substring_scan(cleaned, words)
+        batch = engine.classify_batch(texts)
+        for text, flagged, found in zip(texts, old, batch):
+            if flagged and not (found and engine.contains(text)):
+                failed.append(f"{marketplace}: {text!r} — старый поиск ловил, автомат нет")
+    return failed
+
+
+def run(reviews: list[str], extra: list[str]) -> None:
+    config = {"triggers": {"add": extra}}
+    engine = get_trigger_engine(config, "wb")
+    words = build_phrases("wb", config)
+
+    t_old, old = timed(substring_scan, reviews, words)
+    t_one, one = timed(lambda texts: [engine.contains(t) for t in texts], reviews)
+    t_batch, batch = timed(engine.classify_batch, reviews)
+
+    assert one == [bool(found) for found in batch]
+
+    print(f"подстроки по списку:       {t_old:6.2f} с  ({sum(old)} срабатываний)")
+    print(f"автомат, по одному тексту: {t_one:6.2f} с  ({sum(one)} срабатываний)")
+    print(f"автомат, пачкой:           {t_batch:6.2f} с  ({sum(map(bool, batch))} срабатываний)")
+
+
+def main(n: int) -> None:
+    failed = check_regressions()
+    failed += check_substring_recall([text for text, _ in REGRESSION_CASES] + TRIGGER_FORMS)
+    for line in failed:
+        print(f"РЕГРЕССИЯ: {line}")
+    if failed:
+        raise SystemExit(1)
+    print(f"Регрессионные фразы: {len(REGRESSION_CASES)} ок")
+
+    print(f"Генерация {n} отзывов...")
+    reviews = make_reviews(n)
+
+    failed = check_substring_recall(reviews)
+    for line in failed[:20]:
+        print(f"РЕГРЕССИЯ: {line}")
+    if failed:
+        raise SystemExit(1)
+    print("Всё, что ловил старый поиск подстрок, ловится и сейчас")
+
+    for extra in (0, 1000):
+        print(f"\nсловарь: {len(build_phrases('wb')) + extra} фраз")
+        run(reviews, make_phrases(extra))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,293 @@
+# =============================================================
+# marketplace/http.py
+#
+# Общая основа HTTP-клиентов WB и Ozon:
+#   ✔ один requests.Session с пулом keep-alive соединений
+#   ✔ token bucket на каждый хост/путь и аккаунт — лимиты API
+#   ✔ 429 / Retry-After и 5xx → повтор с экспоненциальной паузой
+#   ✔ счётчики: запросы, повторы, байты, задержка; при stream=True
+#     байты считаются по мере чтения тела (iter_content)
+#
+# Клиенты маркетплейсов — wb/client.py и ozon/client.py —
+# задают свои лимиты и заголовки аккаунта.
+# =============================================================
+
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from marketplace import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 1.0       # секунды, удваивается с каждой попыткой
+MAX_BACKOFF = 120.0
+POOL_SIZE = 16
+
+# счётчики клиента → счётчики этапа (marketplace/metrics.py)
+_STAGE_COUNTERS = {
+    "requests": "http_requests",
+    "retries": "http_retries",
+    "errors": "http_errors",
+    "bytes": "http_bytes",
+    "latency": "http_seconds",
+    "throttled_wait": "throttled_seconds",
+}
+
+
+# =============================================================
+# TOKEN BUCKET
+# =============================================================
+
+class TokenBucket:
+    """
+    Классический token bucket: rate токенов в секунду, не больше burst.
+    acquire() блокирует, пока токен не появится.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Забирает токен. Возвращает, сколько секунд пришлось ждать.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+
+                delay = (1 - self.tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """
+        Сервер попросил подождать (Retry-After) — опустошаем ведро,
+        чтобы и другие потоки не стучались раньше времени.
+        """
+        with self.lock:
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+            self.updated = time.monotonic()
+
+
+# =============================================================
+# КЛИЕНТ
+# =============================================================
+
+class RateLimitedClient:
+    """
+    HTTP-клиент с пулом соединений, лимитами и статистикой.
+    Потокобезопасен — один экземпляр на процесс и маркетплейс.
+
+    Подклассы задают:
+        NAME — префикс в логах,
+        DEFAULT_RATE_LIMITS — {"хост[/путь]": (запросов в секунду, burst)},
+        ACCOUNT_HEADERS — заголовки, по которым различаются аккаунты.
+    """
+
+    NAME = "http"
+    DEFAULT_RATE_LIMITS: dict = {}
+    ACCOUNT_HEADERS: tuple = ("Authorization",)
+
+    def __init__(self, rate_limits: dict | None = None, max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF, pool_size: int = POOL_SIZE,
+                 base_url: str | None = None):
+        self.rate_limits = {**self.DEFAULT_RATE_LIMITS, **(rate_limits or {})}
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # все запросы — на другой адрес (локальный симулятор API),
+        # лимиты и статистика — по исходному хосту
+        self.base_url = base_url.rstrip("/") if base_url else None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._buckets: dict[tuple, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict] = {}
+
+    # ---------------------------------------------------------
+    # Лимиты
+    # ---------------------------------------------------------
+
+    def _bucket(self, url: str, headers: dict | None) -> TokenBucket | None:
+        """
+        Ведро на (аккаунт, хост/путь). Лимиты маркетплейсов считаются
+        на токен продавца, поэтому разные кабинеты не делят одно ведро.
+        """
+        parts = urlsplit(url)
+        for key in (parts.netloc + parts.path, parts.netloc):
+            if key in self.rate_limits:
+                break
+        else:
+            return None
+
+        account = tuple((headers or {}).get(name, "") for name in self.ACCOUNT_HEADERS)
+        bucket_key = (account, key)
+
+        with self._lock:
+            bucket = self._buckets.get(bucket_key)
+            if bucket is None:
+                rate, burst = self.rate_limits[key]
+                bucket = self._buckets[bucket_key] = TokenBucket(rate, burst)
+            return bucket
+
+    # ---------------------------------------------------------
+    # Статистика
+    # ---------------------------------------------------------
+
+    def _record(self, host: str, **values) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(host, {
+                "requests": 0,
+                "retries": 0,
+                "errors": 0,
+                "bytes": 0,
+                "latency_total": 0.0,
+                "latency_max": 0.0,
+                "throttled_wait": 0.0,
+            })
+            for key, value in values.items():
+                if key == "latency":
+                    stats["latency_total"] += value
+                    stats["latency_max"] = max(stats["latency_max"], value)
+                else:
+                    stats[key] += value
+
+        metrics.record(**{_STAGE_COUNTERS[key]: value for key, value in values.items()})
+
+    def stats(self) -> dict:
+        """
+        Снимок счётчиков: по каждому хосту и итого.
+        """
+        with self._lock:
+            by_host = {host: dict(s) for host, s in self._stats.items()}
+
+        total = {"requests": 0, "retries": 0, "errors": 0, "bytes": 0,
+                 "latency_total": 0.0, "throttled_wait": 0.0}
+        for s in by_host.values():
+            for key in total:
+                total[key] += s[key]
+        total["latency_avg"] = round(total["latency_total"] / total["requests"], 3) if total["requests"] else 0.0
+
+        return {"total": total, "by_host": by_host}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    # ---------------------------------------------------------
+    # Запросы
+    # ---------------------------------------------------------
+
+    def _count_stream(self, host: str, r: requests.Response) -> None:
+        """
+        При stream=True тело ещё не прочитано: байты считаются по мере
+        чтения. r.content, r.json() и marketplace/jsonstream.py читают
+        через iter_content, поэтому достаточно обернуть его.
+        """
+        iter_content = r.iter_content
+
+        def counting_iter_content(*args, **kwargs):
+            for chunk in iter_content(*args, **kwargs):
+                self._record(host, bytes=len(chunk))
+                yield chunk
+
+        r.iter_content = counting_iter_content
+
+    def _retry_delay(self, r: requests.Response | None, attempt: int) -> float:
+        """
+        Пауза перед повтором: Retry-After / X-Ratelimit-Retry от сервера,
+        иначе экспоненциальная с небольшим джиттером.
+        """
+        if r is not None:
+            header = r.headers.get("Retry-After") or r.headers.get("X-Ratelimit-Retry")
+            if header:
+                try:
+                    return min(float(header), MAX_BACKOFF)
+                except ValueError:
+                    try:
+                        retry_at = parsedate_to_datetime(header).timestamp()
+                        return min(max(retry_at - time.time(), 0.0), MAX_BACKOFF)
+                    except (TypeError, ValueError):
+                        pass
+
+        delay = self.backoff * (2 ** attempt)
+        return min(delay + random.uniform(0, delay / 4), MAX_BACKOFF)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        parts = urlsplit(url)
+        host = parts.netloc
+        bucket = self._bucket(url, kwargs.get("headers"))
+        if self.base_url:
+            url = self.base_url + parts.path + (f"?{parts.query}" if parts.query else "")
+        attempt = 0
+
+        while True:
+            if bucket is not None:
+                waited = bucket.acquire()
+                if waited:
+                    self._record(host, throttled_wait=waited)
+
+            start = time.perf_counter()
+            try:
+                r = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(host, requests=1, errors=1, latency=time.perf_counter() - start)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(None, attempt)
+                logger.warning(f"[{self.NAME}:client] {method} {host}: {e} — повтор через {delay:.1f} с")
+                self._record(host, retries=1)
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            if kwargs.get("stream"):
+                self._count_stream(host, r)
+                self._record(host, requests=1, latency=time.perf_counter() - start)
+            else:
+                self._record(host, requests=1, bytes=len(r.content), latency=time.perf_counter() - start)
+
+            if r.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                return r
+
+            delay = self._retry_delay(r, attempt)
+            r.close()   # при stream=True тело не прочитано — отдаём соединение в пул
+            if r.status_code == 429 and bucket is not None:
+                bucket.pause(delay)
+            logger.warning(f"[{self.NAME}:client] {method} {host}: код {r.status_code} — повтор через {delay:.1f} с")
+            self._record(host, retries=1)
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", url, **kwargs)
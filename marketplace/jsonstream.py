@@ -0,0 +1,139 @@
+# =============================================================
+# marketplace/jsonstream.py
+#
+# Потоковый разбор больших JSON-массивов из ответа API:
+#   ✔ тело ответа читается кусками (stream=True), элементы массива
+#     отдаются по одному, по мере прихода байтов
+#   ✔ в памяти нет ни всего текста ответа, ни дерева всех объектов —
+#     только текущий кусок и текущий элемент
+#   ✔ элемент можно сразу сжать в кортеж нужных полей (project())
+#
+# Использование:
+#   r = get_client().get(url, ..., stream=True)
+#   rows = list(map(project(FIELDS), iter_response_items(r)))
+#
+# Только стандартная библиотека: каждый элемент разбирает
+# C-сканер json (JSONDecoder.raw_decode).
+# =============================================================
+
+import codecs
+import json
+import re
+import time
+from collections.abc import Callable, Iterable, Iterator
+
+import requests
+
+from marketplace import metrics
+
+# Размер куска чтения тела ответа
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+# Чем может закончиться значение, которое точно разобрано целиком.
+# Число у конца куска может продолжиться в следующем ("-1." + "5e3"),
+# поэтому после него нужен хвост буфера не короче _SCALAR_TAIL.
+_CLOSED = frozenset('}]"')
+_SCALAR_TAIL = 32
+
+
+def iter_items(chunks: Iterable[bytes]) -> Iterator:
+    """
+    Элементы JSON-массива верхнего уровня из потока байтов (UTF-8).
+
+    Бросает ValueError, если поток — не массив или оборвался.
+    Время разбора (без ожидания сети) пишется в json_seconds текущего этапа.
+    """
+    chunks = iter(chunks)
+    decode = codecs.getincrementaldecoder("utf-8")().decode
+    buf = ""
+    pos = 0
+    eof = False
+    spent = 0.0
+    start = time.perf_counter()
+
+    def more(need: int = 1) -> bool:
+        """
+        Дочитывает хотя бы need символов (или до конца потока).
+        Разобранное начало буфера отбрасывается.
+        """
+        nonlocal buf, pos, eof, spent, start
+        parts = []
+        got = 0
+        while got < need and not eof:
+            spent += time.perf_counter() - start
+            chunk = next(chunks, None)
+            start = time.perf_counter()
+            text = decode(b"", final=True) if chunk is None else decode(chunk)
+            eof = chunk is None
+            parts.append(text)
+            got += len(text)
+        if not got:
+            return False
+        buf = buf[pos:] + "".join(parts)
+        pos = 0
+        return True
+
+    def skip_whitespace() -> str:
+        nonlocal pos
+        while True:
+            pos = _whitespace.match(buf, pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if not more():
+                raise ValueError("JSON-массив оборвался")
+
+    try:
+        if skip_whitespace() != "[":
+            raise ValueError("Ожидался JSON-массив")
+        pos += 1
+        if skip_whitespace() == "]":
+            return
+
+        while True:
+            skip_whitespace()
+            try:
+                item, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # элемент не дочитан — дочитываем не меньше, чем уже есть,
+                # чтобы длинный элемент не разбирался заново на каждом куске
+                if more(max(len(buf) - pos, 1)):
+                    continue
+                raise
+            if buf[end - 1] not in _CLOSED and len(buf) - end < _SCALAR_TAIL and more():
+                continue
+            pos = end
+
+            spent += time.perf_counter() - start
+            yield item
+            start = time.perf_counter()
+
+            sep = skip_whitespace()
+            pos += 1
+            if sep == "]":
+                return
+            if sep != ",":
+                raise ValueError(f"Неожиданный символ {sep!r} в JSON-массиве")
+    finally:
+        spent += time.perf_counter() - start
+        metrics.record(json_seconds=spent)
+
+
+def iter_response_items(r: requests.Response, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator:
+    """
+    Элементы JSON-массива из тела ответа. Ответ лучше запрашивать
+    со stream=True — иначе requests уже прочитал тело целиком.
+    """
+    return iter_items(r.iter_content(chunk_size))
+
+
+def project(fields: tuple[str, ...]) -> Callable[[dict], tuple]:
+    """
+    Функция «объект → кортеж значений fields» (отсутствующие поля — None).
+    Кортеж заметно компактнее словаря с теми же полями.
+    """
+    def to_tuple(item: dict) -> tuple:
+        return tuple(map(item.get, fields))
+    return to_tuple
@@ -0,0 +1,251 @@
+# =============================================================
+# marketplace/metrics.py
+#
+# Метрики этапов оркестраторов WB и Ozon:
+#   ✔ на каждый этап: время, HTTP-запросы, байты, повторы, ожидание
+#     лимитов, строки, разбор JSON, вызовы LLM и токены, сообщения Telegram
+#   ✔ счётчики пишут сами модули (HTTP-клиент, загрузчики, LLM) через
+#     record() — значение попадает в этап, внутри которого выполняется код
+#   ✔ results["_metrics"] в run_wb_skill / run_ozon_skill
+#   ✔ выгрузка: текстовый файл Prometheus и/или JSON lines
+#
+# Использование:
+#   from marketplace import metrics
+#   run = metrics.RunMetrics("wb")
+#   with run.stage("finance"):
+#       ...                              # metrics.record(rows=len(rows))
+#   results["_metrics"] = run.report()
+#   metrics.export(results["_metrics"], config)
+#
+# Этап определяется через contextvars. Поток, запущенный внутри этапа,
+# попадает в этап, если его функция обёрнута bind().
+# =============================================================
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = (
+    "http_requests",
+    "http_retries",
+    "http_errors",
+    "http_bytes",
+    "http_seconds",
+    "throttled_seconds",
+    "rows",
+    "json_seconds",
+    "analyze_seconds",
+    "llm_calls",
+    "llm_prompt_tokens",
+    "llm_completion_tokens",
+    "llm_seconds",
+    "telegram_messages",
+)
+
+_current = contextvars.ContextVar("marketplace_metrics_stage", default=None)
+
+
+class _Stage:
+    __slots__ = ("counters", "lock")
+
+    def __init__(self):
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.lock = threading.Lock()
+
+    def add(self, values: dict) -> None:
+        with self.lock:
+            for key, value in values.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+
+# =============================================================
+# ЗАПИСЬ
+# =============================================================
+
+def record(**values) -> None:
+    """
+    Добавляет значения к счётчикам текущего этапа.
+    Вне этапа ничего не делает — модули можно вызывать как раньше.
+    """
+    stage = _current.get()
+    if stage is not None:
+        stage.add(values)
+
+
+@contextmanager
+def timer(counter: str):
+    """
+    Время блока — в счётчик counter текущего этапа (секунды).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(**{counter: time.perf_counter() - start})
+
+
+def bind(fn):
+    """
+    Функция для другого потока, которая пишет в текущий этап:
+        threading.Thread(target=metrics.bind(worker))
+        pool.submit(metrics.bind(fetch_page), page)
+    """
+    stage = _current.get()
+
+    def bound(*args, **kwargs):
+        token = _current.set(stage)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return bound
+
+
+# =============================================================
+# ЗАПУСК
+# =============================================================
+
+class RunMetrics:
+    """
+    Метрики одного запуска оркестратора: этапы и их счётчики.
+    Этапы могут идти параллельно в разных потоках.
+    """
+
+    def __init__(self, run: str, labels: dict | None = None):
+        self.run = run
+        self.labels = dict(labels or {})
+        self.started = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        stage = _Stage()
+        token = _current.set(stage)
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield stage
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            _current.reset(token)
+            with self._lock:
+                self._stages[name] = {
+                    "seconds": round(time.perf_counter() - start, 3),
+                    "status": status,
+                    **{k: round(v, 3) if isinstance(v, float) else v for k, v in stage.counters.items()},
+                }
+
+    def wrap(self, name: str, fn):
+        """
+        fn, выполняемая как этап name (для run_stages в wb/main.py).
+        """
+        def staged(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+        return staged
+
+    def report(self) -> dict:
+        with self._lock:
+            stages = {name: dict(values) for name, values in self._stages.items()}
+
+        totals = dict.fromkeys(COUNTERS, 0)
+        for values in stages.values():
+            for key in totals:
+                totals[key] += values.get(key, 0)
+
+        return {
+            "run": self.run,
+            "labels": self.labels,
+            "started": self.started.isoformat(),
+            "seconds": round(time.perf_counter() - self._start, 3),
+            "stages": stages,
+            "totals": {k: round(v, 3) if isinstance(v, float) else v for k, v in totals.items()},
+        }
+
+
+# =============================================================
+# ВЫГРУЗКА
+# =============================================================
+
+def _label_str(labels: dict) -> str:
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+def to_prometheus(report: dict, prefix: str = "marketplace") -> str:
+    """
+    Текстовый формат Prometheus (для textfile-коллектора node_exporter).
+    """
+    base = {"run": report["run"], **report.get("labels", {})}
+    lines = [
+        f"# HELP {prefix}_run_seconds Время всего запуска",
+        f"# TYPE {prefix}_run_seconds gauge",
+        f"{prefix}_run_seconds{{{_label_str(base)}}} {report['seconds']}",
+    ]
+
+    fields = ["seconds", *COUNTERS]
+    for field in fields:
+        name = f"{prefix}_stage_{field}"
+        lines.append(f"# TYPE {name} gauge")
+        for stage, values in report["stages"].items():
+            lines.append(f"{name}{{{_label_str({**base, 'stage': stage})}}} {values.get(field, 0)}")
+
+    name = f"{prefix}_stage_failed"
+    lines.append(f"# TYPE {name} gauge")
+    for stage, values in report["stages"].items():
+        lines.append(f"{name}{{{_label_str({**base, 'stage': stage})}}} {int(values['status'] != 'ok')}")
+
+    return "\n".join(lines) + "\n"
+
+
+def export(report: dict, config: dict) -> None:
+    """
+    Выгрузка по config["metrics"]:
+        {"prometheus_path": "metrics/{run}-{account}.prom",   # перезаписывается
+         "jsonl_path": "metrics/runs.jsonl"}                  # дописывается строка
+    В путях можно использовать {run} и метки ({account}).
+    """
+    metrics_cfg = config.get("metrics", {})
+    fields = {"run": report["run"], "account": "", **report.get("labels", {})}
+
+    prom_path = metrics_cfg.get("prometheus_path")
+    if prom_path:
+        path = prom_path.format(**fields)
+        try:
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(to_prometheus(report))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"[metrics] Не удалось записать {path}: {e}")
+
+    jsonl_path = metrics_cfg.get("jsonl_path")
+    if jsonl_path:
+        path = jsonl_path.format(**fields)
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(report, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error(f"[metrics] Не удалось записать {path}: {e}")
+
+
+def run_labels(config: dict) -> dict:
+    """
+    Метки запуска: имя кабинета (marketplace/accounts.py) и метки из config["metrics"]["labels"].
+    """
+    labels = dict(config.get("metrics", {}).get("labels", {}))
+    if config.get("name"):
+        labels.setdefault("account", config["name"])
+    return labels
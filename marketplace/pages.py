@@ -0,0 +1,145 @@
+# =============================================================
+# marketplace/pages.py
+#
+# Параллельная загрузка страниц API:
+#   ✔ ограниченный пул: не больше workers запросов в полёте,
+#     результат — в порядке страниц
+#   ✔ страницы отдаются по мере готовности очередной по порядку —
+#     в памяти не больше workers страниц
+#   ✔ offset-пагинация без общего числа строк — следующие offset
+#     запрашиваются наперёд, до первой неполной страницы; как только
+#     она получена, новые offset не запрашиваются
+#   ✔ повтор отдельной страницы, а не всего обхода
+#   ✔ результат детерминирован: тот же порядок строк, что при обходе подряд
+#
+# Лимиты соблюдает общий HTTP-клиент (token bucket на кабинет):
+# пул лишь держит несколько запросов в полёте, темп задаёт клиент.
+#
+# Функция страницы: fetch(ключ страницы) -> список строк,
+# None — страница не получена (ошибка уже залогирована).
+# =============================================================
+
+import logging
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count, islice
+
+from marketplace import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_WORKERS = 4
+
+# Пауза перед повтором страницы (удваивается с каждой попыткой).
+# 429/5xx уже повторяет HTTP-клиент — здесь повторяется то, на чём
+# он сдался: таймауты, обрывы, битые ответы.
+RETRY_PAUSE = 1.0
+
+PageFetch = Callable[[object], list | None]
+
+
+def _retrying(fetch: PageFetch, attempts: int) -> PageFetch:
+    if attempts <= 1:
+        return fetch
+
+    def fetch_with_retry(page):
+        for attempt in range(attempts):
+            rows = fetch(page)
+            if rows is not None or attempt + 1 == attempts:
+                return rows
+            delay = RETRY_PAUSE * (2 ** attempt)
+            logger.warning(f"[pages] Страница {page} не получена — повтор через {delay:.1f} с")
+            time.sleep(delay)
+    return fetch_with_retry
+
+
+def iter_pages(fetch: PageFetch, pages: Iterable, workers: int = DEFAULT_PAGE_WORKERS,
+               attempts: int = 1) -> Iterator[list | None]:
+    """
+    Загружает страницы pages не больше чем в workers потоков и отдаёт
+    результаты в порядке pages (None на месте неполученной страницы).
+
+    pages может быть бесконечным: следующая страница запрашивается,
+    когда отдана очередная. Если перестать читать, уже запрошенные
+    дозагружаются, а ещё не начатые отменяются.
+    attempts > 1 — неполученная страница запрашивается повторно.
+    Счётчики страниц попадают в этап вызывающего (metrics.bind).
+    """
+    fetch = _retrying(fetch, attempts)
+    pages = iter(pages)
+
+    if workers <= 1:
+        for page in pages:
+            yield fetch(page)
+        return
+
+    bound = metrics.bind(fetch)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="page") as pool:
+        pending = deque(pool.submit(bound, page) for page in islice(pages, workers))
+        try:
+            while pending:
+                rows = pending.popleft().result()
+                for page in islice(pages, 1):
+                    pending.append(pool.submit(bound, page))
+                yield rows
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def map_pages(fetch: PageFetch, pages: Iterable, workers: int = DEFAULT_PAGE_WORKERS,
+              attempts: int = 1) -> list[list | None]:
+    """
+    То же, что iter_pages(), списком.
+    """
+    return list(iter_pages(fetch, pages, workers, attempts))
+
+
+def fetch_offset_pages(fetch: PageFetch, limit: int, workers: int = DEFAULT_PAGE_WORKERS) -> tuple[list, bool]:
+    """
+    Все строки offset-пагинации: fetch(offset) отдаёт до limit строк.
+
+    Первая страница — отдельно; если она полная, следующие offset
+    запрашиваются наперёд, не больше workers сразу. Конец — первая
+    неполная страница: как только её получил любой поток, offset за ней
+    больше не запрашиваются (ещё не отправленные — пропускаются),
+    так что впустую уходит не больше workers - 1 запросов.
+
+    Возвращает (строки по порядку offset, дошли ли до конца без ошибок).
+    """
+    rows = fetch(0)
+    if rows is None:
+        return [], False
+
+    all_rows = list(rows)
+    if len(rows) < limit:
+        return all_rows, True
+
+    end = [None]   # offset первой неполной страницы, как только она получена
+
+    def fetch_until_end(offset: int) -> list | None:
+        if end[0] is not None and offset > end[0]:
+            return []
+        page = fetch(offset)
+        if page is not None and len(page) < limit and (end[0] is None or offset < end[0]):
+            end[0] = offset
+        return page
+
+    def offsets() -> Iterator[int]:
+        for offset in count(limit, limit):
+            if end[0] is not None and offset > end[0]:
+                return
+            yield offset
+
+    pages = iter_pages(fetch_until_end, offsets(), workers)
+    try:
+        for rows in pages:
+            if rows is None:
+                return all_rows, False
+            all_rows.extend(rows)
+            if len(rows) < limit:
+                return all_rows, True
+    finally:
+        pages.close()
@@ -0,0 +1,342 @@
+# =============================================================
+# marketplace/scheduler.py
+#
+# Долгоживущий планировщик задач WB и Ozon (вместо разовых запусков cron):
+#   ✔ дайджесты (ежедневный, еженедельный), синхронизация остатков,
+#     обход отзывов и вопросов — в одном процессе
+#   ✔ клиенты и кэши остаются «тёплыми»: HTTP-пулы, очередь Telegram,
+#     автоматы триггеров, кэш ответов живут между запусками задач
+#   ✔ время последнего запуска сохраняется на диск — после рестарта
+#     дневные задачи не повторяются, пропущенные выполняются один раз
+#   ✔ случайный сдвиг (jitter) — задачи не бьют в API одновременно
+#   ✔ время выполнения каждой задачи: последнее, среднее, максимум
+#
+# Запуск из корня репозитория:
+#   python -m marketplace.scheduler config.json
+#   python -m marketplace.scheduler config.json --once wb_daily_digest
+#   python -m marketplace.scheduler config.json --status
+# =============================================================
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import random
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+
+class JobFailed(Exception):
+    """
+    Задача отработала без исключения, но сообщила о неудаче.
+    """
+
+
+DEFAULT_STATE_PATH = "scheduler_state.json"
+DEFAULT_JITTER = 120          # секунд
+DEFAULT_WORKERS = 3
+
+
+# =============================================================
+# ЗАДАЧИ
+# =============================================================
+
+def _call(module: str, name: str, check: bool = False):
+    """
+    Задача — функция модуля; импорт при первом запуске, дальше модуль
+    (и его клиенты/кэши) остаётся в памяти.
+    check=True — результат False считается ошибкой (дайджесты
+    возвращают False, если ничего не отправили).
+    """
+    def job(config):
+        result = getattr(importlib.import_module(module), name)(config)
+        if check and result is False:
+            raise JobFailed(f"{module}.{name} вернул False")
+        return result
+    return job
+
+
+def _wb_feedbacks(config):
+    # wb/auto-answers — каталог с дефисом; модуль грузится один раз
+    # и остаётся в sys.modules (wb/utils.py)
+    from wb.utils import load_auto_answers
+    return load_auto_answers().process(config)
+
+
+def default_jobs(config: dict) -> dict:
+    """
+    Задачи по умолчанию: {имя: {"fn", "at" | "every_minutes", "weekday"}}.
+    Время — UTC. Час дайджестов — finance.digest_hour (9).
+    """
+    digest_at = f"{config.get('finance', {}).get('digest_hour', 9):02d}:00"
+
+    return {
+        "wb_daily_digest": {"fn": _call("wb.finance.script", "send_daily_digest", check=True), "at": digest_at},
+        "wb_weekly_digest": {"fn": _call("wb.finance.script", "send_weekly_digest", check=True), "at": digest_at, "weekday": 0},
+        "wb_stock_sync": {"fn": _call("wb.warehouse.script", "process"), "every_minutes": 60},
+        "wb_feedbacks": {"fn": _wb_feedbacks, "every_minutes": 30},
+        "ozon_daily_digest": {"fn": _call("ozon.finance.script", "send_daily_digest", check=True), "at": digest_at},
+        "ozon_weekly_digest": {"fn": _call("ozon.finance.script", "send_weekly_digest", check=True), "at": digest_at, "weekday": 0},
+        "ozon_reviews": {"fn": _call("ozon.autoanswers.script", "process_reviews"), "every_minutes": 30},
+        "ozon_questions": {"fn": _call("ozon.autoanswers.script", "process_questions"), "every_minutes": 30},
+    }
+
+
+# =============================================================
+# РАСПИСАНИЕ
+# =============================================================
+
+def _parse_dt(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+def next_slot(job: dict, after: datetime) -> datetime:
+    """
+    Первый момент по расписанию задачи строго после after (UTC).
+    """
+    if "every_minutes" in job:
+        return after + timedelta(minutes=job["every_minutes"])
+
+    hour, minute = map(int, job["at"].split(":"))
+    slot = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if slot <= after:
+        slot += timedelta(days=1)
+
+    if "weekday" in job:
+        slot += timedelta(days=(job["weekday"] - slot.weekday()) % 7)
+    return slot
+
+
+def first_run(job: dict, last_run: datetime | None, now: datetime) -> datetime:
+    """
+    Когда запускать задачу после старта процесса:
+    - никогда не запускалась: периодическая — сразу, по времени — в ближайший слот;
+    - слот после последнего запуска уже прошёл — сразу, один раз
+      (все пропущенные запуски схлопываются в один).
+    """
+    if last_run is None:
+        return now if "every_minutes" in job else next_slot(job, now)
+    return max(next_slot(job, last_run), now)
+
+
+# =============================================================
+# ПЛАНИРОВЩИК
+# =============================================================
+
+class Scheduler:
+    """
+    Один поток планирования + небольшой пул исполнителей.
+    Одна и та же задача не запускается, пока не закончился её прошлый запуск.
+    """
+
+    def __init__(self, config: dict, jobs: dict | None = None):
+        self.config = config
+        sched_cfg = config.get("scheduler", {})
+
+        self.state_path = sched_cfg.get("state_path", DEFAULT_STATE_PATH)
+        self.jitter = sched_cfg.get("jitter", DEFAULT_JITTER)
+        self.workers = sched_cfg.get("workers", DEFAULT_WORKERS)
+
+        # настройки задач из конфига поверх умолчаний; enabled=false — выключить
+        self.jobs = {}
+        for name, job in (jobs or default_jobs(config)).items():
+            override = sched_cfg.get("jobs", {}).get(name, {})
+            if not override.get("enabled", True):
+                continue
+            job = {**job, **{k: v for k, v in override.items() if k != "enabled"}}
+            if "at" in override and "every_minutes" in job and "every_minutes" not in override:
+                del job["every_minutes"]
+            self.jobs[name] = job
+
+        self.state = self._load_state()
+        self._lock = threading.Lock()
+        self._running = set()
+        self._stop = threading.Event()
+        self._wake = threading.Event()   # задача перепланирована — пересчитать ожидание
+        self._next = {}
+
+    # ---------------------------------------------------------
+    # Состояние
+    # ---------------------------------------------------------
+
+    def _load_state(self) -> dict:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[scheduler] Не удалось прочитать {self.state_path}: {e}")
+            return {}
+
+    def _save_state(self) -> None:
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def status(self) -> dict:
+        """
+        Статистика задач: последний запуск, результат, время выполнения,
+        следующий запуск.
+        """
+        with self._lock:
+            result = {name: dict(self.state.get(name, {})) for name in self.jobs}
+            for name, at in self._next.items():
+                result[name]["next_run"] = at.isoformat()
+            return result
+
+    # ---------------------------------------------------------
+    # Выполнение
+    # ---------------------------------------------------------
+
+    def run_job(self, name: str) -> bool:
+        """
+        Выполняет задачу сразу и записывает её время и результат.
+        """
+        started = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        ok = True
+        error = None
+
+        try:
+            self.jobs[name]["fn"](self.config)
+        except JobFailed as e:
+            logger.warning(f"[scheduler] {name}: {e}")
+            ok = False
+            error = str(e)
+        except Exception as e:
+            logger.exception(f"[scheduler] {name}: ошибка")
+            ok = False
+            error = f"{type(e).__name__}: {e}"
+
+        duration = time.perf_counter() - start
+
+        with self._lock:
+            s = self.state.setdefault(name, {"runs": 0, "failures": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            s["last_run"] = started.isoformat()
+            s["last_status"] = "ok" if ok else "error"
+            s["last_error"] = error
+            s["last_seconds"] = round(duration, 3)
+            s["runs"] += 1
+            s["failures"] += 0 if ok else 1
+            s["total_seconds"] = round(s["total_seconds"] + duration, 3)
+            s["max_seconds"] = round(max(s["max_seconds"], duration), 3)
+            s["avg_seconds"] = round(s["total_seconds"] / s["runs"], 3)
+            self._save_state()
+
+        logger.info(f"[scheduler] {name}: {'ok' if ok else 'ошибка'} за {duration:.1f} с")
+        return ok
+
+    def _schedule(self, name: str, after: datetime) -> None:
+        job = self.jobs[name]
+        jitter = random.uniform(0, job.get("jitter", self.jitter))
+        self._next[name] = next_slot(job, after) + timedelta(seconds=jitter)
+
+    def _run_and_reschedule(self, name: str) -> None:
+        try:
+            self.run_job(name)
+        finally:
+            with self._lock:
+                self._running.discard(name)
+                self._schedule(name, datetime.now(timezone.utc))
+            self._wake.set()
+
+    def run_forever(self) -> None:
+        now = datetime.now(timezone.utc)
+        for name, job in self.jobs.items():
+            last_run = _parse_dt(self.state.get(name, {}).get("last_run"))
+            jitter = random.uniform(0, job.get("jitter", self.jitter))
+            self._next[name] = first_run(job, last_run, now) + timedelta(seconds=jitter)
+            logger.info(f"[scheduler] {name}: следующий запуск {self._next[name]:%Y-%m-%d %H:%M:%S} UTC")
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job") as pool:
+            while not self._stop.is_set():
+                now = datetime.now(timezone.utc)
+                with self._lock:
+                    due = [n for n, at in self._next.items() if at <= now and n not in self._running]
+                    for name in due:
+                        self._running.add(name)
+                        del self._next[name]
+                    upcoming = min(self._next.values(), default=now + timedelta(minutes=1))
+
+                for name in due:
+                    pool.submit(self._run_and_reschedule, name)
+
+                # просыпаемся к ближайшей задаче, после завершения любой задачи
+                # и не реже раза в минуту
+                wait = min(max((upcoming - now).total_seconds(), 0.5), 60)
+                self._wake.wait(wait)
+                self._wake.clear()
+
+        logger.info("[scheduler] Остановлен")
+
+    def stop(self, *_):
+        self._stop.set()
+        self._wake.set()
+
+
+# =============================================================
+# ЗАПУСК
+# =============================================================
+
+def load_config(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml  # опционально, только для YAML-конфига
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def warm_up(config: dict) -> None:
+    """
+    Общие клиенты создаются один раз до первой задачи.
+    """
+    if config.get("wb", {}).get("http"):
+        from wb.client import configure_client
+        configure_client(config)
+    if config.get("ozon", {}).get("http"):
+        from ozon.client import configure_client
+        configure_client(config)
+
+    from marketplace.telegram import get_outbox
+    get_outbox(config)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Планировщик задач WB и Ozon")
+    parser.add_argument("config", help="путь к конфигу (JSON или YAML)")
+    parser.add_argument("--once", metavar="JOB", help="выполнить одну задачу и выйти")
+    parser.add_argument("--status", action="store_true", help="показать статистику задач и выйти")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    config = load_config(args.config)
+    scheduler = Scheduler(config)
+
+    if args.status:
+        print(json.dumps(scheduler.status(), ensure_ascii=False, indent=2))
+        return
+
+    warm_up(config)
+
+    if args.once:
+        if args.once not in scheduler.jobs:
+            parser.error(f"неизвестная задача {args.once}; есть: {', '.join(scheduler.jobs)}")
+        ok = scheduler.run_job(args.once)
+        raise SystemExit(0 if ok else 1)
+
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    scheduler.run_forever()
+
+
+if __name__ == "__main__":
+    main()
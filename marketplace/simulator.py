@@ -0,0 +1,1284 @@
+# =============================================================
+# marketplace/simulator.py
+#
+# Локальный симулятор API WB и Ozon — для проверки и бенчмарков
+# без боевых токенов:
+#   ✔ методы, которые вызывают модули скилла: отчёт о реализации,
+#     продажи, остатки и отзывы WB; аналитика, склад, транзакции,
+#     реализация, баланс, отзывы и вопросы Ozon
+#   ✔ пагинация как у маркетплейсов: rrdid, lastChangeDate,
+#     skip/take, page/page_size, offset/limit, last_id
+#   ✔ синтетические данные любого объёма: строка вычисляется по номеру,
+#     в памяти ничего не хранится — 1M+ строк на ноутбуке
+#   ✔ задержка, 429 с Retry-After, 5xx и лимиты на токен — по желанию
+#
+# Модули направляются в симулятор через base_url общих клиентов:
+#   "wb":   {"http": {"base_url": "http://127.0.0.1:8080"}}
+#   "ozon": {"http": {"base_url": "http://127.0.0.1:8080"}}
+#
+# Запуск из корня репозитория:
+#   python -m marketplace.simulator serve --rows 1000000 --port 8080
+#   python -m marketplace.simulator serve --latency 50 --rate-429 0.05
+#   python -m marketplace.simulator bench --rows 1000000
+#   python -m marketplace.simulator check --rows 10000   # смоук-проверка скиллов
+# =============================================================
+
+import argparse
+import json
+import logging
+import math
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from marketplace.benchmark import TRIGGER_FORMS, WORDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROWS = 100_000
+DEFAULT_SKUS = 2_000
+DEFAULT_DAYS = 90
+DEFAULT_FEEDBACKS = 5_000
+DEFAULT_SEED = 1
+
+WAREHOUSES = ["Коледино", "Подольск", "Электросталь", "Казань", "Краснодар", "Екатеринбург", "Новосибирск"]
+
+# размеры страниц и лимиты методов, как у маркетплейсов
+WB_REPORT_MAX_LIMIT = 100_000
+WB_SALES_PAGE = 80_000
+WB_STOCKS_PAGE = 60_000
+WB_FEEDBACKS_MAX_TAKE = 5_000
+OZON_MAX_PAGE_SIZE = 1_000
+OZON_MAX_PERIOD_DAYS = 31      # /v3/finance/transaction/list — не больше месяца
+
+WB_WAREHOUSE_COUNT = 5
+OZON_WAREHOUSE_COUNT = 3
+
+_MASK = (1 << 64) - 1
+
+
+# =============================================================
+# ГЕНЕРАЦИЯ
+# =============================================================
+
+def _mix(i: int, salt: int) -> int:
+    """
+    splitmix64: псевдослучайное 64-битное число по номеру строки и «соли».
+    Одна и та же строка всегда получается одинаковой.
+    """
+    x = (i * 0x9E3779B97F4A7C15 + salt * 0xD1B54A32D192ED03 + 1) & _MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return x ^ (x >> 31)
+
+
+def _table(weights: dict) -> list:
+    """
+    Таблица на 100 ячеек для выбора значения по весам: table[h % 100].
+    """
+    table = []
+    for value, weight in weights.items():
+        table += [value] * weight
+    assert len(table) == 100, "веса должны давать в сумме 100"
+    return table
+
+
+def _text(i: int, salt: int, trigger_share: float = 0.02) -> str:
+    rng = random.Random(_mix(i, salt))
+    words = rng.choices(WORDS, k=rng.randint(3, 40))
+    if rng.random() < trigger_share:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(TRIGGER_FORMS))
+    return " ".join(words).capitalize()
+
+
+class Timeline:
+    """
+    n строк равномерно по дням периода [start, start + days).
+    Момент строки и номер первой строки после момента — за O(1),
+    поэтому фильтр по датам не требует перебора.
+    """
+
+    def __init__(self, n: int, start: date, days: int):
+        self.n = max(n, 0)
+        self.start = start
+        self.days = days
+        self.span = days * 86400
+        self.t0 = datetime(start.year, start.month, start.day)
+
+    def second(self, i: int) -> int:
+        return i * self.span // self.n
+
+    def moment(self, i: int) -> datetime:
+        return self.t0 + timedelta(seconds=self.second(i))
+
+    def index_at(self, moment: datetime) -> int:
+        """
+        Номер первой строки с моментом >= moment.
+        """
+        seconds = math.ceil((moment - self.t0).total_seconds())
+        if seconds <= 0 or not self.n:
+            return 0
+        return min(self.n, -(-seconds * self.n // self.span))
+
+    def day_range(self, day_from: date, day_to: date) -> tuple[int, int]:
+        """
+        Строки дней [day_from, day_to] — полуинтервал номеров [lo, hi).
+        """
+        lo = self.index_at(datetime(day_from.year, day_from.month, day_from.day))
+        hi = self.index_at(datetime(day_to.year, day_to.month, day_to.day) + timedelta(days=1))
+        return lo, max(lo, hi)
+
+
+class OpenSet:
+    """
+    Номера 0..n-1, из которых можно удалять (отвеченные отзывы).
+    k-й оставшийся и число оставшихся меньше i — за O(log n) (дерево Фенвика).
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.count = n
+        self.removed = set()
+        self.tree = [0] * (n + 1)
+        for i in range(1, n + 1):
+            self.tree[i] += 1
+            j = i + (i & -i)
+            if j <= n:
+                self.tree[j] += self.tree[i]
+        self.lock = threading.Lock()
+
+    def remove(self, i: int) -> bool:
+        with self.lock:
+            if not 0 <= i < self.n or i in self.removed:
+                return False
+            self.removed.add(i)
+            self.count -= 1
+            j = i + 1
+            while j <= self.n:
+                self.tree[j] -= 1
+                j += j & -j
+            return True
+
+    def rank(self, i: int) -> int:
+        """
+        Сколько оставшихся номеров меньше i.
+        """
+        total = 0
+        j = min(i, self.n)
+        while j > 0:
+            total += self.tree[j]
+            j -= j & -j
+        return total
+
+    def select(self, k: int) -> int:
+        """
+        k-й (с нуля) оставшийся номер по возрастанию.
+        """
+        pos = 0
+        step = 1 << self.n.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.n and self.tree[nxt] <= k:
+                pos = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return pos
+
+    def descending(self, skip: int, take: int) -> list[int]:
+        """
+        Оставшиеся номера от новых к старым: пропустить skip, взять take.
+        """
+        with self.lock:
+            top = self.count - 1 - skip
+            return [self.select(k) for k in range(top, max(top - take, -1), -1)]
+
+    def below(self, i: int, take: int) -> list[int]:
+        """
+        До take оставшихся номеров меньше i, от больших к меньшим.
+        """
+        with self.lock:
+            r = self.rank(i)
+            return [self.select(k) for k in range(r - 1, max(r - 1 - take, -1), -1)]
+
+
+# =============================================================
+# ДАННЫЕ
+# =============================================================
+
+WB_REPORT_OPS = _table({
+    "Продажа": 78, "Возврат": 6, "Логистика": 10, "Хранение": 4, "Штраф": 1, "Коррекция возврата": 1,
+})
+
+OZON_EXTRA_OPS = _table({
+    "OperationMarketplaceServiceStorage": 40,
+    "MarketplaceRedistributionOfAcquiringOperation": 30,
+    "ClientReturnAgentOperation": 20,
+    "OperationMarketplacePenalty": 10,
+})
+
+OZON_OP_NAMES = {
+    "OperationAgentDeliveredToCustomer": "Доставка покупателю",
+    "MarketplaceServiceItemDirectFlowLogistic": "Логистика",
+    "OperationMarketplaceServiceStorage": "Услуга размещения товаров на складе",
+    "MarketplaceRedistributionOfAcquiringOperation": "Оплата эквайринга",
+    "ClientReturnAgentOperation": "Получение возврата, отмены, невыкупа от покупателя",
+    "OperationMarketplacePenalty": "Штраф",
+}
+
+
+class SimulatedData:
+    """
+    Синтетические кабинеты WB и Ozon. Все строки вычисляются по номеру;
+    изменяемое состояние — только отвеченные отзывы и вопросы.
+
+    rows — строк отчёта WB, продаж WB и операций Ozon (каждого);
+    skus — товаров; days — дней истории, заканчивая end (сегодня).
+    """
+
+    def __init__(self, rows: int = DEFAULT_ROWS, skus: int = DEFAULT_SKUS, days: int = DEFAULT_DAYS,
+                 feedbacks: int = DEFAULT_FEEDBACKS, seed: int = DEFAULT_SEED, end: date | None = None):
+        self.rows = rows
+        self.skus = max(skus, 1)
+        self.days = days
+        self.seed = seed
+        self.end = end or datetime.utcnow().date()
+        self.start = self.end - timedelta(days=days - 1)
+
+        self.report = Timeline(rows, self.start, days)
+        self.sales = Timeline(rows, self.start, days)
+        self.stocks = Timeline(self.skus * WB_WAREHOUSE_COUNT, self.start, days)
+        self.operations = Timeline(rows, self.start, days)
+
+        self.feedbacks = OpenSet(feedbacks)
+        self.feedback_times = Timeline(feedbacks, self.start, days)
+        self.reviews = OpenSet(feedbacks)
+        self.questions = OpenSet(max(feedbacks // 5, 1))
+
+        self._realization_cache = {}
+        self._realization_lock = threading.Lock()
+
+    # ---------------------------------------------------------
+    # Товары
+    # ---------------------------------------------------------
+
+    def sku_index(self, i: int, salt: int) -> int:
+        """
+        Товар строки: популярные товары встречаются чаще (квадрат равномерного).
+        """
+        r = (_mix(i, self.seed + salt) % 10_000) / 10_000
+        return int(self.skus * r * r)
+
+    def price(self, sku_index: int) -> float:
+        return float(300 + _mix(sku_index, self.seed + 7) % 5000)
+
+    def nm_id(self, sku_index: int) -> int:
+        return 100_000_000 + sku_index
+
+    def ozon_sku(self, sku_index: int) -> int:
+        return 1_000_000_000 + sku_index
+
+    # ---------------------------------------------------------
+    # WB
+    # ---------------------------------------------------------
+
+    def wb_report_row(self, i: int) -> dict:
+        h = _mix(i, self.seed + 11)
+        s = self.sku_index(i, 1)
+        op = WB_REPORT_OPS[h % 100]
+        moment = self.report.moment(i)
+        day = moment.date().isoformat()
+
+        retail_price = self.price(s) if op in ("Продажа", "Возврат", "Коррекция возврата") else 0.0
+        ppvz_for_pay = round(retail_price * (0.70 + (h >> 8) % 10 / 100), 2)
+        delivery_rub = float(30 + (h >> 16) % 70) if op in ("Продажа", "Логистика") else 0.0
+
+        return {
+            "realizationreport_id": 200_000_000 + (moment.date() - self.start).days // 7,
+            "date_from": day,
+            "date_to": day,
+            "rrd_id": i + 1,
+            "gi_id": 10_000_000 + s % 5000,
+            "subject_name": "Кружки",
+            "nm_id": self.nm_id(s),
+            "brand_name": "OpenClaw",
+            "sa_name": f"ART-{s:05d}",
+            "ts_name": "0",
+            "barcode": f"2000{s:09d}",
+            "doc_type_name": "Возврат" if op == "Возврат" else "Продажа",
+            "quantity": 1 if retail_price else 0,
+            "retail_price": retail_price,
+            "retail_amount": retail_price,
+            "sale_percent": 20,
+            "commission_percent": 25.5,
+            "office_name": WAREHOUSES[h % len(WAREHOUSES)],
+            "supplier_oper_name": op,
+            "order_dt": day + "T00:00:00Z",
+            "sale_dt": day + "T00:00:00Z",
+            "rr_dt": day,
+            "shk_id": 9_000_000_000 + i,
+            "retail_price_withdisc_rub": retail_price,
+            "delivery_amount": 1 if op == "Логистика" else 0,
+            "return_amount": 1 if op == "Возврат" else 0,
+            "delivery_rub": delivery_rub,
+            "ppvz_for_pay": ppvz_for_pay,
+            "storage_fee": float((h >> 24) % 500) / 10 if op == "Хранение" else 0.0,
+            "penalty": float(100 + (h >> 24) % 900) if op == "Штраф" else 0.0,
+            "paid_acceptance": 0.0,
+            "site_country": "Россия",
+            "srid": f"{h:016x}",
+        }
+
+    def wb_sale_row(self, i: int) -> dict:
+        h = _mix(i, self.seed + 13)
+        s = self.sku_index(i, 2)
+        moment = self.sales.moment(i).strftime("%Y-%m-%dT%H:%M:%S")
+        price = self.price(s)
+        return {
+            "date": moment,
+            "lastChangeDate": moment,
+            "warehouseName": WAREHOUSES[h % len(WAREHOUSES)],
+            "countryName": "Россия",
+            "regionName": "Московская",
+            "supplierArticle": f"ART-{s:05d}",
+            "nmId": self.nm_id(s),
+            "barcode": f"2000{s:09d}",
+            "category": "Дом",
+            "subject": "Кружки",
+            "brand": "OpenClaw",
+            "totalPrice": price,
+            "discountPercent": 20,
+            "spp": 5,
+            "forPay": round(price * 0.72, 2),
+            "finishedPrice": round(price * 0.76, 2),
+            "priceWithDiscount": round(price * 0.8, 2),
+            "isSupply": False,
+            "isRealization": True,
+            "saleID": f"S{9_000_000_000 + i}",
+            "srid": f"{h:016x}",
+        }
+
+    def wb_stock_row(self, i: int) -> dict:
+        h = _mix(i, self.seed + 17)
+        s = i // WB_WAREHOUSE_COUNT
+        quantity = h % 50 if h % 7 else 0
+        return {
+            "lastChangeDate": self.stocks.moment(i).strftime("%Y-%m-%dT%H:%M:%S"),
+            "warehouseName": WAREHOUSES[i % WB_WAREHOUSE_COUNT],
+            "supplierArticle": f"ART-{s:05d}",
+            "nmId": self.nm_id(s),
+            "barcode": f"2000{s:09d}",
+            "quantity": quantity,
+            "inWayToClient": (h >> 8) % 5,
+            "inWayFromClient": (h >> 12) % 3,
+            "quantityFull": quantity + (h >> 8) % 5,
+            "category": "Дом",
+            "subject": "Кружки",
+            "brand": "OpenClaw",
+            "Price": self.price(s),
+            "Discount": 20,
+        }
+
+    def wb_feedback(self, i: int) -> dict:
+        h = _mix(i, self.seed + 19)
+        s = self.sku_index(i, 3)
+        return {
+            "id": f"fb{i:09d}",
+            "text": _text(i, self.seed + 19),
+            "productValuation": 1 + h % 5,
+            "createdDate": self.feedback_times.moment(i).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "answer": None,
+            "state": "none",
+            "productDetails": {
+                "nmId": self.nm_id(s),
+                "productName": f"Кружка {s}",
+                "supplierArticle": f"ART-{s:05d}",
+                "brandName": "OpenClaw",
+            },
+            "userName": "Покупатель",
+            "photoLinks": None,
+        }
+
+    # ---------------------------------------------------------
+    # Ozon
+    # ---------------------------------------------------------
+
+    def ozon_operation(self, i: int) -> dict:
+        """
+        Операции идут тройками на отправление: доставка покупателю,
+        логистика и одна из прочих (хранение, эквайринг, возврат, штраф).
+        """
+        h = _mix(i, self.seed + 23)
+        posting = i // 3
+        s = self.sku_index(posting, 4)
+        price = self.price(s)
+
+        role = i % 3
+        if role == 0:
+            op_type = "OperationAgentDeliveredToCustomer"
+            accruals, commission = price, -round(price * 0.15, 2)
+            amount = round(accruals + commission, 2)
+        elif role == 1:
+            op_type = "MarketplaceServiceItemDirectFlowLogistic"
+            accruals, commission = 0.0, 0.0
+            amount = -float(40 + h % 80)
+        else:
+            op_type = OZON_EXTRA_OPS[h % 100]
+            accruals, commission = 0.0, 0.0
+            amount = -price if op_type == "ClientReturnAgentOperation" else -float(5 + h % 300)
+
+        moment = self.operations.moment(i)
+        return {
+            "operation_id": 20_000_000_000 + i,
+            "operation_type": op_type,
+            "operation_date": moment.strftime("%Y-%m-%d %H:%M:%S"),
+            "operation_type_name": OZON_OP_NAMES[op_type],
+            "delivery_charge": 0,
+            "return_delivery_charge": 0,
+            "accruals_for_sale": accruals,
+            "sale_commission": commission,
+            "amount": amount,
+            "type": "orders" if role == 0 else ("returns" if op_type == "ClientReturnAgentOperation" else "services"),
+            "posting": {
+                "delivery_schema": "FBO",
+                "order_date": (moment - timedelta(days=3)).strftime("%Y-%m-%d %H:%M:%S"),
+                "posting_number": f"{70_000_000 + posting // 10}-{posting % 10:04d}-1",
+                "warehouse_id": 1_000 + h % OZON_WAREHOUSE_COUNT,
+            },
+            "items": [{"name": f"Кружка {s}", "sku": self.ozon_sku(s)}],
+            "services": [],
+        }
+
+    def ozon_analytics_row(self, day_offset: int, s: int, metrics: list[str]) -> dict:
+        """
+        Строка /v1/analytics/data (день × SKU) — в формате, который
+        разбирает ozon/analytics/script.py: {"id", "value"} у измерений и метрик.
+        """
+        h = _mix(day_offset * self.skus + s, self.seed + 29)
+        units = h % 6 if s < self.skus // 2 else h % 2
+        values = {
+            "ordered_units": units,
+            "revenue": units * self.price(s),
+            "returns": int(units and (h >> 8) % 10 == 0),
+            "cancellations": int(units and (h >> 12) % 20 == 0),
+            "delivered_units": max(units - 1, 0),
+            "hits_view": (h >> 16) % 500,
+            "session_view": (h >> 24) % 200,
+        }
+        day = (self.start + timedelta(days=day_offset)).isoformat()
+        return {
+            "dimensions": [
+                {"id": "sku", "value": str(self.ozon_sku(s)), "name": f"Кружка {s}"},
+                {"id": "day", "value": day, "name": ""},
+            ],
+            "metrics": [{"id": m, "value": values.get(m, 0)} for m in metrics],
+        }
+
+    def ozon_stock_row(self, i: int) -> dict:
+        h = _mix(i, self.seed + 31)
+        s = i // OZON_WAREHOUSE_COUNT
+        free = h % 40 if h % 6 else 0
+        return {
+            "sku": self.ozon_sku(s),
+            "item_code": f"ART-{s:05d}",
+            "item_name": f"Кружка {s}",
+            "free_to_sell_amount": free,
+            "promised_amount": (h >> 8) % 4,
+            "reserved_amount": (h >> 12) % 3,
+            "warehouse_name": WAREHOUSES[i % OZON_WAREHOUSE_COUNT],
+        }
+
+    def ozon_review(self, i: int) -> dict:
+        h = _mix(i, self.seed + 37)
+        s = self.sku_index(i, 5)
+        review_id = f"r{i:09d}"
+        return {
+            "id": review_id,
+            "review_id": review_id,     # поле, которое читает ozon/autoanswers/script.py
+            "sku": self.ozon_sku(s),
+            "text": _text(i, self.seed + 37),
+            "rating": 1 + h % 5,
+            "published_at": self.feedback_times.moment(i).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "status": "UNPROCESSED",
+            "order_status": "DELIVERED",
+            "comments_amount": 0,
+            "photos_amount": 0,
+            "videos_amount": 0,
+            "is_rating_participant": True,
+        }
+
+    def ozon_question(self, i: int) -> dict:
+        s = self.sku_index(i, 6)
+        question_id = f"q{i:09d}"
+        return {
+            "id": question_id,
+            "question_id": question_id,  # поле, которое читает ozon/autoanswers/script.py
+            "sku": self.ozon_sku(s),
+            "text": _text(i, self.seed + 41, trigger_share=0.01),
+            "published_at": self.feedback_times.moment(i * 5).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "status": "NEW",
+            "author_name": "Покупатель",
+        }
+
+    def ozon_realization(self, year: int, month: int) -> dict:
+        """
+        Отчёт о реализации за месяц: доставки месяца, сгруппированные по SKU.
+        Считается один раз на месяц.
+        """
+        key = (year, month)
+        with self._realization_lock:
+            if key in self._realization_cache:
+                return self._realization_cache[key]
+
+        first = date(year, month, 1)
+        last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        lo, hi = self.operations.day_range(first, last)
+
+        by_sku = {}
+        for i in range(lo - lo % 3 + (3 if lo % 3 else 0), hi, 3):
+            op = self.ozon_operation(i)
+            sku = op["items"][0]["sku"]
+            row = by_sku.setdefault(sku, {"quantity": 0, "amount": 0.0, "commission": 0.0,
+                                          "price": op["accruals_for_sale"], "name": op["items"][0]["name"]})
+            row["quantity"] += 1
+            row["amount"] += op["accruals_for_sale"]
+            row["commission"] += -op["sale_commission"]
+
+        rows = []
+        for n, (sku, row) in enumerate(sorted(by_sku.items()), start=1):
+            rows.append({
+                "row_number": n,
+                "item": {"name": row["name"], "offer_id": f"ART-{sku - 1_000_000_000:05d}",
+                         "barcode": f"OZN{sku}", "sku": sku},
+                "commission_ratio": 0.15,
+                "seller_price_per_instance": row["price"],
+                "delivery_commission": {
+                    "amount": round(row["amount"], 2),
+                    "bonus": 0,
+                    "commission": round(row["commission"], 2),
+                    "compensation": 0,
+                    "price_per_instance": row["price"],
+                    "quantity": row["quantity"],
+                    "standard_fee": 0,
+                    "total": round(row["amount"] - row["commission"], 2),
+                },
+                "return_commission": None,
+            })
+
+        report = {
+            "result": {
+                "header": {
+                    "doc_date": (last + timedelta(days=5)).isoformat(),
+                    "num": f"{year}{month:02d}-1",
+                    "start_date": first.isoformat(),
+                    "stop_date": last.isoformat(),
+                    "currency_sys_name": "RUB",
+                    "payer_name": "ООО «Интернет Решения»",
+                    "receiver_name": "Продавец",
+                },
+                "rows": rows,
+            }
+        }
+        with self._realization_lock:
+            self._realization_cache[key] = report
+        return report
+
+
+# =============================================================
+# СБОИ
+# =============================================================
+
+class FaultInjector:
+    """
+    Задержка ответа, случайные 429 и 5xx и лимит запросов на токен.
+
+    latency, jitter — миллисекунды; rate_429, rate_5xx — доля запросов;
+    rate_limit — запросов в секунду на (токен, метод), 0 — без лимита.
+    """
+
+    def __init__(self, latency: float = 0, jitter: float = 0, rate_429: float = 0, rate_5xx: float = 0,
+                 retry_after: float = 1, rate_limit: float = 0, seed: int = DEFAULT_SEED):
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.buckets = {}       # (токен, путь) → (токенов, время)
+
+    def _limited(self, account: str, path: str) -> bool:
+        if not self.rate_limit:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            tokens, updated = self.buckets.get((account, path), (self.rate_limit, now))
+            tokens = min(self.rate_limit, tokens + (now - updated) * self.rate_limit)
+            if tokens < 1:
+                self.buckets[(account, path)] = (tokens, now)
+                return True
+            self.buckets[(account, path)] = (tokens - 1, now)
+            return False
+
+    def before(self, account: str, path: str) -> int | None:
+        """
+        Вызывается перед ответом. Возвращает код ошибки, которую надо
+        отдать вместо ответа, или None.
+        """
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            roll = self.random.random()
+        if delay:
+            time.sleep(delay)
+
+        if self._limited(account, path) or roll < self.rate_429:
+            return 429
+        if roll < self.rate_429 + self.rate_5xx:
+            return 503
+        return None
+
+
+# =============================================================
+# СЕРВЕР
+# =============================================================
+
+class BadRequest(Exception):
+    pass
+
+
+def _day(value: str) -> date:
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise BadRequest(f"некорректная дата: {value!r}")
+
+
+def _moment(value: str) -> datetime:
+    """
+    RFC3339 или дата; часовой пояс отбрасывается — данные симулятора в UTC.
+    """
+    value = str(value).replace("Z", "")
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f"некорректная дата: {value!r}")
+    return moment.replace(tzinfo=None)
+
+
+def _int(value, default: int, maximum: int | None = None) -> int:
+    try:
+        result = int(value) if value not in (None, "") else default
+    except (TypeError, ValueError):
+        raise BadRequest(f"некорректное число: {value!r}")
+    if result < 0:
+        raise BadRequest(f"отрицательное значение: {value!r}")
+    return min(result, maximum) if maximum else result
+
+
+class SimulatorAPI:
+    """
+    Обработчики методов: (метод, путь) → функция(запрос) → (код, тело).
+    Запрос — словарь {"query": {...}, "json": {...}}.
+    """
+
+    def __init__(self, data: SimulatedData):
+        self.data = data
+        self.routes = {
+            ("GET", "/api/v5/supplier/reportDetailByPeriod"): self.wb_report,
+            ("GET", "/api/v1/supplier/sales"): self.wb_sales,
+            ("GET", "/api/v1/supplier/stocks"): self.wb_stocks,
+            ("GET", "/api/v1/feedbacks"): self.wb_feedbacks,
+            ("PATCH", "/api/v1/feedbacks"): self.wb_answer,
+            ("POST", "/v1/analytics/data"): self.ozon_analytics,
+            ("POST", "/v2/analytics/stock_on_warehouses"): self.ozon_stocks,
+            ("POST", "/v1/analytics/product-queries"): self.ozon_queries,
+            ("POST", "/v3/finance/transaction/list"): self.ozon_transactions,
+            ("POST", "/v3/finance/transaction/totals"): self.ozon_totals,
+            ("POST", "/v1/finance/balance"): self.ozon_balance,
+            ("POST", "/v2/finance/realization"): self.ozon_realization,
+            ("POST", "/v1/review/list"): self.ozon_reviews,
+            ("POST", "/v1/review/comment/create"): self.ozon_review_answer,
+            ("POST", "/v1/question/list"): self.ozon_questions,
+            ("POST", "/v1/question/answer/create"): self.ozon_question_answer,
+        }
+
+    # ---------------------------------------------------------
+    # WB
+    # ---------------------------------------------------------
+
+    def wb_report(self, req):
+        """
+        Строки дней [dateFrom, dateTo] с rrd_id > rrdid, не больше limit.
+        """
+        q = req["query"]
+        lo, hi = self.data.report.day_range(_day(q.get("dateFrom")), _day(q.get("dateTo", q.get("dateFrom"))))
+        start = max(lo, _int(q.get("rrdid"), 0))
+        stop = min(hi, start + _int(q.get("limit"), WB_REPORT_MAX_LIMIT, WB_REPORT_MAX_LIMIT))
+        return 200, [self.data.wb_report_row(i) for i in range(start, stop)]
+
+    def _wb_changed_since(self, timeline: Timeline, row, page: int, req):
+        """
+        Строки с lastChangeDate >= dateFrom по возрастанию, страница — page строк.
+        """
+        start = timeline.index_at(_moment(req["query"].get("dateFrom", "1970-01-01")))
+        return 200, [row(i) for i in range(start, min(timeline.n, start + page))]
+
+    def wb_sales(self, req):
+        return self._wb_changed_since(self.data.sales, self.data.wb_sale_row, WB_SALES_PAGE, req)
+
+    def wb_stocks(self, req):
+        return self._wb_changed_since(self.data.stocks, self.data.wb_stock_row, WB_STOCKS_PAGE, req)
+
+    def wb_feedbacks(self, req):
+        q = req["query"]
+        if q.get("isAnswered", "false") != "false":
+            feedbacks = []
+        else:
+            ids = self.data.feedbacks.descending(_int(q.get("skip"), 0),
+                                                 _int(q.get("take"), 100, WB_FEEDBACKS_MAX_TAKE))
+            feedbacks = [self.data.wb_feedback(i) for i in ids]
+        return 200, {
+            "data": {
+                "countUnanswered": self.data.feedbacks.count,
+                "countArchive": self.data.feedbacks.n - self.data.feedbacks.count,
+                "feedbacks": feedbacks,
+            },
+            "error": False,
+            "errorText": "",
+        }
+
+    def wb_answer(self, req):
+        body = req["json"]
+        feedback_id = str(body.get("id", ""))
+        if not feedback_id.startswith("fb") or not body.get("text"):
+            raise BadRequest("нужны id и text")
+        if not self.data.feedbacks.remove(_int(feedback_id[2:], -1)):
+            return 404, {"error": True, "errorText": "Отзыв не найден или уже отвечен"}
+        return 200, {"data": None, "error": False, "errorText": ""}
+
+    # ---------------------------------------------------------
+    # Ozon: аналитика и склад
+    # ---------------------------------------------------------
+
+    def ozon_analytics(self, req):
+        body = req["json"]
+        d = self.data
+        first = max((_day(body.get("date_from")) - d.start).days, 0)
+        last = min((_day(body.get("date_to")) - d.start).days, d.days - 1)
+        total = max(last - first + 1, 0) * d.skus
+
+        offset = _int(body.get("offset"), 0)
+        limit = _int(body.get("limit"), OZON_MAX_PAGE_SIZE, OZON_MAX_PAGE_SIZE)
+        metrics = body.get("metrics") or ["revenue"]
+
+        rows = []
+        for i in range(offset, min(offset + limit, total)):
+            rows.append(d.ozon_analytics_row(first + i // d.skus, i % d.skus, metrics))
+        return 200, {"result": {"data": rows, "totals": [0 for _ in metrics]},
+                     "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")}
+
+    def ozon_stocks(self, req):
+        body = req["json"]
+        total = self.data.skus * OZON_WAREHOUSE_COUNT
+        offset = _int(body.get("offset"), 0)
+        limit = _int(body.get("limit"), OZON_MAX_PAGE_SIZE, OZON_MAX_PAGE_SIZE)
+        rows = [self.data.ozon_stock_row(i) for i in range(offset, min(offset + limit, total))]
+        return 200, {"result": {"rows": rows}}
+
+    def ozon_queries(self, req):
+        limit = _int(req["json"].get("limit"), 20, 100)
+        words = sorted(set(WORDS))[:limit]
+        return 200, {"data": [{"query": w, "hits_view": 1000 - n * 10, "position": n + 1}
+                              for n, w in enumerate(words)]}
+
+    # ---------------------------------------------------------
+    # Ozon: финансы
+    # ---------------------------------------------------------
+
+    def _operation_range(self, body) -> tuple[int, int]:
+        period = (body.get("filter") or {}).get("date") or {}
+        date_from, date_to = _moment(period.get("from")), _moment(period.get("to"))
+        if date_to < date_from:
+            raise BadRequest("date.to раньше date.from")
+        if (date_to - date_from).days >= OZON_MAX_PERIOD_DAYS:
+            raise BadRequest(f"период больше {OZON_MAX_PERIOD_DAYS} дней")
+        timeline = self.data.operations
+        return timeline.index_at(date_from), timeline.index_at(date_to + timedelta(seconds=1))
+
+    def ozon_transactions(self, req):
+        body = req["json"]
+        lo, hi = self._operation_range(body)
+        page = max(_int(body.get("page"), 1), 1)
+        page_size = _int(body.get("page_size"), OZON_MAX_PAGE_SIZE, OZON_MAX_PAGE_SIZE) or 1
+
+        start = lo + (page - 1) * page_size
+        operations = [self.data.ozon_operation(i) for i in range(start, min(hi, start + page_size))]
+        return 200, {"result": {
+            "operations": operations,
+            "page_count": math.ceil((hi - lo) / page_size),
+            "row_count": hi - lo,
+        }}
+
+    def ozon_totals(self, req):
+        lo, hi = self._operation_range(req["json"])
+        totals = {"accruals_for_sale": 0.0, "sale_commission": 0.0, "processing_and_delivery": 0.0,
+                  "refunds_and_cancellations": 0.0, "services_amount": 0.0, "compensation_amount": 0.0,
+                  "money_transfer": 0.0, "others_amount": 0.0}
+        for i in range(lo, hi):
+            op = self.data.ozon_operation(i)
+            totals["accruals_for_sale"] += op["accruals_for_sale"]
+            totals["sale_commission"] += op["sale_commission"]
+            if op["operation_type"] == "MarketplaceServiceItemDirectFlowLogistic":
+                totals["processing_and_delivery"] += op["amount"]
+            elif op["type"] == "returns":
+                totals["refunds_and_cancellations"] += op["amount"]
+            elif op["type"] == "services":
+                totals["services_amount"] += op["amount"]
+        return 200, {"result": {k: round(v, 2) for k, v in totals.items()}}
+
+    def ozon_balance(self, req):
+        return 200, {"result": {"balance": 125_000.0, "currency": "RUB"}}
+
+    def ozon_realization(self, req):
+        body = req["json"]
+        month, year = _int(body.get("month"), 0), _int(body.get("year"), 0)
+        if not 1 <= month <= 12 or not year:
+            raise BadRequest("нужны month и year")
+        today = datetime.utcnow().date()
+        if (year, month) >= (today.year, today.month):
+            return 404, {"code": 5, "message": "Отчёт за этот месяц ещё не сформирован"}
+        return 200, self.data.ozon_realization(year, month)
+
+    # ---------------------------------------------------------
+    # Ozon: отзывы и вопросы
+    # ---------------------------------------------------------
+
+    def ozon_reviews(self, req):
+        body = req["json"]
+        limit = _int(body.get("limit"), 50, 100)
+        last_id = body.get("last_id") or ""
+        reviews = self.data.reviews
+        below = _int(last_id[1:], reviews.n) if last_id.startswith("r") else reviews.n
+
+        ids = reviews.below(below, limit)
+        has_next = bool(ids) and reviews.rank(ids[-1]) > 0
+        return 200, {
+            "reviews": [self.data.ozon_review(i) for i in ids],
+            "last_id": f"r{ids[-1]:09d}" if ids else "",
+            "has_next": has_next,
+        }
+
+    def ozon_review_answer(self, req):
+        review_id = str(req["json"].get("review_id", ""))
+        if not review_id.startswith("r") or not req["json"].get("text"):
+            raise BadRequest("нужны review_id и text")
+        self.data.reviews.remove(_int(review_id[1:], -1))
+        return 200, {"comment_id": f"c{review_id[1:]}"}
+
+    def ozon_questions(self, req):
+        body = req["json"]
+        page = max(_int(body.get("page"), 1), 1)
+        page_size = _int(body.get("page_size"), 50, 100)
+        ids = self.data.questions.descending((page - 1) * page_size, page_size)
+        return 200, {"questions": [self.data.ozon_question(i) for i in ids]}
+
+    def ozon_question_answer(self, req):
+        question_id = str(req["json"].get("question_id", ""))
+        if not question_id.startswith("q") or not req["json"].get("text"):
+            raise BadRequest("нужны question_id и text")
+        self.data.questions.remove(_int(question_id[1:], -1))
+        return 200, {"answer_id": f"a{question_id[1:]}"}
+
+
+def make_server(data: SimulatedData, faults: FaultInjector | None = None,
+                host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    """
+    HTTP-сервер симулятора. GET /_stats — счётчики запросов.
+    """
+    api = SimulatorAPI(data)
+    faults = faults or FaultInjector()
+    stats = {"requests": 0, "bytes": 0, "errors": {}, "by_path": {}}
+    stats_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, body, headers: dict | None = None):
+            payload = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+            with stats_lock:
+                stats["requests"] += 1
+                stats["bytes"] += len(payload)
+                if status != 200:
+                    stats["errors"][status] = stats["errors"].get(status, 0) + 1
+
+        def _handle(self, method: str):
+            parts = urlsplit(self.path)
+            path = parts.path
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+
+            if path == "/_stats":
+                with stats_lock:
+                    snapshot = json.loads(json.dumps(stats))
+                return self._reply(200, snapshot)
+
+            handler = api.routes.get((method, path))
+            if handler is None:
+                return self._reply(404, {"code": 5, "message": f"{method} {path} не поддерживается"})
+
+            with stats_lock:
+                stats["by_path"][path] = stats["by_path"].get(path, 0) + 1
+
+            is_wb = path.startswith("/api/")
+            account = self.headers.get("Authorization") if is_wb else self.headers.get("Client-Id")
+            if not account or (not is_wb and not self.headers.get("Api-Key")):
+                return self._reply(401, {"code": 16, "message": "Нет токена"})
+
+            error = faults.before(account, path)
+            if error == 429:
+                retry = str(faults.retry_after)
+                return self._reply(429, {"code": 8, "message": "Слишком много запросов"},
+                                   {"Retry-After": retry, "X-Ratelimit-Retry": retry})
+            if error:
+                return self._reply(error, {"code": 13, "message": "Сервис временно недоступен"})
+
+            try:
+                body = json.loads(raw) if raw else {}
+                query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+                status, result = handler({"query": query, "json": body})
+            except (BadRequest, ValueError) as e:
+                return self._reply(400, {"code": 3, "message": str(e)})
+            self._reply(status, result)
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def do_PATCH(self):
+            self._handle("PATCH")
+
+        def log_message(self, fmt, *args):
+            logger.debug("[simulator] " + fmt % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_background(data: SimulatedData, faults: FaultInjector | None = None,
+                     host: str = "127.0.0.1", port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Запускает сервер в фоновом потоке (port=0 — любой свободный).
+    Возвращает (сервер, base_url). Остановка — server.shutdown().
+    """
+    server = make_server(data, faults, host, port)
+    threading.Thread(target=server.serve_forever, name="simulator", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# =============================================================
+# БЕНЧМАРК
+# =============================================================
+
+def simulator_config(base_url: str) -> dict:
+    """
+    Конфиг скилла, направленный в симулятор, без клиентских лимитов
+    (лимиты, если нужны, изображает сам симулятор).
+    """
+    from ozon.client import DEFAULT_RATE_LIMITS as OZON_LIMITS
+    from wb.client import DEFAULT_RATE_LIMITS as WB_LIMITS
+
+    def unlimited(limits):
+        return {key: [1_000_000, 1_000_000] for key in limits}
+
+    return {
+        "wb": {"enabled": True, "WB_API_TOKEN": {"apiKey": "simulator"},
+               "http": {"base_url": base_url, "rate_limits": unlimited(WB_LIMITS)}},
+        "ozon": {"enabled": True, "client_id": "1", "api_key": "simulator",
+                 "http": {"base_url": base_url, "rate_limits": unlimited(OZON_LIMITS)}},
+        "telegram": {},
+        "finance": {},
+    }
+
+
+def bench(data: SimulatedData, faults: FaultInjector | None = None) -> list[dict]:
+    """
+    Загрузка и разбор основных отчётов через настоящие модули скилла.
+    """
+    from ozon.analytics.script import get_sales_data
+    from ozon.client import configure_client as configure_ozon
+    from ozon.finance.script import finalize_transactions, fold_transactions, iter_transaction_pages, \
+        new_transactions_state
+    from wb.analytics.script import analyze_sales, get_sales_stats
+    from wb.client import configure_client as configure_wb
+    from wb.finance.script import finalize_report, fold_report_tuples, iter_report_pages, new_report_state
+    from wb.warehouse.script import analyze_stocks, get_stock_data
+
+    server, base_url = start_background(data, faults)
+    config = simulator_config(base_url)
+    configure_wb(config)
+    configure_ozon(config)
+
+    token = config["wb"]["WB_API_TOKEN"]["apiKey"]
+    headers = {"Client-Id": "1", "Api-Key": "simulator", "Content-Type": "application/json"}
+    date_from, date_to = data.start.isoformat(), data.end.isoformat()
+    recent_from = max(data.start, data.end - timedelta(days=OZON_MAX_PERIOD_DAYS - 1)).isoformat()
+
+    def wb_report():
+        state = new_report_state()
+        for rows in iter_report_pages(token, date_from, date_to, compact=True):
+            fold_report_tuples(state, rows)
+        return state["rows"], finalize_report(state, {})
+
+    def wb_sales():
+        rows = get_sales_stats(token, date_from, date_to)
+        return len(rows), analyze_sales(rows)
+
+    def wb_stocks():
+        rows = get_stock_data(token, date_from=date_from)
+        return len(rows), analyze_stocks(rows)
+
+    def ozon_transactions():
+        state = new_transactions_state()
+        for rows in iter_transaction_pages(headers, recent_from, date_to):
+            fold_transactions(state, rows)
+        return state["operations"], finalize_transactions(state, {})
+
+    def ozon_analytics():
+        report = get_sales_data(headers, recent_from, date_to)
+        days = (data.end - date.fromisoformat(recent_from)).days + 1
+        return days * data.skus, report
+
+    cases = [
+        ("wb reportDetailByPeriod", wb_report),
+        ("wb supplier/sales", wb_sales),
+        ("wb supplier/stocks", wb_stocks),
+        (f"ozon transaction/list ({OZON_MAX_PERIOD_DAYS} дн.)", ozon_transactions),
+        (f"ozon analytics/data ({OZON_MAX_PERIOD_DAYS} дн.)", ozon_analytics),
+    ]
+
+    results = []
+    try:
+        for name, fn in cases:
+            start = time.perf_counter()
+            rows, _ = fn()
+            seconds = time.perf_counter() - start
+            results.append({"case": name, "rows": rows, "seconds": round(seconds, 3),
+                            "rows_per_second": round(rows / seconds) if seconds else 0})
+    finally:
+        server.shutdown()
+    return results
+
+
+# почти-дубли кэша ответов WB (wb/answer_cache.py):
+# (отзыв в кэше, новый отзыв, должен ли найтись ответ)
+NEAR_DUPLICATE_CASES = [
+    ("всё отлично, спасибо большое", "Всё отлично, спасибо большое!!!", True),
+    ("всё отлично, спасибо большое", "спасибо большое, всё отлично", True),
+    ("всё отлично, спасибо большое", "всё не отлично, спасибо большое", False),
+    ("размер подошёл", "размер не подошёл", False),
+    ("качество хорошее, пришло быстро", "качество хорошее, но пришло не быстро", False),
+]
+
+
+def check_near_duplicates() -> list[str]:
+    """
+    Прогоняет NEAR_DUPLICATE_CASES на пустом кэше.
+    Возвращает описания ошибочных случаев (пустой список — всё верно).
+    """
+    from wb.answer_cache import AnswerCache
+
+    failed = []
+    for cached, text, expected in NEAR_DUPLICATE_CASES:
+        cache = AnswerCache(ttl=0)
+        cache.store(cached, 5, 1, "Спасибо за ваш отзыв!")
+        found = cache.lookup(text, 5, 1) is not None
+        if found != expected:
+            failed.append(f"{cached!r} → {text!r}: ожидалось {expected}, получено {found}")
+    return failed
+
+
+def check(data: SimulatedData, faults: FaultInjector | None = None) -> list[dict]:
+    """
+    Смоук-проверка точек входа против симулятора: модули импортируются,
+    полный прогон проходит без ошибок этапов.
+    Возвращает [{"case", "ok", "error"}].
+    """
+    import importlib
+
+    server, base_url = start_background(data, faults)
+    config = simulator_config(base_url)
+    date_from, date_to = data.start.isoformat(), data.end.isoformat()
+
+    def imports(module):
+        def case():
+            importlib.import_module(module)
+        return case
+
+    def wb_skill():
+        from wb.main import run_wb_skill
+        result = run_wb_skill(config, date_from, date_to)
+        if result.get("_errors"):
+            raise AssertionError(f"ошибки этапов: {result['_errors']}")
+
+    def wb_account():
+        from marketplace.accounts import configure_clients, run_account
+        configure_clients(config)
+        account = {"name": "wb-shop", "wb": config["wb"], "telegram": {}, "finance": {}}
+        result = run_account(account, date_from, date_to)
+        if result.get("_errors") or result.get("wb", {}).get("_errors"):
+            raise AssertionError(f"ошибки кабинета: {result.get('_errors') or result['wb']['_errors']}")
+        if "finance" not in result.get("wb", {}):
+            raise AssertionError("нет результата WB")
+
+    def accounts():
+        from marketplace.accounts import run_accounts
+        settings = {
+            "wb": config["wb"],
+            "ozon": config["ozon"],
+            "defaults": {"telegram": {}, "finance": {}},
+            "accounts": [
+                {"name": "wb-1", "wb": {"WB_API_TOKEN": {"apiKey": "wb-1"}}},
+                {"name": "ozon-1", "ozon": {"enabled": True, "client_id": "2", "api_key": "ozon-1"}},
+                {"name": "wb-2", "wb": {"WB_API_TOKEN": {"apiKey": "wb-2"}}},
+            ],
+        }
+        shared = {**settings, "defaults": {**settings["defaults"], "finance": {"aggregates_path": "shared.json"}}}
+        try:
+            run_accounts(shared, date_from, date_to)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("общий finance.aggregates_path у нескольких кабинетов не отклонён")
+
+        result = run_accounts(settings, date_from, date_to)
+        if result["_summary"]["failed"]:
+            raise AssertionError(f"кабинеты с ошибками: {result['_summary']['failed']}")
+        for name, mp in (("wb-1", "wb"), ("ozon-1", "ozon"), ("wb-2", "wb")):
+            account = result["accounts"].get(name, {})
+            if mp not in account:
+                raise AssertionError(f"{name}: нет результата {mp}")
+            if account[mp].get("_errors"):
+                raise AssertionError(f"{name}: ошибки этапов {account[mp]['_errors']}")
+
+    def sales_cube():
+        from ozon.analytics.cube import HAS_NUMPY
+        from ozon.analytics.script import analyze_sales, build_sales_cube, fetch_sales_rows, get_headers
+        from ozon.client import configure_client as configure_ozon
+        if not HAS_NUMPY:
+            return
+        configure_ozon(config)
+        rows, complete = fetch_sales_rows(get_headers(config), date_from, date_to, workers=4)
+        if not complete:
+            raise AssertionError("строки продаж загружены не полностью")
+
+        def rounded(value):
+            if isinstance(value, float):
+                return round(value, 2)
+            if isinstance(value, dict):
+                return {key: rounded(v) for key, v in value.items()}
+            if isinstance(value, (list, tuple)):
+                return [rounded(v) for v in value]
+            return value
+
+        expected = rounded(analyze_sales(rows))
+        actual = rounded(build_sales_cube(rows).summary())
+        if actual != expected:
+            diff = [key for key in expected if actual.get(key) != expected[key]]
+            raise AssertionError(f"куб расходится с analyze_sales по ключам {diff}")
+
+    def answer_cache():
+        failed = check_near_duplicates()
+        if failed:
+            raise AssertionError("; ".join(failed))
+
+    cases = [
+        ("import wb.main", imports("wb.main")),
+        ("import ozon.main", imports("ozon.main")),
+        ("wb run_wb_skill", wb_skill),
+        ("accounts: wb run_account", wb_account),
+        ("accounts: wb + ozon run_accounts", accounts),
+        ("ozon sales cube = analyze_sales", sales_cube),
+        ("wb answer cache: почти-дубли", answer_cache),
+    ]
+
+    results = []
+    try:
+        for name, fn in cases:
+            try:
+                fn()
+                results.append({"case": name, "ok": True, "error": None})
+            except Exception as e:
+                logger.exception(f"[simulator] {name}: ошибка")
+                results.append({"case": name, "ok": False, "error": f"{type(e).__name__}: {e}"})
+    finally:
+        server.shutdown()
+    return results
+
+
+# =============================================================
+# ЗАПУСК
+# =============================================================
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Локальный симулятор API WB и Ozon")
+    parser.add_argument("command", choices=["serve", "bench", "check"])
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="строк отчёта WB, продаж WB и операций Ozon")
+    parser.add_argument("--skus", type=int, default=DEFAULT_SKUS)
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    parser.add_argument("--feedbacks", type=int, default=DEFAULT_FEEDBACKS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0, help="задержка ответа, мс")
+    parser.add_argument("--jitter", type=float, default=0, help="случайная добавка к задержке, мс")
+    parser.add_argument("--rate-429", type=float, default=0, help="доля ответов 429")
+    parser.add_argument("--rate-5xx", type=float, default=0, help="доля ответов 503")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After в ответах 429, с")
+    parser.add_argument("--rate-limit", type=float, default=0, help="запросов в секунду на токен и метод")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    data = SimulatedData(rows=args.rows, skus=args.skus, days=args.days,
+                         feedbacks=args.feedbacks, seed=args.seed)
+    faults = FaultInjector(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                           rate_5xx=args.rate_5xx, retry_after=args.retry_after,
+                           rate_limit=args.rate_limit, seed=args.seed)
+
+    if args.command == "serve":
+        server = make_server(data, faults, args.host, args.port)
+        logger.info(f"[simulator] http://{args.host}:{args.port} — {args.rows} строк, "
+                    f"{args.skus} SKU, {data.start} → {data.end}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.command == "check":
+        results = check(data, faults)
+        for r in results:
+            print(f"{'ok' if r['ok'] else 'FAIL':<5} {r['case']}" + (f" — {r['error']}" if r["error"] else ""))
+        raise SystemExit(0 if all(r["ok"] for r in results) else 1)
+
+    print(f"{'сценарий':<34} {'строк':>10} {'секунд':>9} {'строк/с':>10}")
+    for r in bench(data, faults):
+        print(f"{r['case']:<34} {r['rows']:>10} {r['seconds']:>9.2f} {r['rows_per_second']:>10}")
+
+
+if __name__ == "__main__":
+    main()
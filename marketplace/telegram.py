@@ -0,0 +1,310 @@
+# =============================================================
+# marketplace/telegram.py
+#
+# Очередь исходящих сообщений в Telegram для WB и Ozon:
+#   ✔ отправка в фоновом потоке — обработка отзывов и отчётов
+#     не ждёт Telegram
+#   ✔ лимиты Telegram: не чаще сообщения в секунду в один чат
+#     и ~25 сообщений в секунду на бота
+#   ✔ триггерные алерты, накопившиеся за несколько секунд,
+#     склеиваются в одно сообщение-сводку
+#   ✔ 429 (retry_after), 5xx и сетевые ошибки → повтор в фоне
+#   ✔ при выходе из процесса очередь дописывается (atexit)
+#
+# Использование:
+#   from marketplace.telegram import get_outbox
+#   get_outbox().alert(bot_token, chat_id, "⚠️ Триггерный отзыв ...")
+#   get_outbox().send(bot_token, chat_id, report, parse_mode="Markdown")
+#   get_outbox().flush(timeout=30)      # дождаться отправки (крон)
+#   ok = get_outbox().deliver(bot_token, chat_id, digest)   # дождаться итога
+# =============================================================
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import requests
+
+from marketplace import metrics
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://api.telegram.org/bot{token}/sendMessage"
+
+MAX_MESSAGE_LENGTH = 4096
+DEFAULT_CHAT_INTERVAL = 1.0      # секунд между сообщениями в один чат
+DEFAULT_GLOBAL_RATE = 25.0       # сообщений в секунду на все чаты
+DEFAULT_COALESCE_WINDOW = 3.0    # сколько секунд копить алерты перед отправкой
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF = 2.0            # секунды, удваивается с каждой попыткой
+MAX_BACKOFF = 300.0
+FLUSH_TIMEOUT = 30.0
+DELIVERY_TIMEOUT = 120.0         # сколько deliver() ждёт доставки (с повторами)
+
+ALERT_SEPARATOR = "\n\n———\n\n"
+
+
+class _Message:
+    __slots__ = ("text", "parse_mode", "coalesce", "created", "attempt", "futures", "count")
+
+    def __init__(self, text, parse_mode, coalesce):
+        self.text = text
+        self.parse_mode = parse_mode
+        self.coalesce = coalesce
+        self.created = time.monotonic()
+        self.attempt = 0
+        self.futures = [Future()]
+        self.count = 1           # сколько исходных сообщений внутри (после склейки > 1)
+
+
+class TelegramOutbox:
+    """
+    Очередь на каждый чат (бот, chat_id) и один фоновый поток-отправитель.
+    send()/alert() только кладут сообщение в очередь и сразу возвращают
+    Future, который завершится True/False после доставки или отказа.
+    """
+
+    def __init__(self, chat_interval=DEFAULT_CHAT_INTERVAL, global_rate=DEFAULT_GLOBAL_RATE,
+                 coalesce_window=DEFAULT_COALESCE_WINDOW, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff=DEFAULT_BACKOFF):
+        self.chat_interval = chat_interval
+        self.global_interval = 1 / global_rate if global_rate else 0.0
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+
+        self._cond = threading.Condition()
+        self._queues = {}        # (bot_token, chat_id) → deque[_Message]
+        self._next_at = {}       # (bot_token, chat_id) → когда можно слать в чат
+        self._global_next_at = 0.0
+        self._pending = 0
+        self._sending = 0
+        self._thread = None
+
+        self.stats = {"queued": 0, "sent": 0, "coalesced": 0, "retries": 0, "failed": 0}
+
+    # ---------------------------------------------------------
+    # Постановка в очередь
+    # ---------------------------------------------------------
+
+    def send(self, bot_token, chat_id, text, parse_mode=None, coalesce=False):
+        message = _Message(text, parse_mode, coalesce)
+        if not bot_token or not chat_id or not text:
+            message.futures[0].set_result(False)
+            return message.futures[0]
+
+        with self._cond:
+            self._queues.setdefault((bot_token, str(chat_id)), deque()).append(message)
+            self._pending += 1
+            self.stats["queued"] += 1
+            self._ensure_thread()
+            self._cond.notify()
+
+        metrics.record(telegram_messages=1)
+        return message.futures[0]
+
+    def alert(self, bot_token, chat_id, text):
+        """
+        Алерт: может быть склеен с соседними алертами того же чата.
+        """
+        return self.send(bot_token, chat_id, text, coalesce=True)
+
+    def deliver(self, bot_token, chat_id, text, parse_mode=None, timeout=DELIVERY_TIMEOUT):
+        """
+        Ставит сообщение в очередь и ждёт итога: True — Telegram принял
+        сообщение, False — отказ, повторы исчерпаны или истёк timeout.
+        """
+        future = self.send(bot_token, chat_id, text, parse_mode=parse_mode)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            logger.warning(f"[telegram] Сообщение в чат {chat_id} не доставлено за {timeout:.0f} с")
+            return False
+
+    def flush(self, timeout=None):
+        """
+        Ждёт, пока очередь опустеет. Возвращает False по таймауту.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._sending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="telegram-outbox", daemon=True)
+            self._thread.start()
+
+    # ---------------------------------------------------------
+    # Фоновый поток
+    # ---------------------------------------------------------
+
+    def _ready_at(self, key, queue):
+        """
+        Когда можно отправлять голову очереди чата: лимит чата
+        и, для алерта, окно накопления.
+        """
+        ready = self._next_at.get(key, 0.0)
+        head = queue[0]
+        if head.coalesce and head.attempt == 0:
+            ready = max(ready, head.created + self.coalesce_window)
+        return ready
+
+    def _take(self, queue):
+        """
+        Снимает с головы очереди сообщение для отправки. Подряд идущие
+        алерты склеиваются, пока влезают в лимит длины сообщения.
+        """
+        head = queue.popleft()
+        if not head.coalesce or not queue or not queue[0].coalesce:
+            return head
+
+        parts = [head.text]
+        futures = list(head.futures)
+        length = len(head.text)
+
+        while queue and queue[0].coalesce:
+            nxt = queue[0]
+            if length + len(ALERT_SEPARATOR) + len(nxt.text) > MAX_MESSAGE_LENGTH - 100:
+                break
+            queue.popleft()
+            parts.append(nxt.text)
+            futures.extend(nxt.futures)
+            length += len(ALERT_SEPARATOR) + len(nxt.text)
+
+        # склеенное сообщение дальше не склеивается (coalesce=False)
+        merged = _Message(f"⚠️ Алертов: {len(parts)}" + ALERT_SEPARATOR + ALERT_SEPARATOR.join(parts), None, False)
+        merged.futures = futures
+        merged.count = len(parts)
+        self.stats["coalesced"] += len(parts) - 1
+        return merged
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    wake_at = None
+                    chosen = None
+
+                    for key, queue in self._queues.items():
+                        if not queue:
+                            continue
+                        ready = max(self._ready_at(key, queue), self._global_next_at)
+                        if ready <= now:
+                            chosen = key
+                            break
+                        wake_at = ready if wake_at is None else min(wake_at, ready)
+
+                    if chosen is not None:
+                        break
+                    self._cond.wait(None if wake_at is None else wake_at - now)
+
+                message = self._take(self._queues[chosen])
+                self._pending -= message.count
+                self._sending += message.count
+                self._global_next_at = now + self.global_interval
+                self._next_at[chosen] = now + self.chat_interval
+
+            ok, retry_after = self._deliver(chosen, message)
+
+            with self._cond:
+                self._sending -= message.count
+                if retry_after is not None and message.attempt < self.max_retries:
+                    # повтор — в голову очереди этого чата, после паузы
+                    message.attempt += 1
+                    self._queues[chosen].appendleft(message)
+                    self._pending += message.count
+                    self._next_at[chosen] = time.monotonic() + retry_after
+                    self.stats["retries"] += 1
+                else:
+                    self.stats["sent" if ok else "failed"] += 1
+                    for future in message.futures:
+                        future.set_result(ok)
+                self._cond.notify_all()
+
+    def _deliver(self, key, message):
+        """
+        Один запрос к Telegram. Возвращает (доставлено, пауза перед повтором
+        или None, если повторять не нужно).
+        """
+        bot_token, chat_id = key
+        payload = {"chat_id": chat_id, "text": message.text, "disable_web_page_preview": True}
+        if message.parse_mode:
+            payload["parse_mode"] = message.parse_mode
+
+        backoff = min(self.backoff * (2 ** message.attempt), MAX_BACKOFF)
+
+        try:
+            r = self.session.post(API_URL.format(token=bot_token), json=payload, timeout=10)
+        except requests.RequestException as e:
+            logger.warning(f"[telegram] Ошибка сети: {e} — повтор через {backoff:.0f} с")
+            return False, backoff
+
+        if r.status_code == 200:
+            return True, None
+
+        try:
+            body = r.json()
+        except ValueError:
+            body = {}
+
+        if r.status_code == 429:
+            retry_after = body.get("parameters", {}).get("retry_after") or backoff
+            logger.warning(f"[telegram] 429 для чата {chat_id} — повтор через {retry_after} с")
+            return False, min(float(retry_after), MAX_BACKOFF)
+
+        if r.status_code >= 500:
+            logger.warning(f"[telegram] Код {r.status_code} — повтор через {backoff:.0f} с")
+            return False, backoff
+
+        # битая Markdown-разметка — отправляем тот же текст без разметки
+        if r.status_code == 400 and message.parse_mode and "parse" in body.get("description", ""):
+            logger.warning("[telegram] Не разобралась разметка — отправляем без неё")
+            message.parse_mode = None
+            return False, 0.0
+
+        logger.error(f"[telegram] Код {r.status_code}: {r.text[:200]}")
+        return False, None
+
+
+# =============================================================
+# ОБЩИЙ ЭКЗЕМПЛЯР
+# =============================================================
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox(config=None):
+    """
+    Очередь, общая для всех модулей процесса. Настройки при первом вызове —
+    из config["telegram"]["outbox"]:
+        {"chat_interval": 1.0, "global_rate": 25, "coalesce_window": 3.0, "max_retries": 5}
+    """
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            cfg = ((config or {}).get("telegram") or {}).get("outbox", {})
+            _outbox = TelegramOutbox(
+                chat_interval=cfg.get("chat_interval", DEFAULT_CHAT_INTERVAL),
+                global_rate=cfg.get("global_rate", DEFAULT_GLOBAL_RATE),
+                coalesce_window=cfg.get("coalesce_window", DEFAULT_COALESCE_WINDOW),
+                max_retries=cfg.get("max_retries", DEFAULT_MAX_RETRIES),
+            )
+            atexit.register(_flush_on_exit)
+        return _outbox
+
+
+def _flush_on_exit():
+    if _outbox is not None and not _outbox.flush(FLUSH_TIMEOUT):
+        logger.warning("[telegram] Не все сообщения отправлены до выхода")
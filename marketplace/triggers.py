@@ -0,0 +1,356 @@
+# =============================================================
+# marketplace/triggers.py
+#
+# Общий движок триггерных слов для автоответов WB и Ozon:
+#   ✔ словари слов и фраз → автомат Ахо — Корасик над основами слов
+#   ✔ лёгкий стеммер: «судом», «юристу», «полицией» ловятся
+#     по словарным «суд», «юрист», «полиция»
+#   ✔ основа словаря ловит и производные слова, которые с неё
+#     начинаются: «обман» → «обманщики», «суд» → «судебный»
+#   ✔ страховка: словарные фразы и корни юридических угроз, штрафов
+#     и жалоб дополнительно ищутся подстрокой, как в прежней проверке, —
+#     всё, что ловила она, ловится и сейчас (кроме слов-исключений
+#     вроде «посуда» и «пожалуйста»)
+#   ✔ общий словарь + добавки маркетплейса + правки из конфига
+#   ✔ классификация пачки текстов: словарь пачки стеммится один раз,
+#     автомат запускается только для текстов-кандидатов
+#
+# Использование:
+#   from marketplace.triggers import get_trigger_engine
+#   engine = get_trigger_engine(config, "wb")
+#   engine.contains("Подам на вас в суд")              # → True
+#   engine.classify_batch(["всё ок", "вызову полицию"])  # → [[], ["полиция"]]
+#
+# Бенчмарк: python -m marketplace.benchmark
+# =============================================================
+
+import re
+import threading
+from collections import deque
+from functools import lru_cache
+
+# -------------------------------------------------------------
+# СЛОВАРИ
+# -------------------------------------------------------------
+
+COMMON_TRIGGERS = [
+    "суд", "судиться", "подаю в суд", "полиция", "прокуратура",
+    "заявление", "юрист", "мошенники", "обман", "верните деньги",
+]
+
+MARKETPLACE_TRIGGERS = {
+    "wb": [
+        "жалоба в суд", "накажу", "гнев", "угроза", "разберусь",
+    ],
+    "ozon": [
+        "жалоба", "адвокат", "роспотребнадзор", "штраф",
+    ],
+}
+
+# Корни юридических угроз, мошенничества, штрафов и жалоб — ищутся
+# подстрокой в тексте всегда (вместе со словарными фразами), даже если
+# стеммер не свёл форму к словарной: «оштрафовали», «разгневан»,
+# «нажалуюсь». Для фильтра эскалаций пропуск хуже лишнего срабатывания.
+FALLBACK_SUBSTRINGS = (
+    "мошенн", "обман", "в суд", "судеб", "засуд", "юрист",
+    "прокурат", "прокурор", "адвокат", "полици", "роспотребнадзор",
+    "штраф", "гнев", "жало", "жалу",
+)
+
+# Слова, которые начинаются с основы «суд», но к суду отношения не имеют
+PREFIX_EXCEPTIONS = ("судьб", "судак", "судн", "судар")
+
+# Начала слов, которые поиск подстрокой задевает по ошибке
+# («посуда» — «суд», «пожалуйста» — «жалу»): перед ним они убираются
+SUBSTRING_EXCEPTIONS = PREFIX_EXCEPTIONS + ("посуд", "пожалуй")
+
+
+# -------------------------------------------------------------
+# НОРМАЛИЗАЦИЯ
+# -------------------------------------------------------------
+
+_WORD = re.compile(r"\w+")
+
+# разделитель текстов в пачке — не буква, поэтому не склеится со словами
+_SEPARATOR = "\x1f"
+
+MIN_STEM = 3
+
+# до стольких подстрок одиночный текст проверяется ими напрямую,
+# больше — сначала отбор по 3-граммам
+_DIRECT_ROOTS = 64
+
+_REFLEXIVE = ("ся", "сь")
+
+# окончания существительных, прилагательных и глаголов — от длинных к коротким.
+# У слов на -ие/-ия «и» остаётся в основе: «заявление» → «заявлени»,
+# иначе оно совпало бы с «заявлено».
+_ENDINGS = sorted({
+    "ями", "ами", "ях", "ах", "ей", "ой", "ый",
+    "ов", "ев", "ом", "ем", "ам", "ям", "ую", "юю", "ая", "яя", "ое", "ее", "ые",
+    "ого", "его", "ому", "ему", "ыми", "ими", "ых", "их",
+    "ье", "ья", "ью", "ьи", "ьей", "ьем",
+    "ить", "ать", "ять", "еть", "уть", "ти",
+    "ила", "или", "ило", "ала", "али", "ало", "ела", "ели", "ело",
+    "ула", "ули", "ул", "ил", "ал", "ел",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+}, key=len, reverse=True)
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """
+    Отрезает возвратную частицу и одно окончание, оставляя
+    основу не короче MIN_STEM букв: «судиться» → «суд», «полицией» → «полици».
+    Слово должно быть уже в нижнем регистре с «ё» → «е».
+    """
+    for suffix in _REFLEXIVE:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            word = word[:-len(suffix)]
+            break
+
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+@lru_cache(maxsize=100_000)
+def _chunk_stems(chunk):
+    """
+    Основы слов куска текста между пробелами («суд!», «юристу,полиции»).
+    """
+    return tuple(stem(token) for token in _WORD.findall(chunk))
+
+
+def stem_tokens(text):
+    text = (text or "").lower().replace("ё", "е")
+    return [token for chunk in text.split() for token in _chunk_stems(chunk)]
+
+
+# -------------------------------------------------------------
+# АВТОМАТ
+# -------------------------------------------------------------
+
+class TriggerEngine:
+    """
+    Автомат Ахо — Корасик, алфавит — основы слов.
+    Фраза из нескольких слов срабатывает, только если её слова
+    идут в тексте подряд. Основа текста, которая начинается
+    с основы словаря, считается этой основой («обманщик» → «обман»).
+    """
+
+    def __init__(self, phrases, fallback=FALLBACK_SUBSTRINGS):
+        self.phrases = []
+        self.fallback = tuple(dict.fromkeys(
+            [*fallback, *(phrase.lower().replace("ё", "е") for phrase in phrases)]))
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for phrase in phrases:
+            self._add(phrase)
+        self._build()
+
+        # алфавит автомата: основы, с которых может начинаться слово текста
+        self._alphabet = {token for edges in self._goto for token in edges}
+        self._prefix_lengths = sorted({len(t) for t in self._alphabet if len(t) >= MIN_STEM}, reverse=True)
+        self._chunk_tokens = lru_cache(maxsize=100_000)(self._chunk_tokens_impl)
+
+        # подстроки — по первой 3-грамме: в тексте проверяются только те,
+        # чья 3-грамма в нём есть (короткие и с пробелом — всегда)
+        self._roots_by_trigram = {}
+        self._plain_roots = []
+        for root in self.fallback:
+            if len(root) >= 3 and " " not in root[:3]:
+                self._roots_by_trigram.setdefault(root[:3], []).append(root)
+            else:
+                self._plain_roots.append(root)
+
+    def _add(self, phrase):
+        tokens = stem_tokens(phrase)
+        if not tokens:
+            return
+
+        state = 0
+        for token in tokens:
+            nxt = self._goto[state].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][token] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+
+        self._out[state] += (len(self.phrases),)
+        self.phrases.append(phrase)
+
+    def _build(self):
+        """
+        Суффиксные ссылки обходом в ширину; выходы состояния
+        дополняются выходами его суффиксной ссылки.
+        """
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, nxt in self._goto[state].items():
+                queue.append(nxt)
+
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(token, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def _canon(self, token):
+        """
+        Основа словаря, с которой начинается основа текста (самая длинная),
+        или сама основа текста.
+        """
+        if token in self._alphabet:
+            return token
+        if token.startswith(PREFIX_EXCEPTIONS):
+            return token
+        for n in self._prefix_lengths:
+            if n < len(token) and token[:n] in self._alphabet:
+                return token[:n]
+        return token
+
+    def _chunk_tokens_impl(self, chunk):
+        return tuple(self._canon(token) for token in _chunk_stems(chunk))
+
+    def _tokens(self, text):
+        text = (text or "").lower().replace("ё", "е")
+        return [token for chunk in text.split() for token in self._chunk_tokens(chunk)]
+
+    def _candidates(self, words):
+        """
+        Подстроки, которые могут встретиться в тексте из слов words.
+        """
+        by_trigram = self._roots_by_trigram
+        found = set(self._plain_roots)
+        for word in words:
+            for i in range(len(word) - 2):
+                roots = by_trigram.get(word[i:i + 3])
+                if roots:
+                    found.update(roots)
+        return [root for root in self.fallback if root in found]
+
+    def _fallback(self, text):
+        """
+        Корни-страховки и словарные фразы, найденные подстрокой
+        (text уже в нижнем регистре). Слова-исключения не учитываются.
+        """
+        text = drop_exception_words(text)
+        roots = self.fallback if len(self.fallback) <= _DIRECT_ROOTS else self._candidates(text.split())
+        return [root for root in roots if root in text]
+
+    def _scan(self, tokens):
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+
+        for token in tokens:
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if out[state]:
+                found.update(out[state])
+
+        return found
+
+    def match(self, text):
+        """
+        Сработавшие словарные фразы (в порядке словаря); если их нет —
+        корни-страховки, найденные подстрокой.
+        """
+        found = [self.phrases[i] for i in sorted(self._scan(self._tokens(text)))]
+        return found or self._fallback((text or "").lower().replace("ё", "е"))
+
+    def contains(self, text):
+        return bool(self.match(text))
+
+    def classify_batch(self, texts):
+        """
+        Список сработавших фраз для каждого текста пачки.
+
+        Пачка склеивается и приводится к нижнему регистру одним вызовом,
+        словарь пачки (уникальные слова) стеммится один раз. Тексты,
+        в которых нет ни одного слова с основой из начала какой-либо
+        фразы, отсеиваются проверкой множеств без запуска автомата;
+        для них остаётся только поиск корней-страховок.
+        """
+        joined = _SEPARATOR.join((text or "").replace(_SEPARATOR, " ") for text in texts)
+        joined = joined.lower().replace("ё", "е")
+
+        first = self._goto[0]
+        hot = {chunk for chunk in set(joined.split()) if not first.keys().isdisjoint(self._chunk_tokens(chunk))}
+
+        # подстроки ищутся в пачке без слов-исключений, и только те,
+        # что встретились в пачке хотя бы раз
+        cleaned = drop_exception_words(joined)
+        roots = [root for root in self._candidates(set(cleaned.split())) if root in cleaned]
+        cleaned_texts = cleaned.split(_SEPARATOR) if roots else ()
+
+        results = []
+        for i, text in enumerate(joined.split(_SEPARATOR) if texts else ()):
+            chunks = text.split()
+            found = ()
+            if not hot.isdisjoint(chunks):
+                found = self._scan(token for chunk in chunks for token in self._chunk_tokens(chunk))
+            found = [self.phrases[j] for j in sorted(found)]
+            if not found and roots:
+                found = [root for root in roots if root in cleaned_texts[i]]
+            results.append(found)
+        return results
+
+
+# -------------------------------------------------------------
+# ОБЩИЕ ЭКЗЕМПЛЯРЫ
+# -------------------------------------------------------------
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+_EXCEPTION_WORDS = re.compile(r"\b(?:" + "|".join(SUBSTRING_EXCEPTIONS) + r")\w*")
+
+
+def drop_exception_words(text):
+    """
+    Текст без слов из SUBSTRING_EXCEPTIONS (text уже в нижнем регистре).
+    """
+    return _EXCEPTION_WORDS.sub(" ", text)
+
+
+def build_phrases(marketplace, config=None):
+    """
+    Итоговый словарь: общий + словарь маркетплейса + правки из конфига:
+        "triggers": {
+            "add": [...], "remove": [...],          # для всех маркетплейсов
+            "wb": {"add": [...], "remove": [...]}   # только для WB
+        }
+    """
+    triggers_cfg = (config or {}).get("triggers", {})
+    local_cfg = triggers_cfg.get(marketplace, {})
+
+    phrases = COMMON_TRIGGERS + MARKETPLACE_TRIGGERS.get(marketplace, [])
+    phrases += triggers_cfg.get("add", []) + local_cfg.get("add", [])
+
+    removed = {p.lower() for p in triggers_cfg.get("remove", []) + local_cfg.get("remove", [])}
+    return list(dict.fromkeys(p for p in phrases if p.lower() not in removed))
+
+
+def get_trigger_engine(config=None, marketplace="wb"):
+    """
+    Скомпилированный автомат для маркетплейса. Кэшируется по итоговому
+    словарю — пересобирается, только если словарь поменялся.
+    """
+    phrases = tuple(build_phrases(marketplace, config))
+    with _engines_lock:
+        engine = _engines.get(phrases)
+        if engine is None:
+            engine = _engines[phrases] = TriggerEngine(phrases)
+        return engine
@@ -0,0 +1,323 @@
+# =============================================================
+# ozon/analytics/cube.py
+#
+# Куб продаж день × SKU по строкам /v1/analytics/data (NumPy):
+#   ✔ оси — коды SKU (в порядке появления) и сплошной ряд дней
+#   ✔ на каждую метрику — массив [SKU × день]
+#     (ordered_units, revenue, returns, cancellations, delivered_units)
+#   ✔ срезы, свёртки и топы — операциями над массивами,
+#     без повторной загрузки и без прохода по строкам:
+#     по SKU за любой отрезок, по дням, по неделям, топ-N, рост к прошлому периоду
+#   ✔ summary() — тот же отчёт, что script.analyze_sales()
+#     (by_week — только по запросу)
+#   ✔ save() / load() — сжатый .npz на диске
+#
+# Куб включается ozon.analytics.cube = true. NumPy — опциональная
+# зависимость: без неё script.get_sales_data остаётся на построчном
+# analyze_sales(). Куб плотный, поэтому слишком большая сетка
+# SKU × день (больше DEFAULT_MAX_CELLS ячеек) тоже не строится.
+# =============================================================
+
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+METRICS = (
+    "ordered_units",
+    "revenue",
+    "returns",
+    "cancellations",
+    "delivered_units",
+)
+
+# Метрики-счётчики (в отчёте — int), остальные — суммы в рублях.
+# Как в analyze_sales(), значение каждой строки отбрасывает дробную часть.
+INT_METRICS = {"ordered_units", "returns", "cancellations", "delivered_units"}
+
+# Ячеек SKU × день, больше которых куб не строится (≈ 48 байт на ячейку)
+DEFAULT_MAX_CELLS = 2_000_000
+
+
+class SalesCube:
+    """
+    Куб продаж: skus — значения SKU по кодам, start — первый день оси,
+    values — {метрика: float64-массив [len(skus) × дней]},
+    rows — int32-массив [SKU × день]: сколько строк API попало в ячейку
+    (отличает «продаж не было» от «данных за день нет»).
+    """
+
+    def __init__(self, skus: list, start: date, values: dict, rows):
+        self.skus = list(skus)
+        self.start = start
+        self.values = values
+        self.rows = rows
+        self._sku_index = {sku: i for i, sku in enumerate(self.skus)}
+
+    # ---------------------------------------------------------
+    # Построение
+    # ---------------------------------------------------------
+
+    @classmethod
+    def from_rows(cls, rows: list) -> "SalesCube":
+        """
+        Куб из строк /v1/analytics/data с измерениями sku и day.
+        Строки без дня в куб не попадают (script.build_sales_cube для
+        таких данных куб не строит).
+        """
+        sku_codes = {}
+        day_codes = {}
+        sku_idx = []
+        day_keys = []
+        columns = {metric: [] for metric in METRICS}
+
+        for row in rows:
+            sku, day = "unknown", ""
+            for dim in row.get("dimensions", []):
+                if dim["id"] == "sku":
+                    sku = dim["value"]
+                elif dim["id"] == "day":
+                    day = dim["value"]
+            if not day:
+                continue
+
+            code = sku_codes.get(sku)
+            if code is None:
+                code = sku_codes[sku] = len(sku_codes)
+            sku_idx.append(code)
+            day_keys.append(day)
+            day_codes[day] = None
+
+            found = dict.fromkeys(METRICS, 0)
+            for m in row.get("metrics", []):
+                if m["id"] in found:
+                    found[m["id"]] = float(m.get("value", 0))
+            for metric in METRICS:
+                value = found[metric]
+                columns[metric].append(int(value) if metric in INT_METRICS else value)
+
+        if not day_codes:
+            return cls.empty()
+
+        days = sorted(day_codes)
+        start = date.fromisoformat(days[0])
+        n_days = (date.fromisoformat(days[-1]) - start).days + 1
+        for day in days:
+            day_codes[day] = (date.fromisoformat(day) - start).days
+
+        n_skus = len(sku_codes)
+        flat = np.asarray(sku_idx, np.int64) * n_days + np.fromiter(
+            map(day_codes.__getitem__, day_keys), np.int64, len(day_keys))
+        size = n_skus * n_days
+
+        values = {
+            metric: np.bincount(flat, weights=np.asarray(columns[metric], np.float64),
+                                minlength=size).reshape(n_skus, n_days)
+            for metric in METRICS
+        }
+        counts = np.bincount(flat, minlength=size).astype(np.int32).reshape(n_skus, n_days)
+        return cls(list(sku_codes), start, values, counts)
+
+    @classmethod
+    def empty(cls) -> "SalesCube":
+        return cls([], date.today(), {metric: np.zeros((0, 0)) for metric in METRICS},
+                   np.zeros((0, 0), np.int32))
+
+    # ---------------------------------------------------------
+    # Оси
+    # ---------------------------------------------------------
+
+    @property
+    def n_days(self) -> int:
+        return self.rows.shape[1]
+
+    @property
+    def end(self) -> date:
+        return self.start + timedelta(days=self.n_days - 1)
+
+    def days(self) -> list[str]:
+        return [(self.start + timedelta(days=i)).isoformat() for i in range(self.n_days)]
+
+    def _day_span(self, date_from: str | None, date_to: str | None) -> tuple[int, int]:
+        """
+        Индексы [first, last) дней отрезка, обрезанные по оси.
+        """
+        first = (date.fromisoformat(date_from) - self.start).days if date_from else 0
+        last = (date.fromisoformat(date_to) - self.start).days + 1 if date_to else self.n_days
+        return max(first, 0), max(min(last, self.n_days), 0)
+
+    # ---------------------------------------------------------
+    # Срезы
+    # ---------------------------------------------------------
+
+    def slice(self, date_from: str | None = None, date_to: str | None = None,
+              skus: list | None = None) -> "SalesCube":
+        """
+        Под-куб: отрезок дней и/или подмножество SKU (неизвестные SKU пропускаются).
+        """
+        first, last = self._day_span(date_from, date_to)
+        if skus is None:
+            sku_list = self.skus
+            idx = slice(None)
+        else:
+            sku_list = [sku for sku in skus if sku in self._sku_index]
+            idx = [self._sku_index[sku] for sku in sku_list]
+
+        start = self.start + timedelta(days=first)
+        values = {metric: array[idx, first:last] for metric, array in self.values.items()}
+        return SalesCube(sku_list, start, values, self.rows[idx, first:last])
+
+    # ---------------------------------------------------------
+    # Свёртки
+    # ---------------------------------------------------------
+
+    @staticmethod
+    def _number(metric: str, value):
+        # суммы целых в float64 точны — округление лишь убирает тип
+        return int(round(value)) if metric in INT_METRICS else float(value)
+
+    def total(self, metric: str, date_from: str | None = None, date_to: str | None = None):
+        first, last = self._day_span(date_from, date_to)
+        return self._number(metric, self.values[metric][:, first:last].sum())
+
+    def by_sku(self, metric: str, date_from: str | None = None, date_to: str | None = None) -> dict:
+        """
+        SKU → сумма метрики за отрезок (все SKU куба, с нулями).
+        """
+        first, last = self._day_span(date_from, date_to)
+        sums = self.values[metric][:, first:last].sum(axis=1)
+        return {sku: self._number(metric, value) for sku, value in zip(self.skus, sums)}
+
+    def by_day(self, metric: str, only_present: bool = True) -> dict:
+        """
+        День → сумма метрики по всем SKU. only_present — только дни,
+        за которые в кубе есть строки.
+        """
+        sums = self.values[metric].sum(axis=0)
+        present = self.rows.sum(axis=0) > 0
+        return {
+            day: self._number(metric, value)
+            for day, value, has_rows in zip(self.days(), sums, present)
+            if has_rows or not only_present
+        }
+
+    def by_week(self, metric: str, per_sku: bool = False) -> dict:
+        """
+        Понедельник недели → сумма метрики (per_sku=True — {SKU: сумма} на неделю).
+        Неполные крайние недели считаются по имеющимся дням.
+        """
+        if not self.n_days:
+            return {}
+        # номер недели каждого дня оси, считая от понедельника первой недели
+        offset = self.start.weekday()
+        week_of_day = (np.arange(self.n_days) + offset) // 7
+        n_weeks = int(week_of_day[-1]) + 1
+        first_monday = self.start - timedelta(days=offset)
+
+        array = self.values[metric]
+        weekly = np.zeros((array.shape[0], n_weeks))
+        np.add.at(weekly, (slice(None), week_of_day), array)
+
+        result = {}
+        for w in range(n_weeks):
+            monday = (first_monday + timedelta(weeks=w)).isoformat()
+            if per_sku:
+                result[monday] = {sku: self._number(metric, v) for sku, v in zip(self.skus, weekly[:, w])}
+            else:
+                result[monday] = self._number(metric, weekly[:, w].sum())
+        return result
+
+    def top(self, metric: str, n: int = 5, date_from: str | None = None, date_to: str | None = None) -> list:
+        """
+        Топ-n SKU по метрике за отрезок: [(sku, значение), ...].
+        """
+        first, last = self._day_span(date_from, date_to)
+        sums = self.values[metric][:, first:last].sum(axis=1)
+        # стабильная сортировка — при равенстве порядок как у SKU в кубе
+        order = np.argsort(-sums, kind="stable")[:n]
+        return [(self.skus[i], self._number(metric, sums[i])) for i in order]
+
+    def growth(self, metric: str, date_from: str, date_to: str) -> dict:
+        """
+        Рост по SKU: отрезок [date_from, date_to] против такого же отрезка
+        перед ним. {sku: {"current", "previous", "change_pct"}};
+        previous = None, если предыдущий отрезок не целиком в кубе.
+        """
+        first, last = self._day_span(date_from, date_to)
+        length = last - first
+        current = self.values[metric][:, first:last].sum(axis=1)
+        has_previous = first - length >= 0 and length > 0
+        previous = self.values[metric][:, first - length:first].sum(axis=1) if has_previous else None
+
+        result = {}
+        for i, sku in enumerate(self.skus):
+            cur = self._number(metric, current[i])
+            if previous is None:
+                result[sku] = {"current": cur, "previous": None, "change_pct": None}
+                continue
+            prev = self._number(metric, previous[i])
+            change = round((cur - prev) / prev * 100, 1) if prev else None
+            result[sku] = {"current": cur, "previous": prev, "change_pct": change}
+        return result
+
+    # ---------------------------------------------------------
+    # Отчёт
+    # ---------------------------------------------------------
+
+    def summary(self, by_week: bool = False) -> dict:
+        """
+        Отчёт в формате script.analyze_sales() — из массивов, без строк.
+        by_week=True — дополнительно выручка по неделям ("by_week").
+        """
+        orders = self.by_sku("ordered_units")
+        revenue = self.by_sku("revenue")
+        returns = self.by_sku("returns")
+
+        total_orders = sum(orders.values())
+        total_revenue = self.total("revenue")
+        avg_check = total_revenue / total_orders if total_orders > 0 else 0.0
+
+        by_sku = {
+            sku: {"orders": orders[sku], "revenue": revenue[sku], "returns": returns[sku]}
+            for sku in self.skus
+        }
+
+        report = {
+            "orders": total_orders,
+            "revenue": round(total_revenue, 2),
+            "returns": sum(returns.values()),
+            "avg_check": round(avg_check, 2),
+            "top_sku": [(sku, by_sku[sku]) for sku, _ in self.top("revenue", 5)],
+            "by_sku": by_sku,
+            "by_date": self.by_day("revenue"),
+        }
+        if by_week:
+            report["by_week"] = self.by_week("revenue")
+        return report
+
+    # ---------------------------------------------------------
+    # Диск
+    # ---------------------------------------------------------
+
+    def save(self, path: str) -> None:
+        """
+        Сжатый .npz: оси, счётчик строк и массивы метрик.
+        SKU сохраняются строками.
+        """
+        np.savez_compressed(
+            path,
+            skus=np.asarray([str(sku) for sku in self.skus], dtype=str),
+            start=np.asarray(self.start.isoformat()),
+            rows=self.rows,
+            **{f"metric_{metric}": array for metric, array in self.values.items()},
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "SalesCube":
+        with np.load(path) as data:
+            values = {metric: data[f"metric_{metric}"] for metric in METRICS}
+            return cls(data["skus"].tolist(), date.fromisoformat(str(data["start"])), values, data["rows"])
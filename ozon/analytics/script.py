@@ -12,11 +12,26 @@
 import requests
 import logging
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from marketplace import metrics
+from marketplace.pages import DEFAULT_PAGE_WORKERS, fetch_offset_pages
+from ozon.analytics.cube import DEFAULT_MAX_CELLS, HAS_NUMPY, SalesCube
+from ozon.analytics.store import DEFAULT_MUTABLE_DAYS, cached_rows, open_cache
+from ozon.client import get_client
 
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://api-seller.ozon.ru"
 
+# Строк на страницу /v1/analytics/data и /v2/analytics/stock_on_warehouses
+PAGE_LIMIT = 1000
+
+# Страниц /v1/analytics/data в полёте: лимит метода 1 запрос/с, запросы
+# наперёд только ждут в очереди клиента и тратят квоту за последней страницей
+DEFAULT_SALES_WORKERS = 1
+
 
 def get_headers(config: dict) -> dict:
     return {
@@ -30,13 +45,20 @@ def get_headers(config: dict) -> dict:
 # АНАЛИТИКА ПРОДАЖ: /v1/analytics/data
 # -------------------------------------------------------------
 
-def get_sales_data(headers: dict, date_from: str, date_to: str) -> dict:
+def fetch_sales_rows(headers: dict, date_from: str, date_to: str,
+                     workers: int = DEFAULT_PAGE_WORKERS) -> tuple[list, bool]:
     """
-    Получает аналитические данные по продажам за период.
+    Строки аналитики продаж за период.
 
     Документация: POST /v1/analytics/data
     Метрики: ordered_units, revenue, returns, cancellations
     Группировка: по SKU и по дням
+
+    Если первая страница полная, следующие offset запрашиваются
+    параллельно, не больше workers сразу (marketplace/pages.py).
+    У метода свой жёсткий лимит (ozon/client.py), поэтому по умолчанию
+    страницы продаж идут подряд — ozon.analytics.page_workers = 1.
+    Возвращает (строки, загрузка завершена).
     """
     url = f"{BASE_URL}/v1/analytics/data"
     payload = {
@@ -51,40 +73,119 @@ def get_sales_data(headers: dict, date_from: str, date_to: str) -> dict:
         ],
         "dimension": ["sku", "day"],
         "filters": [],
-        "limit": 1000,
+        "limit": PAGE_LIMIT,
         "offset": 0,
         "sort": [
             {"key": "revenue", "order": "DESC"}
         ],
     }
 
-    all_rows = []
-    offset = 0
-
-    while True:
-        payload["offset"] = offset
+    def fetch_page(offset: int) -> list | None:
         try:
-            r = requests.post(url, headers=headers, json=payload, timeout=30)
+            r = get_client().post(url, headers=headers, json={**payload, "offset": offset}, timeout=30)
         except requests.RequestException as e:
             logger.error(f"[ozon:analytics] Ошибка запроса: {e}")
-            break
+            return None
 
         if r.status_code != 200:
             logger.warning(f"[ozon:analytics] Код: {r.status_code} | {r.text[:200]}")
-            break
+            return None
 
-        data = r.json()
+        with metrics.timer("json_seconds"):
+            data = r.json()
         rows = data.get("result", {}).get("data", [])
-        if not rows:
-            break
+        metrics.record(rows=len(rows))
+        return rows
+
+    return fetch_offset_pages(fetch_page, PAGE_LIMIT, workers)
+
+
+def get_sales_data(headers: dict, date_from: str, date_to: str,
+                   workers: int = DEFAULT_PAGE_WORKERS, analytics_cfg: dict | None = None) -> dict:
+    """
+    Получает аналитические данные по продажам за период.
+
+    analytics_cfg (ozon.analytics):
+    - cache_path — дневной кэш строк (store.py): из API берутся только
+      недостающие дни и последние mutable_days дней;
+    - cube — считать отчёт по кубу день × SKU (cube.py, нужен NumPy);
+      тот же отчёт, что analyze_sales();
+    - by_week — добавить выручку по неделям (только с кубом);
+    - cube_path — сохранить куб на диск;
+    - cube_max_cells — больше ячеек SKU × день — построчный analyze_sales().
+    """
+    analytics_cfg = analytics_cfg or {}
+    cube_path = analytics_cfg.get("cube_path")
+
+    if analytics_cfg.get("cache_path"):
+        all_rows = get_cached_sales_rows(headers, date_from, date_to, analytics_cfg, workers)
+    else:
+        all_rows, _ = fetch_sales_rows(headers, date_from, date_to, workers)
+
+    if not analytics_cfg.get("cube"):
+        with metrics.timer("analyze_seconds"):
+            return analyze_sales(all_rows)
+
+    with metrics.timer("analyze_seconds"):
+        cube = build_sales_cube(all_rows, analytics_cfg.get("cube_max_cells", DEFAULT_MAX_CELLS))
+        if cube is None:
+            return analyze_sales(all_rows)
+        report = cube.summary(by_week=bool(analytics_cfg.get("by_week")))
+
+    if cube_path:
+        try:
+            cube.save(cube_path)
+        except OSError as e:
+            logger.error(f"[ozon:analytics] Не удалось сохранить куб {cube_path}: {e}")
+    return report
 
-        all_rows.extend(rows)
 
-        if len(rows) < 1000:
-            break
-        offset += 1000
+def get_cached_sales_rows(headers: dict, date_from: str, date_to: str, analytics_cfg: dict,
+                          workers: int = DEFAULT_PAGE_WORKERS) -> list:
+    """
+    Строки за период через дневной кэш (ozon/analytics/store.py).
+    """
+    def fetch(range_from: str, range_to: str) -> tuple[list, bool]:
+        return fetch_sales_rows(headers, range_from, range_to, workers)
+
+    conn = open_cache(analytics_cfg["cache_path"])
+    try:
+        rows, complete = cached_rows(
+            conn, fetch, date_from, date_to,
+            mutable_days=analytics_cfg.get("mutable_days", DEFAULT_MUTABLE_DAYS),
+        )
+    finally:
+        conn.close()
 
-    return analyze_sales(all_rows)
+    if not complete:
+        logger.warning("[ozon:analytics] Часть дней не загружена — в отчёте данные кэша и неполные страницы")
+    return rows
+
+
+def build_sales_cube(rows: list, max_cells: int = DEFAULT_MAX_CELLS) -> SalesCube | None:
+    """
+    Куб день × SKU или None — без NumPy, для строк без измерения day
+    (их учитывает только построчный analyze_sales()) и если сетка
+    SKU × день больше max_cells ячеек.
+    """
+    if not HAS_NUMPY:
+        return None
+
+    skus, days = set(), set()
+    for row in rows:
+        dims = {d.get("id"): d.get("value") for d in row.get("dimensions", [])}
+        if not dims.get("day"):
+            return None
+        skus.add(dims.get("sku", "unknown"))
+        days.add(dims["day"])
+
+    if days:
+        span = (date.fromisoformat(max(days)) - date.fromisoformat(min(days))).days + 1
+        if len(skus) * span > max_cells:
+            logger.warning(f"[ozon:analytics] Куб {len(skus)} SKU × {span} дн. больше {max_cells} ячеек — "
+                           f"отчёт считается построчно")
+            return None
+    return SalesCube.from_rows(rows)
 
 
 def analyze_sales(rows: list) -> dict:
@@ -138,44 +239,39 @@ def analyze_sales(rows: list) -> dict:
 # СКЛАД: /v2/analytics/stock_on_warehouses
 # -------------------------------------------------------------
 
-def get_stock_data(headers: dict) -> dict:
+def get_stock_data(headers: dict, workers: int = DEFAULT_PAGE_WORKERS) -> dict:
     """
-    Остатки по складам.
+    Остатки по складам. Страницы после первой — параллельно, как в get_sales_data().
 
     Документация: POST /v2/analytics/stock_on_warehouses
     """
     url = f"{BASE_URL}/v2/analytics/stock_on_warehouses"
     payload = {
-        "limit": 1000,
+        "limit": PAGE_LIMIT,
         "offset": 0,
         "warehouse_type": "ALL",  # FBO + FBS
     }
 
-    all_rows = []
-    offset = 0
-
-    while True:
-        payload["offset"] = offset
+    def fetch_page(offset: int) -> list | None:
         try:
-            r = requests.post(url, headers=headers, json=payload, timeout=20)
+            r = get_client().post(url, headers=headers, json={**payload, "offset": offset}, timeout=20)
         except requests.RequestException as e:
             logger.error(f"[ozon:stock] Ошибка запроса: {e}")
-            break
+            return None
 
         if r.status_code != 200:
             logger.warning(f"[ozon:stock] Код: {r.status_code} | {r.text[:200]}")
-            break
+            return None
 
-        rows = r.json().get("result", {}).get("rows", [])
-        if not rows:
-            break
+        with metrics.timer("json_seconds"):
+            rows = r.json().get("result", {}).get("rows", [])
+        metrics.record(rows=len(rows))
+        return rows
 
-        all_rows.extend(rows)
-        if len(rows) < 1000:
-            break
-        offset += 1000
+    all_rows, _ = fetch_offset_pages(fetch_page, PAGE_LIMIT, workers)
 
-    return analyze_stocks(all_rows)
+    with metrics.timer("analyze_seconds"):
+        return analyze_stocks(all_rows)
 
 
 def analyze_stocks(rows: list) -> dict:
@@ -237,7 +333,7 @@ def get_product_queries(headers: dict, date_from: str, date_to: str, limit: int
     }
 
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=15)
+        r = get_client().post(url, headers=headers, json=payload, timeout=15)
         if r.status_code == 200:
             return r.json().get("data", [])
     except Exception as e:
@@ -253,20 +349,29 @@ def get_product_queries(headers: dict, date_from: str, date_to: str, limit: int
 def process(config: dict, date_from: str, date_to: str) -> dict:
     """
     Основная точка входа аналитики.
+
+    Продажи, склад и поисковые запросы загружаются одновременно;
+    страницы склада — параллельно, не больше config["ozon"]["page_workers"]
+    (по умолчанию 4), продаж — ozon.analytics.page_workers (по умолчанию 1).
+    Лимиты кабинета соблюдает общий клиент (ozon/client.py).
     """
     if not config.get("ozon", {}).get("enabled"):
         return {}
 
     headers = get_headers(config)
-
-    # Продажи
-    sales = get_sales_data(headers, date_from, date_to)
-
-    # Склад
-    stock = get_stock_data(headers)
-
-    # Поисковые запросы
-    queries = get_product_queries(headers, date_from, date_to)
+    workers = config["ozon"].get("page_workers", DEFAULT_PAGE_WORKERS)
+    analytics_cfg = config["ozon"].get("analytics", {})
+    sales_workers = analytics_cfg.get("page_workers", DEFAULT_SALES_WORKERS)
+
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="ozon-analytics") as pool:
+        # Продажи
+        sales = pool.submit(metrics.bind(get_sales_data), headers, date_from, date_to, sales_workers, analytics_cfg)
+        # Склад
+        stock = pool.submit(metrics.bind(get_stock_data), headers, workers)
+        # Поисковые запросы
+        queries = pool.submit(metrics.bind(get_product_queries), headers, date_from, date_to)
+
+        sales, stock, queries = sales.result(), stock.result(), queries.result()
 
     return {
         "sales": sales,
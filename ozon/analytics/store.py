@@ -0,0 +1,172 @@
+# =============================================================
+# ozon/analytics/store.py
+#
+# Дневной кэш строк /v1/analytics/data (SQLite):
+#   ✔ строки хранятся по дням (измерение day) — как пришли из API
+#   ✔ планировщик запросов: из API берутся только отрезки подряд
+#     идущих дней, которых нет в кэше или которые ещё могут
+#     измениться (последние mutable_days дней)
+#   ✔ период собирается из кэша и свежезагруженных дней —
+#     скользящий отчёт за 30 дней стоит одного-двух запросов
+#     вместо полного окна каждый раз
+#
+# Лимит /v1/analytics/data у Ozon один из самых жёстких —
+# кэш экономит именно запросы к нему.
+# =============================================================
+
+import json
+import logging
+import sqlite3
+from collections.abc import Callable
+from datetime import date, datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "ozon_analytics.db"
+
+# Сколько последних дней считаются изменяемыми и перезапрашиваются
+DEFAULT_MUTABLE_DAYS = 3
+
+# fetch(date_from, date_to) -> (строки, загрузка завершена)
+RangeFetch = Callable[[str, str], tuple[list, bool]]
+
+
+# =============================================================
+# СХЕМА
+# =============================================================
+
+def open_cache(path: str = DEFAULT_CACHE_PATH) -> sqlite3.Connection:
+    """
+    Открывает (и при необходимости создаёт) кэш.
+    """
+    conn = sqlite3.connect(path)
+
+    # Загруженные дни; final = 1 — день закрыт и больше не запрашивается
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS analytics_days (
+        day TEXT PRIMARY KEY,
+        final INTEGER
+    )
+    """)
+    # Строки дня в порядке ответа API
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS analytics_rows (
+        day TEXT,
+        pos INTEGER,
+        data TEXT,
+        PRIMARY KEY (day, pos)
+    )
+    """)
+
+    conn.commit()
+    return conn
+
+
+def row_day(row: dict) -> str:
+    for dim in row.get("dimensions", []):
+        if dim.get("id") == "day":
+            return dim.get("value") or ""
+    return ""
+
+
+# =============================================================
+# ЧТЕНИЕ / ЗАПИСЬ
+# =============================================================
+
+def load_rows(conn: sqlite3.Connection, date_from: str, date_to: str) -> list[dict]:
+    cur = conn.execute(
+        "SELECT data FROM analytics_rows WHERE day >= ? AND day <= ? ORDER BY day, pos",
+        (date_from, date_to),
+    )
+    return [json.loads(data) for (data,) in cur]
+
+
+def save_range(conn: sqlite3.Connection, date_from: str, date_to: str, rows: list[dict],
+               final_before: str) -> None:
+    """
+    Заменяет дни отрезка загруженными строками. Дни без строк тоже
+    записываются — «продаж не было» не запрашивается повторно.
+    Дни раньше final_before помечаются окончательными.
+    """
+    positions = {}
+    records = []
+    for row in rows:
+        day = row_day(row)
+        if not date_from <= day <= date_to:
+            continue
+        pos = positions[day] = positions.get(day, -1) + 1
+        records.append((day, pos, json.dumps(row, ensure_ascii=False)))
+
+    conn.execute("DELETE FROM analytics_rows WHERE day >= ? AND day <= ?", (date_from, date_to))
+    conn.executemany("INSERT INTO analytics_rows (day, pos, data) VALUES (?, ?, ?)", records)
+    conn.executemany(
+        "INSERT OR REPLACE INTO analytics_days (day, final) VALUES (?, ?)",
+        [(day, int(day < final_before)) for day in _days(date_from, date_to)],
+    )
+    conn.commit()
+
+
+# =============================================================
+# ПЛАНИРОВЩИК
+# =============================================================
+
+def _days(date_from: str, date_to: str) -> list[str]:
+    start, end = date.fromisoformat(date_from), date.fromisoformat(date_to)
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+def plan_requests(conn: sqlite3.Connection, date_from: str, date_to: str) -> list[tuple[str, str]]:
+    """
+    Отрезки подряд идущих дней периода, которые нужно взять из API:
+    дней нет в кэше или они ещё не окончательные.
+    """
+    final = {
+        day for (day,) in conn.execute(
+            "SELECT day FROM analytics_days WHERE day >= ? AND day <= ? AND final = 1",
+            (date_from, date_to),
+        )
+    }
+
+    ranges = []
+    for day in _days(date_from, date_to):
+        if day in final:
+            continue
+        if ranges and date.fromisoformat(ranges[-1][1]) + timedelta(days=1) == date.fromisoformat(day):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+def cached_rows(conn: sqlite3.Connection, fetch: RangeFetch, date_from: str, date_to: str,
+                mutable_days: int = DEFAULT_MUTABLE_DAYS, today: date | None = None) -> tuple[list, bool]:
+    """
+    Строки за период: недостающие и изменяемые дни — из API (fetch по
+    отрезку на каждую дыру), остальные — из кэша.
+    Дни позже сегодняшнего не запрашиваются. Незавершённый отрезок
+    попадает в результат вместо кэша за те же дни, но не сохраняется.
+    Возвращает (строки по дням, все запросы завершены).
+    """
+    today = today or datetime.now(timezone.utc).date()
+    final_before = (today - timedelta(days=mutable_days - 1)).isoformat()
+    fetch_to = min(date_to, today.isoformat())
+
+    ranges = plan_requests(conn, date_from, fetch_to) if date_from <= fetch_to else []
+    logger.info(f"[ozon:analytics-cache] {date_from} – {date_to}: отрезков к загрузке из API {len(ranges)}")
+
+    unsaved = []
+    unsaved_days = set()
+    for range_from, range_to in ranges:
+        rows, ok = fetch(range_from, range_to)
+        if ok:
+            save_range(conn, range_from, range_to, rows, final_before)
+        else:
+            logger.warning(f"[ozon:analytics-cache] {range_from} – {range_to}: загрузка не завершена, дни не сохранены")
+            unsaved.extend(rows)
+            unsaved_days.update(_days(range_from, range_to))
+
+    rows = load_rows(conn, date_from, date_to)
+    if unsaved_days:
+        rows = [row for row in rows if row_day(row) not in unsaved_days] + unsaved
+        rows.sort(key=row_day)
+    return rows, not unsaved_days
@@ -14,6 +14,11 @@ import requests
 import logging
 import os
 
+from marketplace import metrics
+from marketplace.telegram import get_outbox
+from marketplace.triggers import get_trigger_engine
+from ozon.client import get_client
+
 try:
     import openai
 except ImportError:
@@ -25,18 +30,11 @@ BASE_URL = "https://api-seller.ozon.ru"
 
 # -------------------------------------------------------------
 # ТРИГГЕРНЫЕ СЛОВА (угрозы, юридические претензии)
+# Словари и движок — общие с WB: marketplace/triggers.py
 # -------------------------------------------------------------
-TRIGGER_WORDS = [
-    "суд", "судиться", "полиция", "прокуратура",
-    "жалоба", "заявление", "юрист", "адвокат",
-    "мошенники", "обман", "верните деньги",
-    "подаю в суд", "роспотребнадзор", "штраф",
-]
-
 
-def contains_trigger(text: str) -> bool:
-    text = text.lower()
-    return any(word in text for word in TRIGGER_WORDS)
+def contains_trigger(text: str, config: dict | None = None) -> bool:
+    return get_trigger_engine(config, "ozon").contains(text)
 
 
 # -------------------------------------------------------------
@@ -74,14 +72,14 @@ def get_openai_key(config: dict) -> str | None:
 # -------------------------------------------------------------
 
 def send_to_telegram(config: dict, text: str) -> None:
+    """
+    Алерт в очередь Telegram — без ожидания отправки
+    (лимиты, склейка и повторы — в marketplace/telegram.py).
+    """
     bot_token, chat_id = get_tg_config(config)
     if not bot_token or not chat_id:
         return
-    try:
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        requests.post(url, json={"chat_id": chat_id, "text": text}, timeout=10)
-    except Exception as e:
-        logger.error(f"[ozon:tg] Ошибка: {e}")
+    get_outbox(config).alert(bot_token, chat_id, text)
 
 
 # -------------------------------------------------------------
@@ -93,17 +91,24 @@ def call_openai(prompt: str, api_key: str) -> str | None:
         return None
     try:
         client = openai.OpenAI(api_key=api_key)
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": (
-                    "Ты помощник продавца на маркетплейсе Ozon. "
-                    "Отвечай вежливо, по делу, не более 3 предложений."
-                )},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200,
-            temperature=0.7,
+        with metrics.timer("llm_seconds"):
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[
+                    {"role": "system", "content": (
+                        "Ты помощник продавца на маркетплейсе Ozon. "
+                        "Отвечай вежливо, по делу, не более 3 предложений."
+                    )},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=200,
+                temperature=0.7,
+            )
+        usage = getattr(response, "usage", None)
+        metrics.record(
+            llm_calls=1,
+            llm_prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            llm_completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
         )
         return response.choices[0].message.content.strip()
     except Exception as e:
@@ -113,13 +118,20 @@ def call_openai(prompt: str, api_key: str) -> str | None:
 
 def call_local_ai(prompt: str) -> str:
     try:
-        r = requests.post(
-            "http://localhost:11434/api/generate",
-            json={"model": "mistral", "prompt": prompt, "stream": False},
-            timeout=30,
-        )
+        with metrics.timer("llm_seconds"):
+            r = requests.post(
+                "http://localhost:11434/api/generate",
+                json={"model": "mistral", "prompt": prompt, "stream": False},
+                timeout=30,
+            )
         if r.status_code == 200:
-            return r.json().get("response", "").strip()
+            data = r.json()
+            metrics.record(
+                llm_calls=1,
+                llm_prompt_tokens=data.get("prompt_eval_count", 0),
+                llm_completion_tokens=data.get("eval_count", 0),
+            )
+            return data.get("response", "").strip()
     except Exception as e:
         logger.error(f"[ozon:ollama] Ошибка: {e}")
     return "Спасибо за ваш отзыв! Мы ценим ваше мнение."
@@ -161,7 +173,7 @@ def get_reviews(headers: dict, last_id: str = "") -> tuple[list, str]:
     }
 
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=15)
+        r = get_client().post(url, headers=headers, json=payload, timeout=15)
     except requests.RequestException as e:
         logger.error(f"[ozon:reviews] Ошибка запроса: {e}")
         return [], ""
@@ -172,6 +184,7 @@ def get_reviews(headers: dict, last_id: str = "") -> tuple[list, str]:
 
     data = r.json()
     reviews = data.get("reviews", [])
+    metrics.record(rows=len(reviews))
     next_last_id = data.get("last_id", "")
     return reviews, next_last_id
 
@@ -189,7 +202,7 @@ def send_review_answer(headers: dict, review_id: str, text: str) -> bool:
     }
 
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=10)
+        r = get_client().post(url, headers=headers, json=payload, timeout=10)
         return r.status_code == 200
     except Exception as e:
         logger.error(f"[ozon:reviews] Ошибка отправки ответа: {e}")
@@ -204,6 +217,7 @@ def process_reviews(config: dict) -> list:
         return []
 
     headers = get_headers(config)
+    engine = get_trigger_engine(config, "ozon")
     results = []
     last_id = ""
 
@@ -212,7 +226,10 @@ def process_reviews(config: dict) -> list:
         if not reviews:
             break
 
-        for review in reviews:
+        # Триггеры — для всей страницы разом
+        triggers = engine.classify_batch([review.get("text", "") for review in reviews])
+
+        for review, matched in zip(reviews, triggers):
             review_id = review.get("review_id") or review.get("uuid")
             if not review_id:
                 continue
@@ -220,11 +237,11 @@ def process_reviews(config: dict) -> list:
             text = review.get("text", "")
 
             # Триггер → Telegram без ответа
-            if contains_trigger(text):
+            if matched:
                 send_to_telegram(config,
                     f"⚠️ Ozon — триггерный отзыв\n\n{text[:500]}\n\nID: {review_id}"
                 )
-                results.append({"id": review_id, "action": "sent_to_telegram"})
+                results.append({"id": review_id, "action": "sent_to_telegram", "triggers": matched})
                 continue
 
             # Генерируем и отправляем ответ
@@ -264,7 +281,7 @@ def get_questions(headers: dict, page: int = 1) -> list:
     }
 
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=15)
+        r = get_client().post(url, headers=headers, json=payload, timeout=15)
     except requests.RequestException as e:
         logger.error(f"[ozon:questions] Ошибка запроса: {e}")
         return []
@@ -273,7 +290,9 @@ def get_questions(headers: dict, page: int = 1) -> list:
         logger.warning(f"[ozon:questions] Код: {r.status_code} | {r.text[:200]}")
         return []
 
-    return r.json().get("questions", [])
+    questions = r.json().get("questions", [])
+    metrics.record(rows=len(questions))
+    return questions
 
 
 def send_question_answer(headers: dict, question_id: str, text: str) -> bool:
@@ -289,7 +308,7 @@ def send_question_answer(headers: dict, question_id: str, text: str) -> bool:
     }
 
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=10)
+        r = get_client().post(url, headers=headers, json=payload, timeout=10)
         return r.status_code == 200
     except Exception as e:
         logger.error(f"[ozon:questions] Ошибка отправки ответа: {e}")
@@ -304,6 +323,7 @@ def process_questions(config: dict) -> list:
         return []
 
     headers = get_headers(config)
+    engine = get_trigger_engine(config, "ozon")
     results = []
     page = 1
 
@@ -312,7 +332,9 @@ def process_questions(config: dict) -> list:
         if not questions:
             break
 
-        for q in questions:
+        triggers = engine.classify_batch([q.get("text", "") for q in questions])
+
+        for q, matched in zip(questions, triggers):
             question_id = q.get("question_id") or q.get("uuid")
             if not question_id:
                 continue
@@ -320,11 +342,11 @@ def process_questions(config: dict) -> list:
             text = q.get("text", "")
 
             # Триггер → Telegram
-            if contains_trigger(text):
+            if matched:
                 send_to_telegram(config,
                     f"⚠️ Ozon — триггерный вопрос\n\n{text[:500]}\n\nID: {question_id}"
                 )
-                results.append({"id": question_id, "action": "sent_to_telegram"})
+                results.append({"id": question_id, "action": "sent_to_telegram", "triggers": matched})
                 continue
 
             answer = generate_answer(text, config)
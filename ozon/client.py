@@ -0,0 +1,78 @@
+# =============================================================
+# ozon/client.py
+#
+# Общий HTTP-клиент для всех модулей Ozon Seller API:
+#   ✔ один requests.Session с пулом keep-alive соединений
+#   ✔ token bucket на аккаунт (Client-Id) и хост/метод
+#   ✔ 429 и 5xx → повтор с экспоненциальной паузой
+#   ✔ счётчики: запросы, повторы, байты, задержка
+#
+# Использование:
+#   from ozon.client import get_client
+#   r = get_client().post(url, headers=headers, json=payload, timeout=30)
+#
+# Ответ — обычный requests.Response, ошибки — requests.RequestException.
+# =============================================================
+
+import threading
+
+from marketplace.http import DEFAULT_BACKOFF, DEFAULT_MAX_RETRIES, POOL_SIZE, RateLimitedClient
+
+# Лимиты Ozon считаются на Client-Id. Значения по умолчанию — с запасом;
+# отдельные методы можно ограничить в config["ozon"]["http"]["rate_limits"].
+# /v1/analytics/data — один из самых жёстко лимитированных методов,
+# у него свой bucket, не делящий квоту с остальными методами.
+DEFAULT_RATE_LIMITS = {
+    "api-seller.ozon.ru/v1/analytics/data": (1, 1),
+    "api-seller.ozon.ru": (20, 20),
+}
+
+
+class OzonClient(RateLimitedClient):
+    """
+    HTTP-клиент Ozon. Аккаунт — пара заголовков Client-Id / Api-Key.
+    """
+
+    NAME = "ozon"
+    DEFAULT_RATE_LIMITS = DEFAULT_RATE_LIMITS
+    ACCOUNT_HEADERS = ("Client-Id", "Api-Key")
+
+
+# =============================================================
+# ОБЩИЙ ЭКЗЕМПЛЯР
+# =============================================================
+
+_client: OzonClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OzonClient:
+    """
+    Клиент, общий для всех модулей Ozon в процессе.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OzonClient()
+        return _client
+
+
+def configure_client(config: dict) -> OzonClient:
+    """
+    Пересоздаёт общий клиент с настройками из config["ozon"]["http"]:
+        {"rate_limits": {"хост[/путь]": [rps, burst]}, "max_retries": 3, "backoff": 1.0,
+         "pool_size": 16, "base_url": "http://127.0.0.1:8080"}
+    """
+    global _client
+    http_cfg = config.get("ozon", {}).get("http", {})
+    rate_limits = {key: tuple(value) for key, value in http_cfg.get("rate_limits", {}).items()}
+
+    with _client_lock:
+        _client = OzonClient(
+            rate_limits=rate_limits,
+            max_retries=http_cfg.get("max_retries", DEFAULT_MAX_RETRIES),
+            backoff=http_cfg.get("backoff", DEFAULT_BACKOFF),
+            pool_size=http_cfg.get("pool_size", POOL_SIZE),
+            base_url=http_cfg.get("base_url"),
+        )
+        return _client
@@ -0,0 +1,287 @@
+# =============================================================
+# ozon/finance/realization.py
+#
+# Кэш отчётов о реализации Ozon (/v2/finance/realization):
+#   ✔ отчёт за закрытый месяц больше не меняется — он хранится
+#     на диске сжатым (gzip JSON), ключ — кабинет (Client-Id) и месяц
+#   ✔ месяц считается закрытым после FINAL_AFTER_DAY числа следующего
+#     месяца — Ozon формирует отчёт в первые дни месяца
+#   ✔ текущий месяц, ошибки и пустые отчёты не кэшируются; пустой
+#     отчёт в кэше считается отсутствующим и запрашивается снова
+#   ✔ backfill() — все месяцы года параллельно, уже сохранённые
+#     месяцы не запрашиваются
+#   ✔ сравнения год к году и за несколько месяцев — только
+#     по локальным отчётам, без API
+#
+# Использование:
+#   python -m ozon.finance.realization backfill config.json --year 2025
+#   python -m ozon.finance.realization compare config.json --year 2025
+# =============================================================
+
+import argparse
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+from marketplace.pages import DEFAULT_PAGE_WORKERS, map_pages
+from ozon.finance.script import get_finance_cfg, get_headers, get_realization_report
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "ozon_realization"
+
+# После какого числа следующего месяца отчёт за месяц окончательный
+FINAL_AFTER_DAY = 5
+
+
+# =============================================================
+# КЭШ
+# =============================================================
+
+def is_closed(year: int, month: int, today=None) -> bool:
+    """
+    Месяц закрыт, если он раньше прошлого или он прошлый,
+    а сегодня уже позже FINAL_AFTER_DAY числа.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    next_year, next_month = year + month // 12, month % 12 + 1
+    if (next_year, next_month) != (today.year, today.month):
+        return (year, month) < (today.year, today.month)
+    return today.day > FINAL_AFTER_DAY
+
+
+def has_rows(report: dict | None) -> bool:
+    return bool(report and report.get("result", {}).get("rows"))
+
+
+def cache_file(cache_dir: str, client_id: str, year: int, month: int) -> str:
+    return os.path.join(cache_dir, str(client_id), f"{year}-{month:02d}.json.gz")
+
+
+def load_report(cache_dir: str, client_id: str, year: int, month: int) -> dict | None:
+    """
+    Отчёт из кэша или None, если его нет, он пустой или файл повреждён.
+    """
+    path = cache_file(cache_dir, client_id, year, month)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            report = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"[ozon:realization] Повреждён кэш {path}: {e}")
+        return None
+    return report if has_rows(report) else None
+
+
+def save_report(cache_dir: str, client_id: str, year: int, month: int, report: dict) -> None:
+    path = cache_file(cache_dir, client_id, year, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def get_cached_report(headers: dict, month: int, year: int, cache_dir: str = DEFAULT_CACHE_DIR) -> dict:
+    """
+    То же, что get_realization_report(), но закрытые месяцы берутся
+    из кэша, а после загрузки сохраняются в него (только непустые).
+    """
+    client_id = headers["Client-Id"]
+    if is_closed(year, month):
+        report = load_report(cache_dir, client_id, year, month)
+        if report is not None:
+            return report
+
+    report = get_realization_report(headers, month, year)
+    if has_rows(report) and is_closed(year, month):
+        try:
+            save_report(cache_dir, client_id, year, month, report)
+        except OSError as e:
+            logger.error(f"[ozon:realization] Не удалось сохранить {year}-{month:02d}: {e}")
+    return report
+
+
+def backfill(headers: dict, year: int, cache_dir: str = DEFAULT_CACHE_DIR,
+             workers: int = DEFAULT_PAGE_WORKERS) -> dict:
+    """
+    Загружает в кэш все закрытые месяцы года, которых в нём ещё нет
+    (или отчёт в кэше пустой), не больше workers запросов сразу.
+    Пустые отчёты не сохраняются — они в "empty" и запросятся снова.
+    Возвращает {"cached": [...], "loaded": [...], "empty": [...], "failed": [...]} — номера месяцев.
+    """
+    client_id = headers["Client-Id"]
+    months = [m for m in range(1, 13) if is_closed(year, m)]
+    cached = [m for m in months if load_report(cache_dir, client_id, year, m) is not None]
+    missing = [m for m in months if m not in cached]
+
+    def fetch(month: int) -> dict | None:
+        return get_realization_report(headers, month, year) or None
+
+    loaded, empty, failed = [], [], []
+    for month, report in zip(missing, map_pages(fetch, missing, workers)):
+        if report is None:
+            failed.append(month)
+            continue
+        if not has_rows(report):
+            empty.append(month)
+            continue
+        save_report(cache_dir, client_id, year, month, report)
+        loaded.append(month)
+
+    logger.info(f"[ozon:realization] {year}: в кэше {len(cached)}, загружено {len(loaded)}, "
+                f"пустых {len(empty)}, ошибок {len(failed)}")
+    return {"cached": cached, "loaded": loaded, "empty": empty, "failed": failed}
+
+
+# =============================================================
+# СВОДКИ (без API)
+# =============================================================
+
+def new_summary() -> dict:
+    return {
+        "quantity": 0,
+        "amount": 0.0,
+        "commission": 0.0,
+        "returns": 0,
+        "return_amount": 0.0,
+        "total": 0.0,
+        "by_sku": {},
+    }
+
+
+def add_report(summary: dict, report: dict) -> dict:
+    """
+    Добавляет строки отчёта о реализации к сводке:
+    продано (delivery_commission) минус возвраты (return_commission).
+    """
+    for row in report.get("result", {}).get("rows", []):
+        sku = str((row.get("item") or {}).get("sku", "unknown"))
+        delivery = row.get("delivery_commission") or {}
+        ret = row.get("return_commission") or {}
+
+        quantity = int(delivery.get("quantity", 0))
+        amount = float(delivery.get("amount", 0))
+        total = float(delivery.get("total", 0)) - float(ret.get("total", 0))
+
+        summary["quantity"] += quantity
+        summary["amount"] += amount
+        summary["commission"] += float(delivery.get("commission", 0)) - float(ret.get("commission", 0))
+        summary["returns"] += int(ret.get("quantity", 0))
+        summary["return_amount"] += float(ret.get("amount", 0))
+        summary["total"] += total
+
+        item = summary["by_sku"].setdefault(sku, {"quantity": 0, "amount": 0.0, "total": 0.0})
+        item["quantity"] += quantity
+        item["amount"] += amount
+        item["total"] += total
+    return summary
+
+
+def _rounded(summary: dict) -> dict:
+    money = ("amount", "commission", "return_amount", "total")
+    result = {key: round(value, 2) if key in money else value
+              for key, value in summary.items() if key != "by_sku"}
+    result["by_sku"] = {
+        sku: {"quantity": item["quantity"], "amount": round(item["amount"], 2), "total": round(item["total"], 2)}
+        for sku, item in summary["by_sku"].items()
+    }
+    return result
+
+
+def summarize_months(cache_dir: str, client_id: str, months: list[tuple[int, int]]) -> dict:
+    """
+    Сводка за несколько месяцев [(год, месяц), ...] из кэша.
+    Месяцы без отчёта в кэше перечислены в "missing".
+    """
+    summary = new_summary()
+    missing = []
+    for year, month in months:
+        report = load_report(cache_dir, client_id, year, month)
+        if report is None:
+            missing.append(f"{year}-{month:02d}")
+            continue
+        add_report(summary, report)
+
+    result = _rounded(summary)
+    result["missing"] = missing
+    return result
+
+
+def _change_pct(current: float, previous: float) -> float | None:
+    return round((current - previous) / previous * 100, 1) if previous else None
+
+
+def compare_years(cache_dir: str, client_id: str, year: int) -> dict:
+    """
+    Год к году по месяцам из кэша: итоги года и предыдущего,
+    по каждому месяцу — сумма к начислению (total) и количество.
+    Месяц без отчёта за любой из двух лет — None.
+    """
+    months = {}
+    current_total, previous_total = new_summary(), new_summary()
+    for month in range(1, 13):
+        current = load_report(cache_dir, client_id, year, month)
+        previous = load_report(cache_dir, client_id, year - 1, month)
+        if current is None or previous is None:
+            months[month] = None
+            continue
+        cur = add_report(new_summary(), current)
+        prev = add_report(new_summary(), previous)
+        add_report(current_total, current)
+        add_report(previous_total, previous)
+        months[month] = {
+            "total": round(cur["total"], 2),
+            "previous_total": round(prev["total"], 2),
+            "change_pct": _change_pct(cur["total"], prev["total"]),
+            "quantity": cur["quantity"],
+            "previous_quantity": prev["quantity"],
+        }
+
+    return {
+        "year": year,
+        "months": months,
+        "total": round(current_total["total"], 2),
+        "previous_total": round(previous_total["total"], 2),
+        "change_pct": _change_pct(current_total["total"], previous_total["total"]),
+    }
+
+
+# =============================================================
+# ЗАПУСК
+# =============================================================
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Кэш отчётов о реализации Ozon")
+    parser.add_argument("command", choices=["backfill", "compare"],
+                        help="backfill — загрузить год в кэш, compare — год к году из кэша")
+    parser.add_argument("config", help="путь к конфигу (JSON или YAML)")
+    parser.add_argument("--year", type=int, default=datetime.now(timezone.utc).year, help="год, по умолчанию текущий")
+    parser.add_argument("--workers", type=int, help="параллельных запросов (по умолчанию ozon.page_workers)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from marketplace.scheduler import load_config
+    from ozon.client import configure_client
+
+    config = load_config(args.config)
+    headers = get_headers(config)
+    cache_dir = get_finance_cfg(config).get("realization_cache_dir", DEFAULT_CACHE_DIR)
+
+    if args.command == "backfill":
+        configure_client(config)
+        workers = args.workers or config["ozon"].get("page_workers", DEFAULT_PAGE_WORKERS)
+        result = backfill(headers, args.year, cache_dir, workers)
+        print(json.dumps(result, ensure_ascii=False))
+        raise SystemExit(1 if result["failed"] else 0)
+
+    print(json.dumps(compare_years(cache_dir, headers["Client-Id"], args.year), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
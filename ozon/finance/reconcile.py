@@ -0,0 +1,330 @@
+# =============================================================
+# ozon/finance/reconcile.py
+#
+# Сверка отчёта о реализации (/v2/finance/realization)
+# с транзакциями (/v3/finance/transaction/list) за месяц:
+#   ✔ оба источника индексируются в хэш-таблицы: реализация — по SKU,
+#     транзакции — по SKU и по posting_number, за один проход по страницам
+#   ✔ сверка — соединение по ключу (hash join), без сортировок
+#     и без выгрузки в таблицы:
+#       - SKU, которые есть только в одном из источников
+#       - расхождения по количеству, сумме и комиссии
+#       - отправления с продажей без комиссии и отправления без продажи
+#   ✔ загрузка — через функции модуля финансов: транзакции из журнала
+#     (finance.ledger_path) или API, реализация — из кэша закрытых
+#     месяцев (realization.py)
+#
+# Отчёт о реализации v2 построчно даёт SKU, а не отправления, поэтому
+# проверки по posting_number делаются внутри транзакций.
+#
+# Использование:
+#   python -m ozon.finance.reconcile config.json --year 2026 --month 9
+# =============================================================
+
+import argparse
+import json
+import logging
+from collections.abc import Iterable
+from datetime import date, timedelta
+
+from marketplace import metrics
+from marketplace.pages import DEFAULT_PAGE_WORKERS
+from ozon.finance.realization import DEFAULT_CACHE_DIR, get_cached_report
+from ozon.finance.script import fetch_transaction_pages, get_finance_cfg, get_headers
+
+logger = logging.getLogger(__name__)
+
+# Допустимое расхождение сумм, руб.
+DEFAULT_TOLERANCE = 1.0
+
+# Индексы накопителей SKU: [количество, сумма продаж, комиссия, возвраты, сумма возвратов]
+QTY, AMOUNT, COMMISSION, RETURNS, RETURN_AMOUNT = range(5)
+
+# Индексы накопителей отправления: [сумма продаж, комиссия, возвраты, прочие списания]
+P_SALE, P_COMMISSION, P_RETURNS, P_SERVICES = range(4)
+
+
+# =============================================================
+# ИНДЕКСЫ
+# =============================================================
+
+def index_realization(report: dict) -> dict[str, list]:
+    """
+    SKU → [количество, сумма, комиссия, возвраты, сумма возвратов]
+    по строкам отчёта о реализации.
+    """
+    index = {}
+    for row in report.get("result", {}).get("rows", []):
+        sku = str((row.get("item") or {}).get("sku", ""))
+        if not sku:
+            continue
+        delivery = row.get("delivery_commission") or {}
+        ret = row.get("return_commission") or {}
+
+        acc = index.get(sku)
+        if acc is None:
+            acc = index[sku] = [0, 0.0, 0.0, 0, 0.0]
+        acc[QTY] += int(delivery.get("quantity", 0))
+        acc[AMOUNT] += float(delivery.get("amount", 0))
+        acc[COMMISSION] += abs(float(delivery.get("commission", 0)))
+        acc[RETURNS] += int(ret.get("quantity", 0))
+        acc[RETURN_AMOUNT] += abs(float(ret.get("amount", 0)))
+    return index
+
+
+def new_transactions_index() -> dict:
+    return {"operations": 0, "by_sku": {}, "by_posting": {}, "posting_skus": {}}
+
+
+def index_transactions(index: dict, operations: Iterable[dict]) -> dict:
+    """
+    Добавляет операции в индекс (изменяет его на месте):
+    - by_sku: SKU → [количество, сумма продаж, комиссия, возвраты, сумма возвратов]
+    - by_posting: posting_number → [сумма продаж, комиссия, возвраты, прочие списания]
+    - posting_skus: posting_number → SKU первой позиции
+
+    Продажа — операция с accruals_for_sale > 0 (доставка покупателю),
+    возврат — операция type = "returns", остальное — списания по отправлению.
+    """
+    by_sku = index["by_sku"]
+    by_posting = index["by_posting"]
+    posting_skus = index["posting_skus"]
+
+    for op in operations:
+        index["operations"] += 1
+
+        items = op.get("items") or []
+        skus = [str(item.get("sku", "")) for item in items if item.get("sku")]
+        posting_number = (op.get("posting") or {}).get("posting_number", "")
+
+        posting = None
+        if posting_number:
+            posting = by_posting.get(posting_number)
+            if posting is None:
+                posting = by_posting[posting_number] = [0.0, 0.0, 0, 0.0]
+                if skus:
+                    posting_skus[posting_number] = skus[0]
+
+        accruals = float(op.get("accruals_for_sale", 0))
+        commission = abs(float(op.get("sale_commission", 0)))
+
+        if accruals > 0:
+            # сумма и комиссия операции делятся между позициями поровну
+            share = len(skus) or 1
+            for sku in skus:
+                acc = by_sku.get(sku)
+                if acc is None:
+                    acc = by_sku[sku] = [0, 0.0, 0.0, 0, 0.0]
+                acc[QTY] += 1
+                acc[AMOUNT] += accruals / share
+                acc[COMMISSION] += commission / share
+            if posting is not None:
+                posting[P_SALE] += accruals
+                posting[P_COMMISSION] += commission
+
+        elif op.get("type") == "returns":
+            amount = abs(float(op.get("amount", 0)))
+            share = len(skus) or 1
+            for sku in skus:
+                acc = by_sku.get(sku)
+                if acc is None:
+                    acc = by_sku[sku] = [0, 0.0, 0.0, 0, 0.0]
+                acc[RETURNS] += 1
+                acc[RETURN_AMOUNT] += amount / share
+            if posting is not None:
+                posting[P_RETURNS] += 1
+
+        elif posting is not None:
+            posting[P_SERVICES] += abs(float(op.get("amount", 0)))
+
+    return index
+
+
+# =============================================================
+# СВЕРКА
+# =============================================================
+
+def _delta(sku: str, field: str, realization: float, transactions: float) -> dict:
+    return {
+        "sku": sku,
+        "field": field,
+        "realization": round(realization, 2),
+        "transactions": round(transactions, 2),
+        "delta": round(transactions - realization, 2),
+    }
+
+
+def reconcile(realization: dict[str, list], transactions: dict, tolerance: float = DEFAULT_TOLERANCE,
+              complete: bool = True) -> dict:
+    """
+    Сверяет индекс реализации с индексом транзакций.
+    Расхождения сортируются по модулю разницы (сначала крупные).
+    complete=False — транзакции загружены не полностью: сверка не считается пройденной.
+    """
+    tx_by_sku = transactions["by_sku"]
+    by_posting = transactions["by_posting"]
+    posting_skus = transactions["posting_skus"]
+
+    missing_in_transactions = []
+    missing_in_realization = []
+    quantity_mismatches = []
+    amount_mismatches = []
+    commission_mismatches = []
+
+    # Соединение по SKU: проход по реализации с поиском в хэше транзакций
+    for sku, real in realization.items():
+        tx = tx_by_sku.get(sku)
+        if tx is None:
+            if real[QTY] or real[AMOUNT]:
+                missing_in_transactions.append(
+                    {"sku": sku, "quantity": real[QTY], "amount": round(real[AMOUNT], 2)})
+            continue
+        if real[QTY] != tx[QTY]:
+            quantity_mismatches.append(_delta(sku, "quantity", real[QTY], tx[QTY]))
+        if abs(real[AMOUNT] - tx[AMOUNT]) > tolerance:
+            amount_mismatches.append(_delta(sku, "amount", real[AMOUNT], tx[AMOUNT]))
+        if abs(real[COMMISSION] - tx[COMMISSION]) > tolerance:
+            commission_mismatches.append(_delta(sku, "commission", real[COMMISSION], tx[COMMISSION]))
+
+    # Отправления с продажей по SKU, которого нет в реализации
+    unmatched_postings = {}
+    for posting_number, sku in posting_skus.items():
+        if sku not in realization and by_posting[posting_number][P_SALE] > 0:
+            unmatched_postings.setdefault(sku, []).append(posting_number)
+
+    for sku, tx in tx_by_sku.items():
+        if sku not in realization and tx[QTY]:
+            missing_in_realization.append({
+                "sku": sku,
+                "quantity": tx[QTY],
+                "amount": round(tx[AMOUNT], 2),
+                "postings": unmatched_postings.get(sku, []),
+            })
+
+    # Проверки по отправлениям
+    without_commission = [
+        number for number, p in by_posting.items()
+        if p[P_SALE] > 0 and p[P_COMMISSION] == 0
+    ]
+    without_sale = [
+        number for number, p in by_posting.items()
+        if p[P_SALE] == 0 and not p[P_RETURNS] and p[P_SERVICES] > 0
+    ]
+
+    by_delta = lambda row: abs(row["delta"])
+    quantity_mismatches.sort(key=by_delta, reverse=True)
+    amount_mismatches.sort(key=by_delta, reverse=True)
+    commission_mismatches.sort(key=by_delta, reverse=True)
+
+    real_totals = [sum(acc[i] for acc in realization.values()) for i in range(5)]
+    tx_totals = [sum(acc[i] for acc in tx_by_sku.values()) for i in range(5)]
+
+    issues = (missing_in_transactions, missing_in_realization, quantity_mismatches,
+              amount_mismatches, commission_mismatches, without_commission, without_sale)
+
+    return {
+        "realization": {
+            "skus": len(realization),
+            "quantity": real_totals[QTY],
+            "amount": round(real_totals[AMOUNT], 2),
+            "commission": round(real_totals[COMMISSION], 2),
+            "returns": real_totals[RETURNS],
+        },
+        "transactions": {
+            "operations": transactions["operations"],
+            "postings": len(by_posting),
+            "skus": len(tx_by_sku),
+            "quantity": tx_totals[QTY],
+            "amount": round(tx_totals[AMOUNT], 2),
+            "commission": round(tx_totals[COMMISSION], 2),
+            "returns": tx_totals[RETURNS],
+        },
+        "missing_in_transactions": missing_in_transactions,
+        "missing_in_realization": missing_in_realization,
+        "quantity_mismatches": quantity_mismatches,
+        "amount_mismatches": amount_mismatches,
+        "commission_mismatches": commission_mismatches,
+        "postings_without_commission": without_commission,
+        "postings_without_sale": without_sale,
+        "complete": complete,
+        "reconciled": complete and not any(issues),
+    }
+
+
+# =============================================================
+# ПУБЛИЧНЫЙ ИНТЕРФЕЙС
+# =============================================================
+
+def reconcile_month(config: dict, year: int, month: int) -> dict:
+    """
+    Сверка реализации и транзакций за календарный месяц.
+    Пустой словарь — отчёта о реализации нет (месяц не закрыт или ошибка API).
+    """
+    if not config.get("ozon", {}).get("enabled"):
+        return {}
+
+    headers = get_headers(config)
+    finance_cfg = get_finance_cfg(config)
+    workers = config["ozon"].get("page_workers", DEFAULT_PAGE_WORKERS)
+
+    first = date(year, month, 1)
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+
+    report = get_cached_report(headers, month, year,
+                               finance_cfg.get("realization_cache_dir", DEFAULT_CACHE_DIR))
+    if not report:
+        logger.warning(f"[ozon:reconcile] Нет отчёта о реализации за {year}-{month:02d}")
+        return {}
+
+    with metrics.timer("analyze_seconds"):
+        realization = index_realization(report)
+
+    transactions = new_transactions_index()
+    pages = fetch_transaction_pages(headers, first.isoformat(), last.isoformat(), finance_cfg, workers)
+    while True:
+        try:
+            operations = next(pages)
+        except StopIteration as stop:
+            complete = stop.value is not False
+            break
+        with metrics.timer("analyze_seconds"):
+            index_transactions(transactions, operations)
+
+    if not complete:
+        logger.warning(f"[ozon:reconcile] Транзакции за {year}-{month:02d} загружены не полностью")
+
+    with metrics.timer("analyze_seconds"):
+        result = reconcile(realization, transactions,
+                           finance_cfg.get("reconcile_tolerance", DEFAULT_TOLERANCE), complete)
+    result["period"] = {"from": first.isoformat(), "to": last.isoformat()}
+    return result
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Сверка реализации и транзакций Ozon за месяц")
+    parser.add_argument("config", help="путь к конфигу (JSON или YAML)")
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--month", type=int, required=True)
+    parser.add_argument("--output", help="куда записать результат (JSON), по умолчанию — stdout")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from marketplace.scheduler import load_config
+    from ozon.client import configure_client
+
+    config = load_config(args.config)
+    configure_client(config)
+    result = reconcile_month(config, args.year, args.month)
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    raise SystemExit(0 if result.get("reconciled") else 1)
+
+
+if __name__ == "__main__":
+    main()
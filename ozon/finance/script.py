@@ -12,8 +12,13 @@
 
 import requests
 import logging
-from collections import defaultdict
-from datetime import datetime, timedelta, timezone
+from collections.abc import Generator, Iterable
+from datetime import date, datetime, timedelta, timezone
+
+from marketplace import metrics
+from marketplace.pages import DEFAULT_PAGE_WORKERS, iter_pages, map_pages
+from marketplace.telegram import get_outbox
+from ozon.client import get_client
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +31,10 @@ COMMISSION_OPS = {"MarketplaceSellerCompanyName"}
 
 DEFAULT_LOSS_THRESHOLD = 0
 DEFAULT_LOW_MARGIN_THRESHOLD = 20
+DEFAULT_REFRESH_DAYS = 3   # последние дни транзакций пересчитываются при каждом запуске
+
+TRANSACTION_PAGE_SIZE = 1000
+TRANSACTION_PAGE_ATTEMPTS = 3   # попыток на одну страницу транзакций
 
 
 # -------------------------------------------------------------
@@ -63,7 +72,7 @@ def get_balance(headers: dict) -> dict:
     """
     url = f"{BASE_URL}/v1/finance/balance"
     try:
-        r = requests.post(url, headers=headers, json={}, timeout=10)
+        r = get_client().post(url, headers=headers, json={}, timeout=10)
         if r.status_code == 200:
             return r.json()
     except Exception as e:
@@ -89,7 +98,7 @@ def get_realization_report(headers: dict, month: int, year: int) -> dict:
     }
 
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=20)
+        r = get_client().post(url, headers=headers, json=payload, timeout=20)
         if r.status_code == 200:
             return r.json()
         logger.warning(f"[ozon:realization] Код: {r.status_code} | {r.text[:200]}")
@@ -103,56 +112,172 @@ def get_realization_report(headers: dict, month: int, year: int) -> dict:
 # ТРАНЗАКЦИИ: /v3/finance/transaction/list
 # -------------------------------------------------------------
 
-def get_transactions(headers: dict, date_from: str, date_to: str) -> list:
+def transaction_windows(date_from: str, date_to: str) -> list[tuple[str, str]]:
     """
-    Список транзакций за период с полной разбивкой.
-    Это более детальный источник данных чем отчёт о реализации —
-    обновляется в реальном времени.
+    Период, разбитый по календарным месяцам: /v3/finance/transaction/list
+    принимает не больше месяца за запрос.
+        ("2024-01-15", "2024-03-10") → [("2024-01-15", "2024-01-31"),
+                                         ("2024-02-01", "2024-02-29"),
+                                         ("2024-03-01", "2024-03-10")]
+    """
+    windows = []
+    current, last = date.fromisoformat(date_from), date.fromisoformat(date_to)
+    while current <= last:
+        next_month = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        window_end = min(next_month - timedelta(days=1), last)
+        windows.append((current.isoformat(), window_end.isoformat()))
+        current = next_month
+    return windows
 
-    Документация: POST /v3/finance/transaction/list
+
+def get_transaction_page(headers: dict, window: tuple[str, str], page: int) -> dict | None:
+    """
+    Одна страница транзакций окна: {"operations": [...], "page_count": N}.
+    None — страница не получена (HTTP-клиент уже исчерпал свои повторы).
     """
     url = f"{BASE_URL}/v3/finance/transaction/list"
-    all_rows = []
-    page = 1
-
-    while True:
-        payload = {
-            "filter": {
-                "date": {
-                    "from": f"{date_from}T00:00:00.000Z",
-                    "to": f"{date_to}T23:59:59.000Z",
-                },
-                "operation_type": [],  # все типы операций
-                "posting_number": "",
-                "transaction_type": "all",
+    date_from, date_to = window
+    payload = {
+        "filter": {
+            "date": {
+                "from": f"{date_from}T00:00:00.000Z",
+                "to": f"{date_to}T23:59:59.000Z",
             },
-            "page": page,
-            "page_size": 1000,
-        }
+            "operation_type": [],  # все типы операций
+            "posting_number": "",
+            "transaction_type": "all",
+        },
+        "page": page,
+        "page_size": TRANSACTION_PAGE_SIZE,
+    }
 
-        try:
-            r = requests.post(url, headers=headers, json=payload, timeout=30)
-        except requests.RequestException as e:
-            logger.error(f"[ozon:transactions] Ошибка запроса: {e}")
-            break
+    try:
+        r = get_client().post(url, headers=headers, json=payload, timeout=30)
+    except requests.RequestException as e:
+        logger.error(f"[ozon:transactions] {date_from} – {date_to}, стр. {page}: ошибка запроса: {e}")
+        return None
 
-        if r.status_code != 200:
-            logger.warning(f"[ozon:transactions] Код: {r.status_code} | {r.text[:200]}")
-            break
+    if r.status_code != 200:
+        logger.warning(f"[ozon:transactions] {date_from} – {date_to}, стр. {page}: "
+                       f"код {r.status_code} | {r.text[:200]}")
+        return None
 
-        data = r.json()
-        rows = data.get("result", {}).get("operations", [])
-        if not rows:
-            break
+    try:
+        with metrics.timer("json_seconds"):
+            result = r.json().get("result", {})
+    except ValueError as e:
+        logger.error(f"[ozon:transactions] {date_from} – {date_to}, стр. {page}: ошибка JSON: {e}")
+        return None
 
-        all_rows.extend(rows)
+    operations = result.get("operations", [])
+    metrics.record(rows=len(operations))
+    return {"operations": operations, "page_count": result.get("page_count", 1)}
 
-        page_count = data.get("result", {}).get("page_count", 1)
-        if page >= page_count:
+
+def iter_transaction_pages(headers: dict, date_from: str, date_to: str,
+                           workers: int = DEFAULT_PAGE_WORKERS) -> Generator[list, None, bool]:
+    """
+    Страницы транзакций за период по мере получения.
+    Возвращает (через StopIteration.value) True, если дошли до последней
+    страницы, и False при ошибке запроса.
+
+    Период делится на месяцы (transaction_windows); первые страницы всех
+    месяцев запрашиваются параллельно, из них известно page_count.
+    Остальные страницы — тоже параллельно, не больше workers запросов
+    сразу, каждая со своими повторами. Порядок страниц — как при обходе
+    подряд: месяц за месяцем, страница за страницей.
+
+    Документация: POST /v3/finance/transaction/list
+    """
+    windows = transaction_windows(date_from, date_to)
+
+    def first_page(window: tuple[str, str]) -> dict | None:
+        return get_transaction_page(headers, window, 1)
+
+    firsts = map_pages(first_page, windows, workers, TRANSACTION_PAGE_ATTEMPTS)
+
+    # Все страницы по порядку; до первого месяца, который не удалось начать
+    complete = True
+    keys = []
+    for index, first in enumerate(firsts):
+        if first is None:
+            complete = False
             break
-        page += 1
+        if first["operations"]:
+            keys.extend((index, page) for page in range(1, first["page_count"] + 1))
+
+    def fetch(key: tuple[int, int]) -> list | None:
+        index, page = key
+        if page == 1:
+            return firsts[index]["operations"]
+        result = get_transaction_page(headers, windows[index], page)
+        return None if result is None else result["operations"]
+
+    total = 0
+    pages = iter_pages(fetch, keys, workers, TRANSACTION_PAGE_ATTEMPTS)
+    try:
+        for (index, page), rows in zip(keys, pages):
+            if page == 1:
+                # первая страница месяца больше не нужна — освобождаем
+                firsts[index] = None
+            if rows is None:
+                complete = False
+                break
+            if rows:
+                total += len(rows)
+                yield rows
+    finally:
+        pages.close()
+
+    logger.info(f"[ozon:transactions] Получено операций: {total}")
+    return complete
+
+
+def iter_synced_pages(headers: dict, date_from: str, date_to: str, finance_cfg: dict,
+                      workers: int = DEFAULT_PAGE_WORKERS) -> Generator[list, None, bool]:
+    """
+    То же, что iter_transaction_pages(), но через локальный журнал операций
+    (ozon/finance/store.py, finance.ledger_path): из API докачиваются только дни
+    после прошлой синхронизации и последние finance.ledger_overlap_days дней,
+    период отдаётся с диска. Возвращает True, если синхронизация полная.
+    """
+    from ozon.finance.store import DEFAULT_OVERLAP_DAYS, iter_ledger_pages, open_ledger, sync_ledger
+
+    conn = open_ledger(finance_cfg["ledger_path"])
+    try:
+        complete = sync_ledger(
+            conn, headers, date_from, date_to,
+            overlap_days=finance_cfg.get("ledger_overlap_days", DEFAULT_OVERLAP_DAYS),
+            workers=workers,
+        )
+        if not complete:
+            logger.warning("[ozon:finance] Синхронизация журнала неполная — отдаём то, что есть на диске")
+        yield from iter_ledger_pages(conn, date_from, date_to)
+        return complete
+    finally:
+        conn.close()
+
+
+def fetch_transaction_pages(headers: dict, date_from: str, date_to: str, finance_cfg: dict,
+                            workers: int = DEFAULT_PAGE_WORKERS) -> Generator[list, None, bool]:
+    """
+    Страницы операций за период: из журнала, если задан finance.ledger_path,
+    иначе напрямую из API.
+    """
+    if finance_cfg.get("ledger_path"):
+        return iter_synced_pages(headers, date_from, date_to, finance_cfg, workers)
+    return iter_transaction_pages(headers, date_from, date_to, workers)
+
 
-    logger.info(f"[ozon:transactions] Получено операций: {len(all_rows)}")
+def get_transactions(headers: dict, date_from: str, date_to: str) -> list:
+    """
+    Список транзакций за период с полной разбивкой.
+    Это более детальный источник данных чем отчёт о реализации —
+    обновляется в реальном времени.
+    """
+    all_rows = []
+    for rows in iter_transaction_pages(headers, date_from, date_to):
+        all_rows.extend(rows)
     return all_rows
 
 
@@ -175,7 +300,7 @@ def get_transaction_totals(headers: dict, date_from: str, date_to: str) -> dict:
     }
 
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=15)
+        r = get_client().post(url, headers=headers, json=payload, timeout=15)
         if r.status_code == 200:
             return r.json().get("result", {})
     except Exception as e:
@@ -188,28 +313,49 @@ def get_transaction_totals(headers: dict, date_from: str, date_to: str) -> dict:
 # АНАЛИЗ ТРАНЗАКЦИЙ
 # -------------------------------------------------------------
 
-def analyze_transactions(operations: list, finance_cfg: dict) -> dict:
+def new_transactions_state() -> dict:
     """
-    Разбирает список операций на составляющие:
-    - выручка, вычеты, маржа
-    - разбивка по типам вычетов
-    - метрики по SKU
+    Пустые накопители разбора транзакций.
+    Заполняются fold_transactions(), итог — finalize_transactions().
+    Накопители разных периодов складываются (marketplace/aggregates.py).
     """
-    loss_threshold = finance_cfg.get("loss_margin_threshold", DEFAULT_LOSS_THRESHOLD)
-    low_margin_threshold = finance_cfg.get("low_margin_threshold", DEFAULT_LOW_MARGIN_THRESHOLD)
+    return {
+        "operations": 0,
+        "gross_revenue": 0.0,
+        "commission": 0.0,
+        "logistics": 0.0,
+        "storage": 0.0,
+        "penalties": 0.0,
+        "other": 0.0,
+        "orders": 0,
+        "returns": 0,
+        # По SKU: sku -> накопители
+        "by_sku": {},
+    }
+
 
-    gross_revenue = 0.0
-    commission_total = 0.0
-    logistics_total = 0.0
-    storage_total = 0.0
-    penalty_total = 0.0
-    other_total = 0.0
-    orders_count = 0
-    returns_count = 0
+def _new_sku_state() -> dict:
+    return {"gross": 0.0, "commission": 0.0, "orders": 0, "returns": 0}
+
+
+def fold_transactions(state: dict, operations: Iterable[dict]) -> dict:
+    """
+    Добавляет операции в накопители state (изменяет его на месте).
+    """
+    by_sku = state["by_sku"]
 
-    by_sku: dict = defaultdict(lambda: {"gross": 0.0, "commission": 0.0, "orders": 0, "returns": 0})
+    def sku_state(item: dict) -> dict | None:
+        sku = str(item.get("sku", ""))
+        if not sku:
+            return None
+        d = by_sku.get(sku)
+        if d is None:
+            d = by_sku[sku] = _new_sku_state()
+        return d
 
     for op in operations:
+        state["operations"] += 1
+
         op_type = op.get("operation_type", "")
         amount = float(op.get("amount", 0))
         items = op.get("items", [])
@@ -217,42 +363,56 @@ def analyze_transactions(operations: list, finance_cfg: dict) -> dict:
         # Классифицируем по типу операции
         if "Delivery" in op_type or "Sale" in op_type:
             if amount > 0:
-                gross_revenue += amount
-                orders_count += 1
+                state["gross_revenue"] += amount
+                state["orders"] += 1
                 for item in items:
-                    sku = str(item.get("sku", ""))
-                    if sku:
-                        by_sku[sku]["gross"] += amount
-                        by_sku[sku]["orders"] += 1
+                    d = sku_state(item)
+                    if d is not None:
+                        d["gross"] += amount
+                        d["orders"] += 1
 
         elif "Return" in op_type:
-            returns_count += 1
-            gross_revenue -= abs(amount)
+            state["returns"] += 1
+            state["gross_revenue"] -= abs(amount)
             for item in items:
-                sku = str(item.get("sku", ""))
-                if sku:
-                    by_sku[sku]["returns"] += 1
+                d = sku_state(item)
+                if d is not None:
+                    d["returns"] += 1
 
         elif "Commission" in op_type or "MarketplaceCommission" in op_type:
-            commission_total += abs(amount)
+            state["commission"] += abs(amount)
             for item in items:
-                sku = str(item.get("sku", ""))
-                if sku:
-                    by_sku[sku]["commission"] += abs(amount)
+                d = sku_state(item)
+                if d is not None:
+                    d["commission"] += abs(amount)
 
         elif "Logistic" in op_type or "Delivery" in op_type:
-            logistics_total += abs(amount)
+            state["logistics"] += abs(amount)
 
         elif "Storage" in op_type:
-            storage_total += abs(amount)
+            state["storage"] += abs(amount)
 
         elif "Penalty" in op_type or "Fine" in op_type:
-            penalty_total += abs(amount)
+            state["penalties"] += abs(amount)
 
         else:
-            other_total += abs(amount)
+            state["other"] += abs(amount)
+
+    return state
+
 
-    total_deductions = commission_total + logistics_total + storage_total + penalty_total
+def finalize_transactions(state: dict, finance_cfg: dict) -> dict:
+    """
+    Накопители → итоговый отчёт:
+    - выручка, вычеты, маржа
+    - разбивка по типам вычетов
+    - метрики по SKU
+    """
+    loss_threshold = finance_cfg.get("loss_margin_threshold", DEFAULT_LOSS_THRESHOLD)
+    low_margin_threshold = finance_cfg.get("low_margin_threshold", DEFAULT_LOW_MARGIN_THRESHOLD)
+
+    gross_revenue = state["gross_revenue"]
+    total_deductions = state["commission"] + state["logistics"] + state["storage"] + state["penalties"]
     net_revenue = gross_revenue - total_deductions
     margin_pct = round(net_revenue / gross_revenue * 100, 1) if gross_revenue > 0 else 0.0
 
@@ -261,7 +421,7 @@ def analyze_transactions(operations: list, finance_cfg: dict) -> dict:
     loss_skus = []
     low_margin_skus = []
 
-    for sku, d in by_sku.items():
+    for sku, d in state["by_sku"].items():
         sku_net = d["gross"] - d["commission"]
         sku_margin = round(sku_net / d["gross"] * 100, 1) if d["gross"] > 0 else 0.0
         is_loss = sku_margin <= loss_threshold
@@ -291,14 +451,14 @@ def analyze_transactions(operations: list, finance_cfg: dict) -> dict:
         "margin_pct": margin_pct,
         "to_pay": round(net_revenue, 2),
         "deductions_breakdown": {
-            "commission": round(commission_total, 2),
-            "logistics": round(logistics_total, 2),
-            "storage": round(storage_total, 2),
-            "penalties": round(penalty_total, 2),
-            "other": round(other_total, 2),
+            "commission": round(state["commission"], 2),
+            "logistics": round(state["logistics"], 2),
+            "storage": round(state["storage"], 2),
+            "penalties": round(state["penalties"], 2),
+            "other": round(state["other"], 2),
         },
-        "orders": orders_count,
-        "returns": returns_count,
+        "orders": state["orders"],
+        "returns": state["returns"],
         "by_sku": processed_skus,
         "top_skus": top_skus,
         "loss_skus": loss_skus,
@@ -306,6 +466,50 @@ def analyze_transactions(operations: list, finance_cfg: dict) -> dict:
     }
 
 
+def analyze_transactions(operations: Iterable[dict], finance_cfg: dict) -> dict:
+    """
+    Разбирает операции на составляющие:
+    - выручка, вычеты, маржа
+    - разбивка по типам вычетов
+    - метрики по SKU
+
+    operations — список или поток, например операции из журнала без API:
+        chain.from_iterable(store.iter_ledger_pages(conn, date_from, date_to))
+    """
+    state = fold_transactions(new_transactions_state(), operations)
+    return finalize_transactions(state, finance_cfg)
+
+
+def operation_day(op: dict) -> str:
+    # operation_date: "2024-03-15 10:20:30"
+    return (op.get("operation_date") or "")[:10]
+
+
+def period_transactions_state(headers: dict, date_from: str, date_to: str, finance_cfg: dict,
+                              workers: int = DEFAULT_PAGE_WORKERS) -> dict:
+    """
+    Накопители за период из дневных агрегатов (marketplace/aggregates.py):
+    загружаются (из API или журнала — fetch_transaction_pages()) только дни,
+    которых нет в finance.aggregates_path, и последние finance.refresh_days
+    дней; остальное складывается из сохранённых дней.
+    """
+    from marketplace.aggregates import open_store, period_state
+
+    conn = open_store(finance_cfg["aggregates_path"])
+    try:
+        return period_state(
+            conn, "ozon", date_from, date_to,
+            fetch=lambda range_from, range_to: fetch_transaction_pages(
+                headers, range_from, range_to, finance_cfg, workers),
+            new_state=new_transactions_state,
+            fold=fold_transactions,
+            day_of=operation_day,
+            refresh_days=finance_cfg.get("refresh_days", DEFAULT_REFRESH_DAYS),
+        )
+    finally:
+        conn.close()
+
+
 # -------------------------------------------------------------
 # ФОРМАТИРОВАНИЕ ДАЙДЖЕСТА
 # -------------------------------------------------------------
@@ -375,18 +579,11 @@ def format_digest(report: dict, balance: dict, period_label: str) -> str:
 
 
 def send_telegram(bot_token: str, chat_id: str, text: str) -> bool:
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    try:
-        r = requests.post(url, json={
-            "chat_id": chat_id,
-            "text": text,
-            "parse_mode": "Markdown",
-            "disable_web_page_preview": True,
-        }, timeout=10)
-        return r.status_code == 200
-    except Exception as e:
-        logger.error(f"[ozon:tg] Ошибка: {e}")
-        return False
+    """
+    Сообщение через очередь Telegram (marketplace/telegram.py) с ожиданием
+    доставки. True — Telegram принял сообщение, False — отказ или таймаут.
+    """
+    return get_outbox().deliver(bot_token, chat_id, text, parse_mode="Markdown")
 
 
 # -------------------------------------------------------------
@@ -404,15 +601,23 @@ def process(config: dict, date_from: str, date_to: str) -> dict:
 
     headers = get_headers(config)
     finance_cfg = get_finance_cfg(config)
+    workers = config["ozon"].get("page_workers", DEFAULT_PAGE_WORKERS)
 
     # Пробуем сначала детальные транзакции (реальное время)
-    operations = get_transactions(headers, date_from, date_to)
-
-    if not operations:
+    if finance_cfg.get("aggregates_path"):
+        state = period_transactions_state(headers, date_from, date_to, finance_cfg, workers)
+    else:
+        state = new_transactions_state()
+        for operations in fetch_transaction_pages(headers, date_from, date_to, finance_cfg, workers):
+            with metrics.timer("analyze_seconds"):
+                fold_transactions(state, operations)
+
+    if not state["operations"]:
         logger.warning("[ozon:finance] Транзакции пусты")
         return {}
 
-    report = analyze_transactions(operations, finance_cfg)
+    with metrics.timer("analyze_seconds"):
+        report = finalize_transactions(state, finance_cfg)
     report["period"] = {"from": date_from, "to": date_to}
 
     # Totals для сверки
@@ -423,6 +628,16 @@ def process(config: dict, date_from: str, date_to: str) -> dict:
     return report
 
 
+def process_month(config: dict, year: int, month: int) -> dict:
+    """
+    Отчёт за календарный месяц. С finance.aggregates_path собирается
+    из дневных агрегатов — транзакции заново не загружаются.
+    """
+    first = date(year, month, 1)
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return process(config, first.isoformat(), last.isoformat())
+
+
 def send_daily_digest(config: dict) -> bool:
     """
     Ежедневный дайджест в Telegram.
@@ -457,7 +672,8 @@ def send_daily_digest(config: dict) -> bool:
 def send_weekly_digest(config: dict) -> bool:
     """
     Еженедельный дайджест в Telegram.
-    Берёт прошлую неделю (пн–вс).
+    Берёт прошлую неделю (пн–вс). С finance.aggregates_path неделя
+    складывается из семи дневных агрегатов.
     """
     if not config.get("ozon", {}).get("enabled"):
         return False
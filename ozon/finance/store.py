@@ -0,0 +1,224 @@
+# =============================================================
+# ozon/finance/store.py
+#
+# Локальный журнал финансовых операций Ozon (SQLite):
+#   ✔ операции хранятся по operation_id — повторная загрузка
+#     той же операции её перезаписывает, дублей нет
+#   ✔ помнит покрытый диапазон дат; каждый запуск докачивает только
+#     дни после покрытия и последние overlap_days дней покрытия —
+#     туда Ozon дописывает запоздавшие начисления
+#   ✔ периоды отдаются с диска страницами — для fold_transactions()
+#     и дневных агрегатов, без пагинации API
+# =============================================================
+
+import json
+import logging
+import sqlite3
+from collections.abc import Iterable, Iterator
+from datetime import date, datetime, timedelta, timezone
+
+from marketplace.pages import DEFAULT_PAGE_WORKERS
+from ozon.finance.script import iter_transaction_pages, operation_day
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEDGER_PATH = "ozon_finance.db"
+
+# Сколько последних дней покрытия перечитывается при каждой синхронизации
+DEFAULT_OVERLAP_DAYS = 3
+
+PAGE_SIZE = 10_000
+
+
+# =============================================================
+# СХЕМА
+# =============================================================
+
+def open_ledger(path: str = DEFAULT_LEDGER_PATH) -> sqlite3.Connection:
+    """
+    Открывает (и при необходимости создаёт) журнал.
+    """
+    conn = sqlite3.connect(path)
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS operations (
+        operation_id INTEGER PRIMARY KEY,
+        op_date TEXT,
+        operation_type TEXT,
+        posting_number TEXT,
+        amount REAL,
+        data TEXT
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_operations_date ON operations (op_date, operation_id)")
+
+    # Состояние синхронизации: covered_from / covered_to / synced_at
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sync_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """)
+
+    conn.commit()
+    return conn
+
+
+def get_sync_state(conn: sqlite3.Connection) -> dict:
+    state = dict(conn.execute("SELECT key, value FROM sync_state").fetchall())
+    return {
+        "covered_from": state.get("covered_from"),
+        "covered_to": state.get("covered_to"),
+        "synced_at": state.get("synced_at"),
+    }
+
+
+def _set_sync_state(conn: sqlite3.Connection, **values) -> None:
+    conn.executemany(
+        "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+        [(key, str(value)) for key, value in values.items()],
+    )
+    conn.commit()
+
+
+# =============================================================
+# ЗАПИСЬ
+# =============================================================
+
+def save_operations(conn: sqlite3.Connection, operations: Iterable[dict]) -> int:
+    """
+    Сохраняет операции (повторные operation_id перезаписываются).
+    Возвращает число сохранённых операций.
+    """
+    records = [
+        (
+            op["operation_id"],
+            operation_day(op),
+            op.get("operation_type", ""),
+            (op.get("posting") or {}).get("posting_number", ""),
+            float(op.get("amount", 0)),
+            json.dumps(op, ensure_ascii=False),
+        )
+        for op in operations
+        if op.get("operation_id")
+    ]
+    conn.executemany(
+        "INSERT OR REPLACE INTO operations "
+        "(operation_id, op_date, operation_type, posting_number, amount, data) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        records,
+    )
+    conn.commit()
+    return len(records)
+
+
+def _download(conn: sqlite3.Connection, headers: dict, date_from: str, date_to: str,
+              workers: int) -> bool:
+    """
+    Качает операции за период и сразу пишет на диск.
+    Возвращает True, если все страницы получены.
+    """
+    pages = iter_transaction_pages(headers, date_from, date_to, workers)
+    saved = 0
+
+    while True:
+        try:
+            operations = next(pages)
+        except StopIteration as stop:
+            logger.info(f"[ozon:ledger] {date_from} – {date_to}: сохранено операций {saved}")
+            return bool(stop.value)
+
+        saved += save_operations(conn, operations)
+
+
+# =============================================================
+# СИНХРОНИЗАЦИЯ
+# =============================================================
+
+def _shift(day: str, days: int) -> str:
+    return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+
+def sync_ranges(covered_from: str | None, covered_to: str | None, date_from: str, date_to: str,
+                overlap_days: int = DEFAULT_OVERLAP_DAYS) -> list[tuple[str, str]]:
+    """
+    Какие отрезки нужно загрузить, чтобы журнал покрывал период:
+    - без покрытия — весь период;
+    - начало периода раньше покрытия — от начала периода до покрытия;
+    - период задевает последние overlap_days дней покрытия или выходит
+      за него — от начала этого «хвоста» до конца периода.
+    Каждый отрезок примыкает к покрытию, так что оно остаётся сплошным.
+    Даты — "YYYY-MM-DD"; date_to уже не позже сегодняшнего дня.
+    """
+    if not covered_from or not covered_to:
+        return [(date_from, date_to)]
+
+    ranges = []
+    if date_from < covered_from:
+        ranges.append((date_from, _shift(covered_from, -1)))
+
+    tail_from = max(covered_from, _shift(covered_to, 1 - overlap_days))
+    if date_to >= tail_from:
+        ranges.append((tail_from, max(date_to, covered_to)))
+
+    return ranges
+
+
+def sync_ledger(conn: sqlite3.Connection, headers: dict, date_from: str, date_to: str,
+                overlap_days: int = DEFAULT_OVERLAP_DAYS, workers: int = DEFAULT_PAGE_WORKERS) -> bool:
+    """
+    Доводит журнал до актуального состояния для периода (sync_ranges()).
+    Покрытие расширяется только на полностью загруженные отрезки.
+    Возвращает True, если все запросы дошли до конца.
+    """
+    today = datetime.now(timezone.utc).date().isoformat()
+    date_to = min(date_to, today)
+    if date_from > date_to:
+        return True
+
+    state = get_sync_state(conn)
+    covered_from, covered_to = state["covered_from"], state["covered_to"]
+    ok = True
+
+    for range_from, range_to in sync_ranges(covered_from, covered_to, date_from, date_to, overlap_days):
+        if not _download(conn, headers, range_from, range_to, workers):
+            logger.warning(f"[ozon:ledger] Не удалось загрузить {range_from} – {range_to}")
+            ok = False
+            continue
+
+        covered_from = min(covered_from or range_from, range_from)
+        covered_to = max(covered_to or range_to, range_to)
+        _set_sync_state(conn, covered_from=covered_from, covered_to=covered_to)
+
+    _set_sync_state(conn, synced_at=datetime.now(timezone.utc).isoformat(timespec="seconds"))
+    return ok
+
+
+# =============================================================
+# ЧТЕНИЕ
+# =============================================================
+
+def iter_ledger_pages(conn: sqlite3.Connection, date_from: str, date_to: str,
+                      page_size: int = PAGE_SIZE) -> Iterator[list[dict]]:
+    """
+    Отдаёт операции за период страницами по page_size,
+    по дням и operation_id.
+    """
+    last_date, last_id = "", 0
+
+    while True:
+        cur = conn.execute(
+            "SELECT op_date, operation_id, data FROM operations "
+            "WHERE op_date BETWEEN ? AND ? AND (op_date, operation_id) > (?, ?) "
+            "ORDER BY op_date, operation_id LIMIT ?",
+            (date_from, date_to, last_date, last_id, page_size),
+        )
+        records = cur.fetchall()
+        if not records:
+            break
+
+        yield [json.loads(data) for _, _, data in records]
+
+        if len(records) < page_size:
+            break
+        last_date, last_id = records[-1][0], records[-1][1]
@@ -6,9 +6,12 @@ from ozon.autoanswers.script import process_reviews, process_questions
 from ozon.analytics.script import process as process_analytics
 from ozon.finance.script import process as process_finance
 from ozon.recommendations.script import process as process_recommendations
+from ozon.client import configure_client
+from marketplace import metrics
 
 
-def run_ozon_skill(config: dict, date_from: str = None, date_to: str = None) -> dict:
+def run_ozon_skill(config: dict, date_from: str = None, date_to: str = None,
+                   configure_http: bool = True) -> dict:
     """
     Главная точка входа.
 
@@ -18,31 +21,51 @@ def run_ozon_skill(config: dict, date_from: str = None, date_to: str = None) ->
     3) аналитика продаж и склада
     4) финансы
     5) рекомендации
+
+    Время и счётчики этапов — в results["_metrics"] (marketplace/metrics.py).
+
+    configure_http=False — не пересоздавать общий HTTP-клиент
+    (его уже настроил вызывающий, например marketplace/accounts.py).
     """
 
+    # общий HTTP-клиент Ozon: свои лимиты/повторы, если заданы в конфиге
+    if configure_http and config.get("ozon", {}).get("http"):
+        configure_client(config)
+
     results = {}
+    run = metrics.RunMetrics("ozon", metrics.run_labels(config))
 
-    # 1. Автоответы на отзывы
-    results["reviews"] = process_reviews(config)
+    try:
+        # 1. Автоответы на отзывы
+        with run.stage("reviews"):
+            results["reviews"] = process_reviews(config)
 
-    # 2. Ответы на вопросы покупателей
-    results["questions"] = process_questions(config)
+        # 2. Ответы на вопросы покупателей
+        with run.stage("questions"):
+            results["questions"] = process_questions(config)
 
-    # 3. Аналитика (только если передан период)
-    if date_from and date_to:
-        analytics = process_analytics(config, date_from, date_to)
-        results["analytics"] = analytics
-    else:
-        analytics = {}
+        # 3. Аналитика (только если передан период)
+        if date_from and date_to:
+            with run.stage("analytics"):
+                analytics = process_analytics(config, date_from, date_to)
+            results["analytics"] = analytics
+        else:
+            analytics = {}
 
-    # 4. Финансы
-    if date_from and date_to:
-        finance = process_finance(config, date_from, date_to)
-        results["finance"] = finance
-    else:
-        finance = {}
+        # 4. Финансы
+        if date_from and date_to:
+            with run.stage("finance"):
+                finance = process_finance(config, date_from, date_to)
+            results["finance"] = finance
+        else:
+            finance = {}
 
-    # 5. Рекомендации на основе аналитики
-    results["recommendations"] = process_recommendations(analytics, finance)
+        # 5. Рекомендации на основе аналитики
+        with run.stage("recommendations"):
+            results["recommendations"] = process_recommendations(analytics, finance)
+    finally:
+        # метрики выгружаются и при ошибке этапа — видно, на чём упало
+        results["_metrics"] = run.report()
+        metrics.export(results["_metrics"], config)
 
-    return results
\ No newline at end of file
+    return results
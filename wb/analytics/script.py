@@ -8,6 +8,10 @@ import requests
 import logging
 from collections import defaultdict
 
+from marketplace import metrics
+from marketplace.jsonstream import iter_response_items
+from wb.client import get_client
+
 
 # -----------------------------
 # CONFIG & TOKENS
@@ -27,62 +31,104 @@ def get_wb_token(config):
 # Пагинация: если ответ не пустой — запрашиваем дальше по lastChangeDate
 # -----------------------------
 
-def get_sales_stats(token, date_from, date_to=None):
+def iter_sales_pages(token, date_from, stop_after=None):
     """
-    Получаем продажи начиная с date_from.
-    date_to — используем для фильтрации на стороне клиента,
-    т.к. API принимает только dateFrom.
+    Постранично отдаёт продажи, изменённые начиная с date_from.
 
-    date_from формат: "2024-01-01"
+    Записи идут по возрастанию lastChangeDate, поэтому если задан
+    stop_after ("2024-01-31T23:59:59") — пагинация останавливается,
+    как только страница ушла за эту отметку.
+
+    Значение генератора (StopIteration.value): True, если дошли до конца
+    (или до stop_after), False — если прервались на ошибке.
     """
     url = "https://statistics-api.wildberries.ru/api/v1/supplier/sales"
     headers = {"Authorization": token}
 
-    all_sales = []
     current_date_from = date_from
 
     while True:
         params = {"dateFrom": current_date_from}
 
         try:
-            r = requests.get(url, headers=headers, params=params, timeout=30)
+            r = get_client().get(url, headers=headers, params=params, timeout=30, stream=True)
         except requests.RequestException as e:
             logging.error(f"Sales stats request error: {e}")
-            break
+            return False
 
         if r.status_code != 200:
             logging.warning(f"Sales stats code: {r.status_code}, body: {r.text}")
-            break
+            return False
 
         try:
-            data = r.json()
+            with r:
+                data = list(iter_response_items(r))
         except Exception:
             logging.error("Failed to parse sales stats JSON")
-            break
+            return False
 
         if not data:
-            break
+            return True
+
+        metrics.record(rows=len(data))
+        yield data
+
+        # пагинация: берём lastChangeDate последней записи
+        last_date = data[-1].get("lastChangeDate")
+        if not last_date or len(data) < 500:
+            # меньше 500 записей — значит это последняя страница
+            return True
+
+        if stop_after and last_date > stop_after:
+            # дальше только записи позже нужного периода
+            return True
+
+        current_date_from = last_date  # следующий запрос с этой даты
+
 
+def get_sales_stats(token, date_from, date_to=None):
+    """
+    Получаем продажи начиная с date_from.
+    date_to — используем для фильтрации на стороне клиента,
+    т.к. API принимает только dateFrom. Пагинация при этом
+    останавливается, как только записи ушли за date_to.
+
+    date_from формат: "2024-01-01"
+    """
+    stop_after = date_to + "T23:59:59" if date_to else None
+
+    all_sales = []
+
+    for data in iter_sales_pages(token, date_from, stop_after):
         # фильтруем по date_to на клиенте (если передан)
-        if date_to:
+        if stop_after:
             filtered = [
                 item for item in data
-                if item.get("lastChangeDate", "") <= date_to + "T23:59:59"
+                if item.get("lastChangeDate", "") <= stop_after
             ]
         else:
             filtered = data
 
         all_sales.extend(filtered)
 
-        # пагинация: берём lastChangeDate последней записи
-        last_date = data[-1].get("lastChangeDate")
-        if not last_date or len(data) < 500:
-            # меньше 500 записей — значит это последняя страница
-            break
+    return all_sales
 
-        current_date_from = last_date  # следующий запрос с этой даты
 
-    return all_sales
+def get_stored_sales(token, date_from, date_to, store_path):
+    """
+    Продажи за период через локальный журнал изменений
+    (analytics/store.py): из API докачиваются только записи
+    после сохранённого курсора lastChangeDate.
+    """
+    from wb.analytics.store import open_store, sync_sales, query_sales
+
+    conn = open_store(store_path)
+    try:
+        if not sync_sales(conn, token, date_from):
+            logging.warning("Sales store sync incomplete, answering from disk")
+        return query_sales(conn, date_from, date_to)
+    finally:
+        conn.close()
 
 
 # -----------------------------
@@ -95,7 +141,9 @@ def analyze_sales(data):
         "gmv": 0.0,
         "avg_check": 0.0,
         "by_sku": defaultdict(float),
-        "by_date": defaultdict(float)
+        "by_date": defaultdict(float),
+        # SKU → день → штук (строка продажи +1, строка возврата −1)
+        "units": defaultdict(lambda: defaultdict(int))
     }
 
     for item in data:
@@ -103,6 +151,8 @@ def analyze_sales(data):
         price = float(item.get("priceWithDiscount") or item.get("forPay") or 0)
         sku = item.get("nmId") or item.get("nmID") or item.get("sku")
         date = item.get("date") or item.get("lastChangeDate")
+        # saleID возврата начинается с "R", продажи — с "S"
+        is_return = str(item.get("saleID") or "").startswith("R")
 
         summary["total_orders"] += 1
         summary["gmv"] += price
@@ -114,6 +164,9 @@ def analyze_sales(data):
             day = date.split("T")[0]
             summary["by_date"][day] += price
 
+            if sku:
+                summary["units"][sku][day] += -1 if is_return else 1
+
     summary["avg_check"] = (
         summary["gmv"] / summary["total_orders"]
         if summary["total_orders"] else 0
@@ -131,7 +184,9 @@ def analyze_sales(data):
         "avg_check": summary["avg_check"],
         "top_sku": top_sku,
         "by_sku": dict(summary["by_sku"]),   # ← добавлено для forecast
-        "by_date": dict(summary["by_date"])
+        "by_date": dict(summary["by_date"]),
+        # ← ряды продаж в штуках по дням для forecast/engine.py
+        "units_by_sku_date": {sku: dict(days) for sku, days in summary["units"].items()}
     }
 
 
@@ -148,8 +203,13 @@ def process(config, date_from, date_to):
         logging.warning("WB token not found")
         return {}
 
-    stats = get_sales_stats(token, date_from, date_to)
+    store_path = config.get("analytics", {}).get("store_path")
+    if store_path:
+        stats = get_stored_sales(token, date_from, date_to, store_path)
+    else:
+        stats = get_sales_stats(token, date_from, date_to)
     if not stats:
         return {}
 
-    return analyze_sales(stats)
\ No newline at end of file
+    with metrics.timer("analyze_seconds"):
+        return analyze_sales(stats)
\ No newline at end of file
@@ -0,0 +1,173 @@
+# 🧠 Что делает этот код:
+# локальный журнал изменений продаж WB (SQLite);
+# записи хранятся по ID продажи (saleID), повторные — перезаписываются;
+# помнит курсор — lastChangeDate последней синхронизации;
+# каждый запуск докачивает только записи после курсора;
+# периоды (date_from, date_to) отдаются с диска.
+
+import json
+import logging
+import sqlite3
+
+from wb.analytics.script import iter_sales_pages
+
+DEFAULT_STORE_PATH = "wb_sales.db"
+
+
+# -----------------------------
+# SCHEMA
+# -----------------------------
+
+def open_store(path=DEFAULT_STORE_PATH):
+    """
+    Открывает (и при необходимости создаёт) журнал продаж.
+    """
+    conn = sqlite3.connect(path)
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sales (
+        sale_id TEXT PRIMARY KEY,
+        last_change_date TEXT,
+        data TEXT
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_lcd ON sales (last_change_date)")
+
+    # synced_from — с какой даты журнал полный, cursor — последний lastChangeDate
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sync_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """)
+
+    conn.commit()
+    return conn
+
+
+def get_sync_state(conn):
+    state = dict(conn.execute("SELECT key, value FROM sync_state").fetchall())
+    return state.get("synced_from"), state.get("cursor")
+
+
+def _set_sync_state(conn, **values):
+    conn.executemany(
+        "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+        list(values.items()),
+    )
+    conn.commit()
+
+
+# -----------------------------
+# WRITE
+# -----------------------------
+
+def save_sales(conn, items):
+    """
+    Upsert записей по ID продажи.
+    Возвращает максимальный lastChangeDate среди них (или None).
+    """
+    records = []
+    cursor = None
+
+    for item in items:
+        sale_id = item.get("saleID") or item.get("srid")
+        last_change = item.get("lastChangeDate")
+        if not sale_id or not last_change:
+            continue
+
+        records.append((sale_id, last_change, json.dumps(item, ensure_ascii=False)))
+        if cursor is None or last_change > cursor:
+            cursor = last_change
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO sales (sale_id, last_change_date, data) VALUES (?, ?, ?)",
+        records,
+    )
+    conn.commit()
+    return cursor
+
+
+def _download(conn, token, date_from, stop_after=None, move_cursor=True):
+    """
+    Качает изменения начиная с date_from и пишет их в журнал.
+    Курсор сдвигается после каждой страницы — записи идут
+    по возрастанию lastChangeDate, так что даже частичная
+    докачка оставляет журнал согласованным.
+    """
+    pages = iter_sales_pages(token, date_from, stop_after)
+
+    while True:
+        try:
+            data = next(pages)
+        except StopIteration as stop:
+            return bool(stop.value)
+
+        cursor = save_sales(conn, data)
+        if move_cursor and cursor:
+            _, old_cursor = get_sync_state(conn)
+            if not old_cursor or cursor > old_cursor:
+                _set_sync_state(conn, cursor=cursor)
+
+
+# -----------------------------
+# SYNC
+# -----------------------------
+
+def sync_sales(conn, token, date_from):
+    """
+    Доводит журнал до актуального состояния, начиная с date_from.
+
+    - пустой журнал: одна загрузка от date_from до текущего момента;
+    - date_from раньше synced_from: догружаем только недостающий
+      отрезок (пагинация останавливается на synced_from);
+    - дальше — только изменения после курсора.
+
+    Возвращает True, если все запросы дошли до конца.
+    """
+    synced_from, cursor = get_sync_state(conn)
+
+    if not synced_from:
+        ok = _download(conn, token, date_from)
+        if ok:
+            _set_sync_state(conn, synced_from=date_from)
+        return ok
+
+    ok = True
+    if date_from < synced_from:
+        backfill_ok = _download(conn, token, date_from, stop_after=synced_from, move_cursor=False)
+        if backfill_ok:
+            _set_sync_state(conn, synced_from=date_from)
+        else:
+            logging.warning(f"Sales store backfill {date_from} → {synced_from} incomplete")
+            ok = False
+
+    # изменения после курсора
+    if cursor:
+        ok = _download(conn, token, cursor) and ok
+
+    return ok
+
+
+# -----------------------------
+# READ
+# -----------------------------
+
+def query_sales(conn, date_from, date_to=None):
+    """
+    Записи с lastChangeDate в [date_from, date_to] —
+    те же, что вернул бы get_sales_stats(token, date_from, date_to).
+    """
+    if date_to:
+        cur = conn.execute(
+            "SELECT data FROM sales WHERE last_change_date >= ? AND last_change_date <= ? "
+            "ORDER BY last_change_date, rowid",
+            (date_from, date_to + "T23:59:59"),
+        )
+    else:
+        cur = conn.execute(
+            "SELECT data FROM sales WHERE last_change_date >= ? ORDER BY last_change_date, rowid",
+            (date_from,),
+        )
+
+    return [json.loads(data) for (data,) in cur]
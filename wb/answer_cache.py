@@ -0,0 +1,331 @@
+# =============================================================
+# wb/answer_cache.py
+#
+# Кэш ответов на отзывы:
+#   ✔ ключ — нормализованный текст + оценка + товар
+#   ✔ почти-дубли («всё отлично спасибо!!» ≈ «Всё отлично, спасибо»)
+#     находятся через MinHash по символьным 3-граммам + LSH;
+#     отрицание («всё не отлично») и короткие тексты с другими
+#     словами почти-дублем не считаются
+#   ✔ вытеснение LRU + TTL
+#   ✔ вариация: повторно выданный ответ слегка перефразируется,
+#     чтобы покупатели не видели один и тот же текст слово в слово
+#   ✔ опционально сохраняется на диск (JSON) между запусками
+#
+# Использование:
+#   from wb.answer_cache import get_answer_cache
+#   cache = get_answer_cache(config)
+#   answer = cache.lookup(text, rating, product, seed=feedback_id)
+#   if answer is None:
+#       answer = ...LLM...
+#       cache.store(text, rating, product, answer)
+# =============================================================
+
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from operator import eq
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_TTL = 30 * 24 * 3600     # секунды
+DEFAULT_SIMILARITY = 0.8         # оценка Жаккара по 3-граммам
+NUM_PERM = 64                    # хэш-функций MinHash
+BANDS = 16                       # полос LSH (по NUM_PERM // BANDS значений)
+SHINGLE_SIZE = 3
+
+# слова, меняющие смысл отзыва на обратный: тексты, которые в них
+# расходятся, почти-дублями не считаются
+NEGATION_WORDS = frozenset({"не", "нет", "но", "ни"})
+# в текстах не длиннее стольких слов почти-дубль — те же слова в другом порядке
+SHORT_TEXT_WORDS = 5
+
+_HASH_VALUES = struct.Struct(f"<{NUM_PERM}I")
+
+# синонимичные фразы для вариации ответа
+VARIATIONS = [
+    ["Спасибо за ваш отзыв", "Благодарим за ваш отзыв", "Спасибо, что оставили отзыв"],
+    ["Здравствуйте", "Добрый день"],
+    ["Рады, что", "Приятно, что", "Очень рады, что"],
+    ["Ждём вас снова", "Будем рады видеть вас снова", "Будем рады новым покупкам"],
+    ["Хорошего дня", "Всего доброго", "Хорошего настроения"],
+]
+
+
+# =============================================================
+# НОРМАЛИЗАЦИЯ И СИГНАТУРЫ
+# =============================================================
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_text(text):
+    """
+    "Всё ОТЛИЧНО, спасибо!!!" → "все отлично спасибо"
+    """
+    text = (text or "").lower().replace("ё", "е")
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def shingles(normalized):
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+@lru_cache(maxsize=65536)
+def _shingle_hashes(shingle):
+    """
+    NUM_PERM независимых 32-битных хэшей 3-граммы одним вызовом SHAKE-256
+    (вместо NUM_PERM перестановок a*h+b — в разы быстрее на чистом Python).
+    3-граммы сильно повторяются между отзывами, поэтому кэшируются.
+    """
+    return _HASH_VALUES.unpack(hashlib.shake_256(shingle.encode("utf-8")).digest(_HASH_VALUES.size))
+
+
+@lru_cache(maxsize=4096)
+def minhash(normalized):
+    return tuple(map(min, zip(*map(_shingle_hashes, shingles(normalized)))))
+
+
+def similarity(sig_a, sig_b):
+    """
+    Оценка коэффициента Жаккара по двум сигнатурам.
+    """
+    return sum(map(eq, sig_a, sig_b)) / NUM_PERM
+
+
+def compatible(normalized_a, normalized_b):
+    """
+    Можно ли считать тексты почти-дублями по словам: одинаковые
+    слова-отрицания, а короткие тексты — одинаковый набор слов.
+    """
+    words_a, words_b = set(normalized_a.split()), set(normalized_b.split())
+    if words_a & NEGATION_WORDS != words_b & NEGATION_WORDS:
+        return False
+    if min(len(words_a), len(words_b)) <= SHORT_TEXT_WORDS:
+        return words_a == words_b
+    return True
+
+
+def _bands(signature):
+    rows = NUM_PERM // BANDS
+    return [(i, signature[i * rows:(i + 1) * rows]) for i in range(BANDS)]
+
+
+# =============================================================
+# ВАРИАЦИЯ
+# =============================================================
+
+def vary_answer(answer, seed=None):
+    """
+    Заменяет устойчивые фразы ответа на синонимичные.
+    Один и тот же seed (ID отзыва) даёт один и тот же вариант.
+    """
+    rnd = random.Random(seed)
+    for group in VARIATIONS:
+        for phrase in group:
+            if phrase in answer:
+                answer = answer.replace(phrase, rnd.choice(group), 1)
+                break
+    return answer
+
+
+# =============================================================
+# КЭШ
+# =============================================================
+
+class AnswerCache:
+    """
+    LRU + TTL кэш ответов с поиском почти-дублей.
+    Потокобезопасен — используется пулом генерации ответов.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL,
+                 threshold=DEFAULT_SIMILARITY, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.path = path
+
+        # (оценка, товар, текст) → {"answer", "created", "signature"}
+        self._entries = OrderedDict()
+        # (оценка, товар, полоса, значения) → множество ключей
+        self._lsh = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "near_hits": 0, "misses": 0}
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    # ---------------------------------------------------------
+    # Внутреннее
+    # ---------------------------------------------------------
+
+    def _index(self, key, signature):
+        rating, product, _ = key
+        for band in _bands(signature):
+            self._lsh.setdefault((rating, product, *band), set()).add(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        rating, product, _ = key
+        for band in _bands(entry["signature"]):
+            bucket = self._lsh.get((rating, product, *band))
+            if bucket:
+                bucket.discard(key)
+                if not bucket:
+                    del self._lsh[(rating, product, *band)]
+
+    def _expired(self, entry, now):
+        return self.ttl and now - entry["created"] > self.ttl
+
+    def _insert(self, key, answer, created):
+        if key in self._entries:
+            self._remove(key)
+
+        signature = minhash(key[2])
+        self._entries[key] = {"answer": answer, "created": created, "signature": signature}
+        self._index(key, signature)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    # ---------------------------------------------------------
+    # Публичный интерфейс
+    # ---------------------------------------------------------
+
+    def lookup(self, text, rating=None, product=None, seed=None):
+        """
+        Ответ на такой же или почти такой же отзыв к тому же товару
+        с той же оценкой (с вариацией), либо None.
+        """
+        normalized = normalize_text(text)
+        if not normalized:
+            return None
+
+        key = (rating, product, normalized)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                self._remove(key)
+                entry = None
+
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return vary_answer(entry["answer"], seed)
+
+            # почти-дубли: кандидаты из общих полос LSH, затем проверка
+            # слов и оценка сходства
+            signature = minhash(normalized)
+            candidates = set()
+            for band in _bands(signature):
+                candidates |= self._lsh.get((rating, product, *band), set())
+
+            best_key, best_score = None, self.threshold
+            for candidate in candidates:
+                if not compatible(normalized, candidate[2]):
+                    continue
+                score = similarity(signature, self._entries[candidate]["signature"])
+                if score >= best_score:
+                    best_key, best_score = candidate, score
+
+            if best_key is not None and self._expired(self._entries[best_key], now):
+                self._remove(best_key)
+                best_key = None
+
+            if best_key is None:
+                self.stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.stats["near_hits"] += 1
+            return vary_answer(self._entries[best_key]["answer"], seed)
+
+    def store(self, text, rating=None, product=None, answer=""):
+        normalized = normalize_text(text)
+        if not normalized or not answer:
+            return
+
+        with self._lock:
+            self._insert((rating, product, normalized), answer, time.time())
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ---------------------------------------------------------
+    # Диск
+    # ---------------------------------------------------------
+
+    def save(self, path=None):
+        path = path or self.path
+        if not path:
+            return
+
+        with self._lock:
+            records = [
+                [rating, product, text, entry["answer"], entry["created"]]
+                for (rating, product, text), entry in self._entries.items()
+            ]
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[wb:answer_cache] не удалось прочитать {path}: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            # порядок в файле — от давно использованных к недавним
+            for rating, product, text, answer, created in records:
+                if not (self.ttl and now - created > self.ttl):
+                    self._insert((rating, product, text), answer, created)
+
+
+# =============================================================
+# ОБЩИЙ ЭКЗЕМПЛЯР
+# =============================================================
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache(config):
+    """
+    Кэш из config["answers"]["cache"] или None, если кэш выключен:
+        {"enabled": true, "max_entries": 10000, "ttl_days": 30,
+         "similarity": 0.8, "path": "wb_answer_cache.json"}
+    """
+    global _cache
+    cache_cfg = config.get("answers", {}).get("cache", {})
+    if not cache_cfg.get("enabled"):
+        return None
+
+    with _cache_lock:
+        if _cache is None or _cache.path != cache_cfg.get("path"):
+            _cache = AnswerCache(
+                max_entries=cache_cfg.get("max_entries", DEFAULT_MAX_ENTRIES),
+                ttl=cache_cfg.get("ttl_days", DEFAULT_TTL / 86400) * 86400,
+                threshold=cache_cfg.get("similarity", DEFAULT_SIMILARITY),
+                path=cache_cfg.get("path"),
+            )
+        return _cache
@@ -8,24 +8,28 @@
 
 
 import requests
+import json
 import logging
 import os
+import queue
+import threading
 from openai import OpenAI
 
+from marketplace import metrics
+from marketplace.telegram import get_outbox
+from marketplace.triggers import get_trigger_engine
+from wb.answer_cache import get_answer_cache
+from wb.client import get_client
+
+FALLBACK_ANSWER = "Спасибо за ваш отзыв!"
+
 # -----------------------------
 # TRIGGERS
+# Словари и движок — общие с Ozon: marketplace/triggers.py
 # -----------------------------
 
-TRIGGER_WORDS = [
-    "суд", "судиться", "полиция", "прокуратура", "жалоба в суд",
-    "заявление", "накажу", "юрист", "гнев", "обман",
-    "мошенники", "верните деньги", "подаю в суд", "угроза", "разберусь"
-]
-
-
-def contains_trigger(text):
-    text = text.lower()
-    return any(word in text for word in TRIGGER_WORDS)
+def contains_trigger(text, config=None):
+    return get_trigger_engine(config, "wb").contains(text)
 
 
 # -----------------------------
@@ -33,21 +37,24 @@ def contains_trigger(text):
 # -----------------------------
 
 def send_to_telegram(config, comment):
+    """
+    Ставит алерт в очередь Telegram (marketplace/telegram.py) и сразу
+    возвращается: отправка, лимиты и повторы — в фоновом потоке,
+    соседние алерты склеиваются в одно сообщение.
+    """
     try:
         bot_token = config["telegram"]["botToken"]
         chat_id = config["telegram"]["chatId"]
+    except (KeyError, TypeError):
+        logging.error("Telegram config not found")
+        return
 
-        message = (
-            "⚠️ Триггерный комментарий\n\n"
-            f"{comment.get('text', '')}\n\n"
-            f"ID: {comment.get('id')}"
-        )
-
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        requests.post(url, json={"chat_id": chat_id, "text": message}, timeout=10)
-
-    except Exception as e:
-        logging.error(f"Telegram send error: {e}")
+    message = (
+        "⚠️ Триггерный комментарий\n\n"
+        f"{comment.get('text', '')}\n\n"
+        f"ID: {comment.get('id')}"
+    )
+    get_outbox(config).alert(bot_token, chat_id, message)
 
 
 # -----------------------------
@@ -72,17 +79,38 @@ def get_openai_key(config):
 # AI: OPENAI (новый SDK >= 1.0.0) OR LOCAL FALLBACK
 # -----------------------------
 
+# клиенты переиспользуются между вызовами — без нового соединения на каждый отзыв
+_openai_clients = {}
+_openai_lock = threading.Lock()
+_ollama_session = requests.Session()
+
+
+def get_openai_client(api_key):
+    with _openai_lock:
+        client = _openai_clients.get(api_key)
+        if client is None:
+            client = _openai_clients[api_key] = OpenAI(api_key=api_key)
+        return client
+
+
 def call_openai(prompt, api_key):
     try:
-        client = OpenAI(api_key=api_key)
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "Ты помощник продавца Wildberries. Отвечай дружелюбно и по делу."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=150,
-            temperature=0.7
+        client = get_openai_client(api_key)
+        with metrics.timer("llm_seconds"):
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[
+                    {"role": "system", "content": "Ты помощник продавца Wildberries. Отвечай дружелюбно и по делу."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=150,
+                temperature=0.7
+            )
+        usage = getattr(response, "usage", None)
+        metrics.record(
+            llm_calls=1,
+            llm_prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            llm_completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
         )
         return response.choices[0].message.content
 
@@ -93,32 +121,71 @@ def call_openai(prompt, api_key):
 
 def call_local_ai(prompt):
     try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={"model": "mistral", "prompt": prompt, "stream": False},
-            timeout=30
-        )
+        with metrics.timer("llm_seconds"):
+            response = _ollama_session.post(
+                "http://localhost:11434/api/generate",
+                json={"model": "mistral", "prompt": prompt, "stream": False},
+                timeout=30
+            )
         if response.status_code == 200:
-            return response.json().get("response", "").strip()
+            data = response.json()
+            metrics.record(
+                llm_calls=1,
+                llm_prompt_tokens=data.get("prompt_eval_count", 0),
+                llm_completion_tokens=data.get("eval_count", 0),
+            )
+            return data.get("response", "").strip()
 
     except Exception as e:
         logging.error(f"Ollama error: {e}")
 
-    return "Спасибо за ваш отзыв!"
+    return FALLBACK_ANSWER
 
 
 def generate_answer(comment, config):
+    """
+    Ответ на отзыв. Если включён кэш (answers.cache) — сначала ищем
+    ответ на такой же или похожий отзыв к тому же товару с той же оценкой;
+    в LLM уходят только новые по смыслу отзывы.
+    """
     text = comment.get("text", "").strip()
     if not text:
-        return "Спасибо за ваш отзыв!"
+        return FALLBACK_ANSWER
 
+    cache = get_answer_cache(config)
+    rating = comment.get("productValuation")
+    product = (comment.get("productDetails") or {}).get("nmId")
+
+    if cache is not None:
+        cached = cache.lookup(text, rating, product, seed=comment.get("id"))
+        if cached:
+            return cached
+
+    answer = None
     api_key = get_openai_key(config)
     if api_key:
         answer = call_openai(text, api_key)
-        if answer:
-            return answer
 
-    return call_local_ai(text)
+    if not answer:
+        answer = call_local_ai(text)
+
+    # заглушку при ошибке LLM не кэшируем
+    if cache is not None and answer != FALLBACK_ANSWER:
+        cache.store(text, rating, product, answer)
+
+    return answer
+
+
+def save_answer_cache(config):
+    cache = get_answer_cache(config)
+    if cache is None:
+        return
+
+    logging.info(f"Answer cache: {cache.stats}, {len(cache)} entries")
+    try:
+        cache.save()
+    except OSError as e:
+        logging.error(f"Answer cache save error: {e}")
 
 
 # -----------------------------
@@ -142,7 +209,7 @@ def get_unanswered_feedbacks(token, skip=0, take=100):
     }
 
     try:
-        r = requests.get(url, headers=headers, params=params, timeout=10)
+        r = get_client().get(url, headers=headers, params=params, timeout=10)
     except requests.RequestException as e:
         logging.error(f"WB feedbacks request error: {e}")
         return [], 0
@@ -151,9 +218,11 @@ def get_unanswered_feedbacks(token, skip=0, take=100):
         logging.warning(f"WB feedbacks response code: {r.status_code}, body: {r.text}")
         return [], 0
 
-    data = r.json()
+    with metrics.timer("json_seconds"):
+        data = r.json()
     feedbacks = data.get("data", {}).get("feedbacks", [])
     count_unanswered = data.get("data", {}).get("countUnanswered", 0)
+    metrics.record(rows=len(feedbacks))
 
     return feedbacks, count_unanswered
 
@@ -177,7 +246,7 @@ def send_answer(token, feedback_id, answer_text):
     }
 
     try:
-        r = requests.patch(url, headers=headers, json=payload, timeout=10)
+        r = get_client().patch(url, headers=headers, json=payload, timeout=10)
     except requests.RequestException as e:
         logging.error(f"Send answer error: {e}")
         return False
@@ -189,16 +258,186 @@ def send_answer(token, feedback_id, answer_text):
     return True
 
 
+# -----------------------------
+# CHECKPOINT
+# Файл JSON lines: {"id": ..., "action": ...} на каждый обработанный отзыв.
+# После падения уже обработанные отзывы повторно не трогаем;
+# неудачные ({"answered": false}) берутся снова при следующем запуске.
+# -----------------------------
+
+def load_checkpoint(path):
+    done = set()
+    if not path or not os.path.exists(path):
+        return done
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                if record.get("answered") is not False:
+                    done.add(record["id"])
+                else:
+                    done.discard(record["id"])
+            except (ValueError, KeyError, AttributeError):
+                continue
+    return done
+
+
+def append_checkpoint(path, lock, record):
+    if not path:
+        return
+    with lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
 # -----------------------------
 # PROCESS (MAIN LOGIC)
 # -----------------------------
 
+_STOP = object()
+
+
+def process_concurrent(config, token):
+    """
+    Конвейер producer/consumer:
+    - поток загрузки страниц → очередь на генерацию
+    - пул генерации ответов (LLM) → очередь на отправку
+    - пул отправки ответов (PATCH)
+
+    Список неотвеченных сначала читается целиком (skip/take), и только
+    потом отзывы уходят в работу: отправленный ответ убирает отзыв из
+    выборки isAnswered=false, и страницы, читаемые во время отправки,
+    сдвигались бы — часть отзывов пропускалась.
+    Очереди ограничены (answers.queue_size): загрузка страниц от них не
+    зависит, ждёт только подача прочитанных отзывов в генерацию, если
+    LLM не успевает, и генерация — если не успевает отправка.
+
+    Ошибка генерации ответа записывается в checkpoint как неудачная.
+    Ошибка чтения снимка (или отправки в Telegram) не теряется: уже
+    прочитанные отзывы обрабатываются, после чего исключение пробрасывается
+    вызывающему.
+
+    Настройки в config["answers"]:
+        llm_workers (4), send_workers (2), queue_size (100), checkpoint_path
+    """
+    cfg = config.get("answers", {})
+    llm_workers = cfg.get("llm_workers", 4)
+    send_workers = cfg.get("send_workers", 2)
+    queue_size = cfg.get("queue_size", 100)
+    checkpoint_path = cfg.get("checkpoint_path")
+
+    done_ids = load_checkpoint(checkpoint_path)
+    engine = get_trigger_engine(config, "wb")
+    checkpoint_lock = threading.Lock()
+
+    to_generate = queue.Queue(maxsize=queue_size)
+    to_send = queue.Queue(maxsize=queue_size)
+
+    results = []
+    results_lock = threading.Lock()
+    producer_errors = []
+
+    def record(item):
+        with results_lock:
+            results.append(item)
+        append_checkpoint(checkpoint_path, checkpoint_lock, item)
+
+    def fetch_pages():
+        seen = set()
+        pending = []
+        skip = 0
+        take = 100
+
+        try:
+            # снимок: пока он читается, ответы не отправляются
+            while True:
+                feedbacks, count_unanswered = get_unanswered_feedbacks(token, skip=skip, take=take)
+                if not feedbacks:
+                    break
+
+                triggers = engine.classify_batch([c.get("text", "") for c in feedbacks])
+
+                for c, matched in zip(feedbacks, triggers):
+                    feedback_id = c.get("id")
+                    if not feedback_id or feedback_id in seen or feedback_id in done_ids:
+                        continue
+                    seen.add(feedback_id)
+
+                    if matched:
+                        send_to_telegram(config, c)
+                        record({"id": feedback_id, "action": "sent_to_telegram", "triggers": matched})
+                        continue
+
+                    pending.append(c)
+
+                skip += take
+                if skip >= count_unanswered:
+                    break
+        except Exception as e:
+            # исключение потока иначе теряется — пробрасываем после join
+            logging.exception(f"WB feedbacks snapshot error: {e}")
+            producer_errors.append(e)
+
+        for c in pending:
+            to_generate.put(c)
+        for _ in range(llm_workers):
+            to_generate.put(_STOP)
+
+    def generate_worker():
+        while True:
+            c = to_generate.get()
+            if c is _STOP:
+                break
+            try:
+                answer = generate_answer(c, config)
+            except Exception as e:
+                logging.exception(f"Answer generation error for {c['id']}: {e}")
+                record({"id": c["id"], "answered": False, "error": f"{type(e).__name__}: {e}"})
+                continue
+            to_send.put((c["id"], answer))
+
+    def send_worker():
+        while True:
+            item = to_send.get()
+            if item is _STOP:
+                break
+            feedback_id, answer = item
+            ok = send_answer(token, feedback_id, answer)
+            record({"id": feedback_id, "answered": ok})
+
+    # bind() — счётчики потоков попадают в этап вызывающего (marketplace/metrics.py)
+    producer = threading.Thread(target=metrics.bind(fetch_pages), name="wb-feedbacks-fetch")
+    generators = [threading.Thread(target=metrics.bind(generate_worker), name=f"wb-feedbacks-llm-{i}")
+                  for i in range(llm_workers)]
+    senders = [threading.Thread(target=metrics.bind(send_worker), name=f"wb-feedbacks-send-{i}")
+               for i in range(send_workers)]
+
+    for t in [producer, *generators, *senders]:
+        t.start()
+
+    producer.join()
+    for t in generators:
+        t.join()
+    for _ in senders:
+        to_send.put(_STOP)
+    for t in senders:
+        t.join()
+
+    save_answer_cache(config)
+    if producer_errors:
+        raise producer_errors[0]
+    return results
+
+
 def process(config):
     """
     Основная точка входа:
     - читаем НЕотвеченные отзывы (с пагинацией)
     - если триггер → Telegram (без ответа)
     - иначе → генерим ответ и отправляем
+
+    answers.concurrent = true — конвейер process_concurrent().
     """
     if not config.get("wb", {}).get("enabled"):
         return []
@@ -208,6 +447,11 @@ def process(config):
         logging.warning("WB token not found")
         return []
 
+    if config.get("answers", {}).get("concurrent"):
+        return process_concurrent(config, token)
+
+    engine = get_trigger_engine(config, "wb")
+
     results = []
     skip = 0
     take = 100
@@ -218,16 +462,17 @@ def process(config):
         if not feedbacks:
             break
 
-        for c in feedbacks:
+        # триггеры — для всей страницы разом
+        triggers = engine.classify_batch([c.get("text", "") for c in feedbacks])
+
+        for c, matched in zip(feedbacks, triggers):
             feedback_id = c.get("id")
             if not feedback_id:
                 continue
 
-            text = c.get("text", "")
-
-            if contains_trigger(text):
+            if matched:
                 send_to_telegram(config, c)
-                results.append({"id": feedback_id, "action": "sent_to_telegram"})
+                results.append({"id": feedback_id, "action": "sent_to_telegram", "triggers": matched})
                 continue
 
             answer = generate_answer(c, config)
@@ -240,4 +485,5 @@ def process(config):
         if skip >= count_unanswered:
             break
 
+    save_answer_cache(config)
     return results
\ No newline at end of file
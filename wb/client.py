@@ -0,0 +1,88 @@
+# =============================================================
+# wb/client.py
+#
+# Общий HTTP-клиент для всех модулей WB API:
+#   ✔ один requests.Session с пулом keep-alive соединений
+#   ✔ token bucket на каждый хост (и аккаунт) — лимиты WB
+#   ✔ 429 / Retry-After и 5xx → повтор с экспоненциальной паузой
+#   ✔ счётчики: запросы, повторы, байты, задержка
+#
+# Использование:
+#   from wb.client import get_client
+#   r = get_client().get(url, headers=headers, params=params, timeout=30)
+#
+# Ответ — обычный requests.Response, ошибки — requests.RequestException,
+# поэтому обработка в модулях не меняется.
+# Лимиты, повторы и статистика — в marketplace/http.py.
+# =============================================================
+
+import threading
+
+from marketplace.http import DEFAULT_BACKOFF, DEFAULT_MAX_RETRIES, POOL_SIZE, RateLimitedClient
+
+# Лимиты WB: ключ — "хост" или "хост/путь", значение — (запросов в секунду, burst).
+# Документация WB: статистика — 1 запрос в минуту на метод,
+# отзывы/вопросы — 3 запроса в секунду.
+DEFAULT_RATE_LIMITS = {
+    "statistics-api.wildberries.ru/api/v5/supplier/reportDetailByPeriod": (1 / 60, 1),
+    "statistics-api.wildberries.ru/api/v1/supplier/sales": (1 / 60, 1),
+    "statistics-api.wildberries.ru/api/v1/supplier/stocks": (1 / 60, 1),
+    "statistics-api.wildberries.ru": (1 / 60, 1),
+    "feedbacks-api.wildberries.ru": (3, 3),
+}
+
+
+# =============================================================
+# КЛИЕНТ
+# =============================================================
+
+class WBClient(RateLimitedClient):
+    """
+    HTTP-клиент WB с пулом соединений, лимитами и статистикой.
+    Потокобезопасен — один экземпляр на процесс (см. get_client()).
+    Аккаунт — токен продавца из заголовка Authorization.
+    """
+
+    NAME = "wb"
+    DEFAULT_RATE_LIMITS = DEFAULT_RATE_LIMITS
+    ACCOUNT_HEADERS = ("Authorization",)
+
+
+# =============================================================
+# ОБЩИЙ ЭКЗЕМПЛЯР
+# =============================================================
+
+_client: WBClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> WBClient:
+    """
+    Клиент, общий для всех модулей WB в процессе.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = WBClient()
+        return _client
+
+
+def configure_client(config: dict) -> WBClient:
+    """
+    Пересоздаёт общий клиент с настройками из config["wb"]["http"]:
+        {"rate_limits": {"хост[/путь]": [rps, burst]}, "max_retries": 3, "backoff": 1.0,
+         "pool_size": 16, "base_url": "http://127.0.0.1:8080"}
+    """
+    global _client
+    http_cfg = config.get("wb", {}).get("http", {})
+    rate_limits = {key: tuple(value) for key, value in http_cfg.get("rate_limits", {}).items()}
+
+    with _client_lock:
+        _client = WBClient(
+            rate_limits=rate_limits,
+            max_retries=http_cfg.get("max_retries", DEFAULT_MAX_RETRIES),
+            backoff=http_cfg.get("backoff", DEFAULT_BACKOFF),
+            pool_size=http_cfg.get("pool_size", POOL_SIZE),
+            base_url=http_cfg.get("base_url"),
+        )
+        return _client
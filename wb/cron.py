@@ -1,9 +1,8 @@
-from wb.finance.script import send_daily_digest, send_weekly_digest
+# Запуск по расписанию — через долгоживущий планировщик marketplace/scheduler.py:
+#   python -m wb.cron config.json                          # демон
+#   python -m wb.cron config.json --once wb_daily_digest   # разовый запуск (как раньше)
 
-config = {
-    "wb": {"enabled": True, "WB_API_TOKEN": {"apiKey": "..."}},
-    "telegram": {"botToken": "...", "chatId": "..."},
-    "finance": {}
-}
+from marketplace.scheduler import main
 
-send_daily_digest(config)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# =============================================================
+# wb/finance/benchmark.py
+#
+# Сравнение движков analyze_report на синтетическом отчёте:
+#   построчный (fold_report_rows) vs колоночный (columnar.py)
+#
+# Запуск из корня репозитория:
+#   python -m wb.finance.benchmark            # 1 000 000 строк
+#   python -m wb.finance.benchmark 200000
+# =============================================================
+
+import random
+import sys
+import time
+
+from wb.finance.columnar import decode_columns
+from wb.finance.script import SALE_OPS, RETURN_OPS, PENALTY_OPS, analyze_report
+
+OPS = sorted(SALE_OPS) * 6 + sorted(RETURN_OPS) + sorted(PENALTY_OPS) + ["Логистика", "Хранение"]
+
+
+def make_rows(n: int, skus: int = 20_000, seed: int = 42) -> list[dict]:
+    """
+    Синтетические строки reportDetailByPeriod с нужными анализу полями.
+    """
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        retail = round(rnd.uniform(100, 5000), 2)
+        rows.append({
+            "rrd_id": i + 1,
+            "nm_id": rnd.randrange(1, skus),
+            "supplier_oper_name": rnd.choice(OPS),
+            "retail_price": retail,
+            "ppvz_for_pay": round(retail * rnd.uniform(0.5, 0.9), 2),
+            "delivery_rub": round(rnd.uniform(30, 300), 2),
+            "storage_fee": round(rnd.uniform(0, 3), 2),
+            "penalty": rnd.choice((0, 0, 0, 100)),
+            "paid_acceptance": rnd.choice((0, 0, 15.5)),
+        })
+    return rows
+
+
+def timed(fn, *args) -> tuple[float, dict]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main(n: int) -> None:
+    print(f"Генерация {n:,} строк...".replace(",", " "))
+    rows = make_rows(n)
+
+    t_rows, by_rows = timed(analyze_report, rows, {})
+    t_cols, by_cols = timed(analyze_report, rows, {"engine": "numpy"})
+    t_decode, _ = timed(decode_columns, rows)
+
+    print(f"построчный движок:  {t_rows:6.2f} с")
+    print(f"колоночный движок:  {t_cols:6.2f} с")
+    print(f"  из них dict → колонки: {t_decode:6.2f} с")
+    print(f"  из них свёртки:        {t_cols - t_decode:6.2f} с")
+    print(f"ускорение:          {t_rows / t_cols:6.1f}x")
+    print(f"результаты совпадают: {by_rows == by_cols}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,222 @@
+# =============================================================
+# wb/finance/columnar.py
+#
+# Колоночный движок разбора отчёта о реализации (NumPy):
+#   ✔ строки отчёта → типизированные массивы по колонкам
+#   ✔ итоги и накопители по SKU — групповыми свёртками (bincount)
+#   ✔ работает с теми же накопителями, что и script.fold_report_rows,
+#     поэтому результат finalize_report() совпадает до копейки
+#
+# NumPy — опциональная зависимость. Без неё script.analyze_report
+# просто остаётся на построчном движке.
+# =============================================================
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from wb.finance.script import (
+    SALE_OPS,
+    RETURN_OPS,
+    PENALTY_OPS,
+    REPORT_FIELDS,
+    new_report_state,
+    finalize_report,
+)
+
+HAS_NUMPY = np is not None
+
+# Коды типов операций в колонке "op"
+OP_OTHER = 0
+OP_SALE = 1
+OP_RETURN = 2
+OP_PENALTY = 3
+
+OP_CODES = {
+    **{name: OP_SALE for name in SALE_OPS},
+    **{name: OP_RETURN for name in RETURN_OPS},
+    **{name: OP_PENALTY for name in PENALTY_OPS},
+}
+
+# Денежные колонки, которые нужны анализу
+FLOAT_COLUMNS = (
+    "retail_price",
+    "ppvz_for_pay",
+    "delivery_rub",
+    "storage_fee",
+    "penalty",
+    "paid_acceptance",
+)
+
+# Поля накопителя SKU, которые считаются суммами float
+SKU_FLOAT_FIELDS = ("gross", "net", "logistics", "commission")
+
+
+# =============================================================
+# ДЕКОДИРОВАНИЕ: строки → колонки
+# =============================================================
+
+def decode_columns(rows: list[dict] | list[tuple]) -> dict:
+    """
+    Раскладывает строки отчёта по типизированным массивам:
+    nm_id (int64), op (int8, коды OP_*) и денежные колонки (float64).
+    Строки — словари или компактные кортежи REPORT_FIELDS.
+    """
+    n = len(rows)
+
+    if n and isinstance(rows[0], tuple):
+        # кортежи транспонируются в колонки одним zip
+        values = dict(zip(REPORT_FIELDS, zip(*rows)))
+        column = values.__getitem__
+    else:
+        def column(name):
+            return [row.get(name) for row in rows]
+
+    # Различных названий операций единицы — strip() и поиск кода
+    # делаем один раз на название, а не на каждую строку
+    op_names = [name or "" for name in column("supplier_oper_name")]
+    op_lookup = {name: OP_CODES.get(name.strip(), OP_OTHER) for name in set(op_names)}
+
+    columns = {
+        "nm_id": np.fromiter((value or 0 for value in column("nm_id")), np.int64, n),
+        "op": np.fromiter(map(op_lookup.__getitem__, op_names), np.int8, n),
+    }
+    for name in FLOAT_COLUMNS:
+        columns[name] = np.fromiter((value or 0 for value in column(name)), np.float64, n)
+
+    return columns
+
+
+# =============================================================
+# СВЁРТКИ
+# =============================================================
+
+def _running_sum(start: float, values) -> float:
+    """
+    Последовательная сумма start + v1 + v2 + ...
+
+    np.sum складывает попарно и может разойтись с построчным
+    движком в последнем знаке, cumsum идёт строго по порядку.
+    """
+    if not len(values):
+        return start
+    return float(np.cumsum(np.concatenate(([start], values)))[-1])
+
+
+def _grouped_running_sum(prior, inverse, values):
+    """
+    Суммы по группам, где каждая группа стартует со своего prior.
+    bincount складывает веса в порядке массива, поэтому prior
+    ставим первым — порядок сложения как у построчного движка.
+    """
+    k = len(prior)
+    index = np.concatenate((np.arange(k), inverse))
+    weights = np.concatenate((prior, values))
+    return np.bincount(index, weights=weights, minlength=k)
+
+
+def fold_report_columns(state: dict, rows: list[dict] | list[tuple]) -> dict:
+    """
+    Колоночный аналог script.fold_report_rows: добавляет страницу
+    отчёта в накопители state (изменяет его на месте).
+    """
+    n = len(rows)
+    if not n:
+        return state
+
+    c = decode_columns(rows)
+    op = c["op"]
+    nm_id = c["nm_id"]
+    retail = c["retail_price"]
+    ppvz = c["ppvz_for_pay"]
+    delivery = c["delivery_rub"]
+
+    is_sale = op == OP_SALE
+    is_return = op == OP_RETURN
+    is_penalty = op == OP_PENALTY
+    is_revenue = is_sale | is_return
+
+    # Комиссия = разница между ценой продажи и суммой к выплате (до логистики)
+    commission = np.where(retail > 0, retail - ppvz - delivery, 0.0)
+    commission = np.maximum(commission, 0.0)
+
+    # Продажи прибавляются к выручке, возвраты — вычитаются
+    signed_retail = np.where(is_sale, retail, -retail)
+    signed_ppvz = np.where(is_sale, ppvz, -ppvz)
+
+    state["rows"] += n
+    state["gross_revenue"] = _running_sum(state["gross_revenue"], signed_retail[is_revenue])
+    state["net_revenue"] = _running_sum(state["net_revenue"], signed_ppvz[is_revenue])
+    state["commission"] = _running_sum(state["commission"], commission[is_sale])
+    state["logistics"] = _running_sum(state["logistics"], delivery[is_sale])
+    state["penalties"] = _running_sum(state["penalties"], np.abs(c["penalty"][is_penalty]))
+    state["storage"] = _running_sum(state["storage"], c["storage_fee"])
+    state["advertising"] = _running_sum(state["advertising"], c["paid_acceptance"])
+    state["orders"] += int(np.count_nonzero(is_sale))
+    state["returns"] += int(np.count_nonzero(is_return))
+
+    # --- По SKU: только продажи/возвраты с непустым nm_id ---
+    in_sku = is_revenue & (nm_id != 0)
+    if not in_sku.any():
+        return state
+
+    sku_ids, first_seen, inverse = np.unique(nm_id[in_sku], return_index=True, return_inverse=True)
+    sku_sale = is_sale[in_sku]
+
+    sku_data = state["by_sku"]
+    # Новые SKU добавляем в порядке первого появления — как построчный движок
+    for i in np.argsort(first_seen, kind="stable"):
+        nm = int(sku_ids[i])
+        if nm not in sku_data:
+            sku_data[nm] = {
+                "gross": 0.0,
+                "net": 0.0,
+                "logistics": 0.0,
+                "commission": 0.0,
+                "storage": 0.0,
+                "orders": 0,
+                "returns": 0,
+            }
+
+    accs = [sku_data[int(nm)] for nm in sku_ids]
+    values = {
+        "gross": signed_retail[in_sku],
+        "net": signed_ppvz[in_sku],
+        "logistics": np.where(sku_sale, delivery[in_sku], 0.0),
+        "commission": np.where(sku_sale, commission[in_sku], 0.0),
+    }
+    sums = {
+        field: _grouped_running_sum(
+            np.fromiter((acc[field] for acc in accs), np.float64, len(accs)),
+            inverse,
+            values[field],
+        )
+        for field in SKU_FLOAT_FIELDS
+    }
+    orders = np.bincount(inverse, weights=sku_sale, minlength=len(accs))
+    returns = np.bincount(inverse, weights=~sku_sale, minlength=len(accs))
+
+    for i, acc in enumerate(accs):
+        for field in SKU_FLOAT_FIELDS:
+            acc[field] = float(sums[field][i])
+        acc["orders"] += int(orders[i])
+        acc["returns"] += int(returns[i])
+
+    return state
+
+
+# =============================================================
+# ПУБЛИЧНЫЙ ИНТЕРФЕЙС
+# =============================================================
+
+def analyze_report_columnar(rows: list[dict], finance_cfg: dict) -> dict:
+    """
+    То же, что script.analyze_report, но строки сворачиваются
+    колоночными операциями NumPy.
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("NumPy не установлен: pip install numpy")
+
+    state = fold_report_columns(new_report_state(), rows)
+    return finalize_report(state, finance_cfg)
@@ -11,8 +11,13 @@
 
 import requests
 import logging
-from collections import defaultdict
-from datetime import datetime, timedelta, timezone
+from collections.abc import Callable, Generator, Iterable
+from datetime import date, datetime, timedelta, timezone
+
+from marketplace import metrics
+from marketplace.jsonstream import iter_response_items, project
+from marketplace.telegram import get_outbox
+from wb.client import get_client
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +52,26 @@ DEFAULT_LOSS_THRESHOLD = 0
 # Ниже 20% = низкомаржинальный SKU
 DEFAULT_LOW_MARGIN_THRESHOLD = 20
 
+# Лимит строк на одну страницу reportDetailByPeriod
+PAGE_LIMIT = 100_000
+
+# Поля строки отчёта, которые нужны анализу, — в этом порядке
+# идут значения компактной строки (кортежа), см. iter_report_pages(compact=True)
+REPORT_FIELDS = (
+    "rrd_id",
+    "rr_dt",
+    "nm_id",
+    "supplier_oper_name",
+    "retail_price",
+    "ppvz_for_pay",
+    "delivery_rub",
+    "storage_fee",
+    "penalty",
+    "paid_acceptance",
+)
+
+report_tuple = project(REPORT_FIELDS)
+
 
 # =============================================================
 # HELPERS: КОНФИГ
@@ -77,12 +102,23 @@ def get_finance_config(config: dict) -> dict:
 # API: ОТЧЁТ О РЕАЛИЗАЦИИ
 # =============================================================
 
-def fetch_report(token: str, date_from: str, date_to: str) -> list[dict]:
+def iter_report_pages(
+    token: str, date_from: str, date_to: str, rrdid: int = 0, compact: bool = False
+) -> Generator[list[dict] | list[tuple], None, bool]:
     """
-    Получает детальный отчёт о реализации за период.
+    Постранично отдаёт детальный отчёт о реализации за период.
 
     Пагинация через rrdid (ID последней строки).
     Если строк = 0 — все данные получены.
+    В памяти одновременно держится только одна страница (до 100 000 строк).
+    Ответ разбирается потоково (marketplace/jsonstream.py): 100+ МБ текста
+    страницы целиком в память не читаются.
+
+    rrdid > 0 — отдать только строки после этого ID (докачка).
+    compact=True — строки кортежами полей REPORT_FIELDS, а не словарями
+    со всеми ~80 полями WB: страница в разы меньше в памяти.
+    Значение генератора (StopIteration.value): True, если отчёт
+    получен до конца, False — если прервались на ошибке.
 
     Документация WB:
     GET /api/v5/supplier/reportDetailByPeriod
@@ -90,45 +126,53 @@ def fetch_report(token: str, date_from: str, date_to: str) -> list[dict]:
     url = "https://statistics-api.wildberries.ru/api/v5/supplier/reportDetailByPeriod"
     headers = {"Authorization": token}
 
-    all_rows: list[dict] = []
-    rrdid = 0  # начинаем с 0
+    total = 0
+    complete = False
 
     while True:
         params = {
             "dateFrom": date_from,
             "dateTo": date_to,
             "rrdid": rrdid,
-            "limit": 100_000,
+            "limit": PAGE_LIMIT,
         }
 
         try:
-            r = requests.get(url, headers=headers, params=params, timeout=30)
+            r = get_client().get(url, headers=headers, params=params, timeout=30, stream=True)
         except requests.RequestException as e:
             logger.error(f"[finance] Ошибка запроса отчёта: {e}")
             break
 
-        if r.status_code == 401:
-            logger.error("[finance] Неверный WB токен (401)")
-            break
+        with r:
+            if r.status_code == 401:
+                logger.error("[finance] Неверный WB токен (401)")
+                break
 
-        if r.status_code != 200:
-            logger.warning(f"[finance] Код ответа: {r.status_code} | {r.text[:200]}")
-            break
+            if r.status_code != 200:
+                logger.warning(f"[finance] Код ответа: {r.status_code} | {r.text[:200]}")
+                break
 
-        try:
-            rows = r.json()
-        except Exception as e:
-            logger.error(f"[finance] Ошибка парсинга JSON: {e}")
-            break
+            try:
+                items = iter_response_items(r)
+                rows = list(map(report_tuple, items)) if compact else list(items)
+            except Exception as e:
+                logger.error(f"[finance] Ошибка разбора JSON: {e}")
+                break
 
         if not rows:
             # Пустой ответ — все данные получены
+            complete = True
             break
 
-        all_rows.extend(rows)
+        total += len(rows)
+        metrics.record(rows=len(rows))
 
         # Берём rrdid последней строки для следующей страницы
-        last_rrdid = rows[-1].get("rrd_id") or rows[-1].get("rrdid")
+        last_rrdid = rows[-1][0] if compact else rows[-1].get("rrd_id") or rows[-1].get("rrdid")
+        is_last = len(rows) < PAGE_LIMIT
+
+        yield rows
+
         if not last_rrdid or last_rrdid == rrdid:
             # Защита от бесконечного цикла
             break
@@ -136,44 +180,74 @@ def fetch_report(token: str, date_from: str, date_to: str) -> list[dict]:
         rrdid = last_rrdid
 
         # Если строк меньше лимита — это последняя страница
-        if len(rows) < 100_000:
+        if is_last:
+            complete = True
             break
 
-    logger.info(f"[finance] Получено строк отчёта: {len(all_rows)}")
+    logger.info(f"[finance] Получено строк отчёта: {total}")
+    return complete
+
+
+def fetch_report(token: str, date_from: str, date_to: str) -> list[dict]:
+    """
+    Получает детальный отчёт о реализации за период целиком.
+
+    Все страницы склеиваются в один список — для больших периодов
+    лучше использовать iter_report_pages() + analyze_report_stream().
+    """
+    all_rows: list[dict] = []
+    for rows in iter_report_pages(token, date_from, date_to):
+        all_rows.extend(rows)
     return all_rows
 
 
+def iter_synced_pages(token: str, date_from: str, date_to: str, store_path: str,
+                      compact: bool = False) -> Generator[list[dict] | list[tuple], None, bool]:
+    """
+    То же, что iter_report_pages(), но через локальное хранилище
+    (wb/finance/store.py): из API докачиваются только новые строки,
+    период отдаётся с диска. Возвращает True, если синхронизация полная.
+    """
+    from wb.finance.store import open_store, sync_report, iter_stored_pages
+
+    conn = open_store(store_path)
+    try:
+        complete = sync_report(conn, token, date_from, date_to)
+        if not complete:
+            logger.warning("[finance] Синхронизация неполная — отдаём то, что есть на диске")
+        yield from iter_stored_pages(conn, date_from, date_to, compact=compact)
+        return complete
+    finally:
+        conn.close()
+
+
 # =============================================================
 # АНАЛИЗ ОТЧЁТА
 # =============================================================
 
-def analyze_report(rows: list[dict], finance_cfg: dict) -> dict:
+def new_report_state() -> dict:
     """
-    Разбирает строки отчёта о реализации.
-
-    Возвращает:
-    - общую выручку, вычеты, чистую выручку, маржу
-    - разбивку вычетов по категориям
-    - метрики по каждому SKU
-    - список убыточных и низкомаржинальных SKU
+    Пустые накопители для потокового разбора отчёта.
+    Заполняются через fold_report_rows(), итог — finalize_report().
     """
+    return {
+        "rows": 0,
+        "gross_revenue": 0.0,     # выручка до вычетов (sum retail_price для продаж)
+        "net_revenue": 0.0,       # чистая выручка (sum ppvz_for_pay)
+        "commission": 0.0,
+        "logistics": 0.0,
+        "storage": 0.0,
+        "penalties": 0.0,
+        "advertising": 0.0,
+        "orders": 0,
+        "returns": 0,
+        # По SKU: nm_id -> накопители
+        "by_sku": {},
+    }
 
-    loss_threshold = finance_cfg.get("loss_margin_threshold", DEFAULT_LOSS_THRESHOLD)
-    low_margin_threshold = finance_cfg.get("low_margin_threshold", DEFAULT_LOW_MARGIN_THRESHOLD)
 
-    # Агрегаты по всему отчёту
-    gross_revenue = 0.0      # выручка до вычетов (sum retail_price для продаж)
-    net_revenue = 0.0        # чистая выручка (sum ppvz_for_pay)
-    total_commission = 0.0
-    total_logistics = 0.0
-    total_storage = 0.0
-    total_penalties = 0.0
-    total_advertising = 0.0
-    orders_count = 0
-    returns_count = 0
-
-    # По SKU: nm_id -> накопители
-    sku_data: dict[int, dict] = defaultdict(lambda: {
+def _new_sku_state() -> dict:
+    return {
         "gross": 0.0,
         "net": 0.0,
         "logistics": 0.0,
@@ -181,56 +255,100 @@ def analyze_report(rows: list[dict], finance_cfg: dict) -> dict:
         "storage": 0.0,
         "orders": 0,
         "returns": 0,
-    })
+    }
 
-    for row in rows:
-        op = (row.get("supplier_oper_name") or "").strip()
-        nm_id = row.get("nm_id") or 0
 
-        retail_price = float(row.get("retail_price") or 0)
-        ppvz_for_pay = float(row.get("ppvz_for_pay") or 0)
-        delivery_rub = float(row.get("delivery_rub") or 0)
-        storage_fee = float(row.get("storage_fee") or 0)
-        penalty = float(row.get("penalty") or 0)
-        paid_acceptance = float(row.get("paid_acceptance") or 0)  # реклама/платная приёмка
+def fold_report_rows(state: dict, rows: Iterable[dict]) -> dict:
+    """
+    Добавляет строки отчёта в накопители state (изменяет его на месте).
+    Можно вызывать для каждой страницы по мере её получения.
+    """
+    return fold_report_tuples(state, map(report_tuple, rows))
+
+
+def fold_report_tuples(state: dict, rows: Iterable[tuple]) -> dict:
+    """
+    То же, что fold_report_rows(), для компактных строк (кортежей REPORT_FIELDS).
+    """
+    sku_data = state["by_sku"]
+
+    for _, _, nm_id, op, retail_price, ppvz_for_pay, delivery_rub, storage_fee, penalty, paid_acceptance in rows:
+        state["rows"] += 1
+
+        op = (op or "").strip()
+        nm_id = nm_id or 0
+
+        retail_price = float(retail_price or 0)
+        ppvz_for_pay = float(ppvz_for_pay or 0)
+        delivery_rub = float(delivery_rub or 0)
+        storage_fee = float(storage_fee or 0)
+        penalty = float(penalty or 0)
+        paid_acceptance = float(paid_acceptance or 0)  # реклама/платная приёмка
 
         # Комиссия = разница между ценой продажи и суммой к выплате (до логистики)
         commission = retail_price - ppvz_for_pay - delivery_rub if retail_price > 0 else 0.0
 
         if op in SALE_OPS:
-            gross_revenue += retail_price
-            net_revenue += ppvz_for_pay
-            total_commission += max(commission, 0)
-            total_logistics += delivery_rub
-            orders_count += 1
+            state["gross_revenue"] += retail_price
+            state["net_revenue"] += ppvz_for_pay
+            state["commission"] += max(commission, 0)
+            state["logistics"] += delivery_rub
+            state["orders"] += 1
 
             if nm_id:
-                sku_data[nm_id]["gross"] += retail_price
-                sku_data[nm_id]["net"] += ppvz_for_pay
-                sku_data[nm_id]["logistics"] += delivery_rub
-                sku_data[nm_id]["commission"] += max(commission, 0)
-                sku_data[nm_id]["orders"] += 1
+                sku = sku_data.get(nm_id)
+                if sku is None:
+                    sku = sku_data[nm_id] = _new_sku_state()
+                sku["gross"] += retail_price
+                sku["net"] += ppvz_for_pay
+                sku["logistics"] += delivery_rub
+                sku["commission"] += max(commission, 0)
+                sku["orders"] += 1
 
         elif op in RETURN_OPS:
             # Возвраты уменьшают выручку
-            gross_revenue -= retail_price
-            net_revenue -= ppvz_for_pay
-            returns_count += 1
+            state["gross_revenue"] -= retail_price
+            state["net_revenue"] -= ppvz_for_pay
+            state["returns"] += 1
 
             if nm_id:
-                sku_data[nm_id]["gross"] -= retail_price
-                sku_data[nm_id]["net"] -= ppvz_for_pay
-                sku_data[nm_id]["returns"] += 1
+                sku = sku_data.get(nm_id)
+                if sku is None:
+                    sku = sku_data[nm_id] = _new_sku_state()
+                sku["gross"] -= retail_price
+                sku["net"] -= ppvz_for_pay
+                sku["returns"] += 1
 
         elif op in PENALTY_OPS:
-            total_penalties += abs(penalty)
+            state["penalties"] += abs(penalty)
 
         # Хранение и платная приёмка — независимо от типа операции
-        total_storage += storage_fee
-        total_advertising += paid_acceptance
+        state["storage"] += storage_fee
+        state["advertising"] += paid_acceptance
+
+    return state
+
+
+def finalize_report(state: dict, finance_cfg: dict) -> dict:
+    """
+    Превращает накопители в итоговый отчёт:
+    - общую выручку, вычеты, чистую выручку, маржу
+    - разбивку вычетов по категориям
+    - метрики по каждому SKU
+    - список убыточных и низкомаржинальных SKU
+    """
+
+    loss_threshold = finance_cfg.get("loss_margin_threshold", DEFAULT_LOSS_THRESHOLD)
+    low_margin_threshold = finance_cfg.get("low_margin_threshold", DEFAULT_LOW_MARGIN_THRESHOLD)
+
+    gross_revenue = state["gross_revenue"]
+    net_revenue = state["net_revenue"]
 
     # Итого вычетов
-    total_deductions = total_commission + total_logistics + total_storage + total_penalties + total_advertising
+    total_deductions = (
+        state["commission"] + state["logistics"] + state["storage"]
+        + state["penalties"] + state["advertising"]
+    )
 
     # Маржа по всему отчёту
     margin_pct = round((net_revenue / gross_revenue * 100), 1) if gross_revenue > 0 else 0.0
@@ -240,7 +358,7 @@ def analyze_report(rows: list[dict], finance_cfg: dict) -> dict:
     loss_skus = []
     low_margin_skus = []
 
-    for nm_id, d in sku_data.items():
+    for nm_id, d in state["by_sku"].items():
         sku_margin = round((d["net"] / d["gross"] * 100), 1) if d["gross"] > 0 else 0.0
         is_loss = sku_margin <= loss_threshold
         is_low = loss_threshold < sku_margin <= low_margin_threshold
@@ -272,14 +390,14 @@ def analyze_report(rows: list[dict], finance_cfg: dict) -> dict:
         "margin_pct": margin_pct,
         "to_pay": round(net_revenue, 2),
         "deductions_breakdown": {
-            "commission": round(total_commission, 2),
-            "logistics": round(total_logistics, 2),
-            "storage": round(total_storage, 2),
-            "penalties": round(total_penalties, 2),
-            "advertising": round(total_advertising, 2),
+            "commission": round(state["commission"], 2),
+            "logistics": round(state["logistics"], 2),
+            "storage": round(state["storage"], 2),
+            "penalties": round(state["penalties"], 2),
+            "advertising": round(state["advertising"], 2),
         },
-        "orders": orders_count,
-        "returns": returns_count,
+        "orders": state["orders"],
+        "returns": state["returns"],
         "by_sku": by_sku,
         "top_skus": top_skus,
         "loss_skus": loss_skus,
@@ -288,6 +406,91 @@ def analyze_report(rows: list[dict], finance_cfg: dict) -> dict:
     }
 
 
+def get_fold(finance_cfg: dict, compact: bool = False) -> Callable[[dict, list], dict]:
+    """
+    Выбирает движок свёртки строк.
+
+    finance.engine = "numpy" — колоночный движок (wb/finance/columnar.py),
+    иначе и при отсутствии NumPy — построчный fold_report_rows()
+    (fold_report_tuples() для компактных строк).
+    """
+    if finance_cfg.get("engine") == "numpy":
+        from wb.finance.columnar import HAS_NUMPY, fold_report_columns
+
+        if HAS_NUMPY:
+            return fold_report_columns
+        logger.warning("[finance] NumPy не установлен — используем построчный движок")
+
+    return fold_report_tuples if compact else fold_report_rows
+
+
+def analyze_report(rows: list[dict], finance_cfg: dict) -> dict:
+    """
+    Разбирает строки отчёта о реализации, уже загруженные в память.
+    Результат тот же, что у finalize_report().
+    """
+    fold = get_fold(finance_cfg)
+    state = fold(new_report_state(), rows)
+    return finalize_report(state, finance_cfg)
+
+
+def analyze_report_stream(pages: Iterable[list], finance_cfg: dict, compact: bool = False) -> dict:
+    """
+    Разбирает отчёт постранично: каждая страница сразу сворачивается
+    в накопители и отбрасывается. Пиковая память ≈ одна страница.
+    compact=True — страницы из компактных строк (iter_report_pages(compact=True)).
+
+    Если строк не было — возвращает пустой словарь.
+    """
+    fold = get_fold(finance_cfg, compact)
+    state = new_report_state()
+    for rows in pages:
+        with metrics.timer("analyze_seconds"):
+            fold(state, rows)
+
+    if not state["rows"]:
+        return {}
+
+    with metrics.timer("analyze_seconds"):
+        return finalize_report(state, finance_cfg)
+
+
+def report_row_day(row: dict) -> str:
+    return (row.get("rr_dt") or "")[:10]
+
+
+def report_tuple_day(row: tuple) -> str:
+    return (row[1] or "")[:10]
+
+
+def period_report_state(
+    fetch: Callable[[str, str], Iterable[list]],
+    date_from: str,
+    date_to: str,
+    finance_cfg: dict,
+    compact: bool = False,
+) -> dict:
+    """
+    Накопители за период из дневных агрегатов (marketplace/aggregates.py):
+    из API загружаются только дни, которых ещё нет в finance.aggregates_path
+    (и последние finance.refresh_days дней — WB может их поправить),
+    остальное складывается из сохранённых дней без разбора строк.
+    """
+    from marketplace.aggregates import DEFAULT_REFRESH_DAYS, open_store, period_state
+
+    conn = open_store(finance_cfg["aggregates_path"])
+    try:
+        return period_state(
+            conn, "wb", date_from, date_to, fetch,
+            new_state=new_report_state,
+            fold=get_fold(finance_cfg, compact),
+            day_of=report_tuple_day if compact else report_row_day,
+            refresh_days=finance_cfg.get("refresh_days", DEFAULT_REFRESH_DAYS),
+        )
+    finally:
+        conn.close()
+
+
 # =============================================================
 # TELEGRAM: ФОРМАТИРОВАНИЕ
 # =============================================================
@@ -361,25 +564,11 @@ def format_digest(report: dict, period_label: str) -> str:
 
 def send_telegram(bot_token: str, chat_id: str, text: str) -> bool:
     """
-    Отправляет сообщение в Telegram с Markdown форматированием.
+    Отправляет сообщение с Markdown форматированием через очередь Telegram
+    (marketplace/telegram.py) и ждёт итога доставки.
+    True — Telegram принял сообщение, False — отказ или таймаут.
     """
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    payload = {
-        "chat_id": chat_id,
-        "text": text,
-        "parse_mode": "Markdown",
-        "disable_web_page_preview": True,
-    }
-
-    try:
-        r = requests.post(url, json=payload, timeout=10)
-        if r.status_code != 200:
-            logger.warning(f"[finance] Telegram ответил {r.status_code}: {r.text[:200]}")
-            return False
-        return True
-    except requests.RequestException as e:
-        logger.error(f"[finance] Ошибка отправки в Telegram: {e}")
-        return False
+    return get_outbox().deliver(bot_token, chat_id, text, parse_mode="Markdown")
 
 
 # =============================================================
@@ -407,18 +596,41 @@ def process(config: dict, date_from: str, date_to: str) -> dict:
         logger.error("[finance] WB токен не найден")
         return {}
 
-    rows = fetch_report(token, date_from, date_to)
-    if not rows:
+    finance_cfg = get_finance_config(config)
+
+    # Строки — компактными кортежами REPORT_FIELDS: из всех полей WB
+    # анализу нужны только они
+    def fetch(range_from: str, range_to: str) -> Generator[list[tuple], None, bool]:
+        if finance_cfg.get("store_path"):
+            return iter_synced_pages(token, range_from, range_to, finance_cfg["store_path"], compact=True)
+        return iter_report_pages(token, range_from, range_to, compact=True)
+
+    # Страницы сворачиваются в агрегаты по мере получения —
+    # весь отчёт целиком в памяти не держим
+    if finance_cfg.get("aggregates_path"):
+        state = period_report_state(fetch, date_from, date_to, finance_cfg, compact=True)
+        report = finalize_report(state, finance_cfg) if state["rows"] else {}
+    else:
+        report = analyze_report_stream(fetch(date_from, date_to), finance_cfg, compact=True)
+    if not report:
         logger.warning("[finance] Отчёт пуст или не получен")
         return {}
 
-    finance_cfg = get_finance_config(config)
-    report = analyze_report(rows, finance_cfg)
     report["period"] = {"from": date_from, "to": date_to}
 
     return report
 
 
+def process_month(config: dict, year: int, month: int) -> dict:
+    """
+    Отчёт за календарный месяц. С finance.aggregates_path собирается
+    из дневных агрегатов — строки заново не загружаются.
+    """
+    first = date(year, month, 1)
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return process(config, first.isoformat(), last.isoformat())
+
+
 def send_daily_digest(config: dict) -> bool:
     """
     Формирует и отправляет ежедневный дайджест в Telegram.
@@ -460,6 +672,7 @@ def send_weekly_digest(config: dict) -> bool:
     Берёт данные за прошлую неделю (пн–вс) — именно так WB формирует отчёты.
 
     Вызывать через cron каждый понедельник утром.
+    С finance.aggregates_path неделя складывается из семи дневных агрегатов.
     """
     if not config.get("wb", {}).get("enabled"):
         return False
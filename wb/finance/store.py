@@ -0,0 +1,216 @@
+# =============================================================
+# wb/finance/store.py
+#
+# Локальное хранилище строк отчёта о реализации (SQLite):
+#   ✔ строки хранятся по rrd_id — WB их после публикации не меняет
+#   ✔ помнит покрытый диапазон дат и курсор rrdid последней синхронизации
+#   ✔ каждый запуск докачивает только новые строки
+#   ✔ периоды отдаются с диска страницами — для analyze_report_stream()
+# =============================================================
+
+import logging
+import sqlite3
+from collections.abc import Iterable, Iterator
+from datetime import date, timedelta
+
+from wb.finance.script import PAGE_LIMIT, REPORT_FIELDS, iter_report_pages
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = "wb_finance.db"
+
+# Поля строки отчёта, которые сохраняем (нужны analyze_report) —
+# те же и в том же порядке, что в компактной строке
+ROW_COLUMNS = REPORT_FIELDS
+
+
+# =============================================================
+# СХЕМА
+# =============================================================
+
+def open_store(path: str = DEFAULT_STORE_PATH) -> sqlite3.Connection:
+    """
+    Открывает (и при необходимости создаёт) хранилище.
+    """
+    conn = sqlite3.connect(path)
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS report_rows (
+        rrd_id INTEGER PRIMARY KEY,
+        rr_date TEXT,
+        rr_dt TEXT,
+        nm_id INTEGER,
+        supplier_oper_name TEXT,
+        retail_price REAL,
+        ppvz_for_pay REAL,
+        delivery_rub REAL,
+        storage_fee REAL,
+        penalty REAL,
+        paid_acceptance REAL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_report_rows_date ON report_rows (rr_date, rrd_id)")
+
+    # Состояние синхронизации: covered_from / covered_to / cursor
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sync_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """)
+
+    conn.commit()
+    return conn
+
+
+def get_sync_state(conn: sqlite3.Connection) -> dict:
+    rows = conn.execute("SELECT key, value FROM sync_state").fetchall()
+    state = dict(rows)
+    return {
+        "covered_from": state.get("covered_from"),
+        "covered_to": state.get("covered_to"),
+        "cursor": int(state.get("cursor") or 0),
+    }
+
+
+def _set_sync_state(conn: sqlite3.Connection, **values) -> None:
+    conn.executemany(
+        "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+        [(key, str(value)) for key, value in values.items()],
+    )
+    conn.commit()
+
+
+# =============================================================
+# ЗАПИСЬ
+# =============================================================
+
+def save_rows(conn: sqlite3.Connection, rows: Iterable[tuple]) -> int:
+    """
+    Сохраняет компактные строки отчёта (кортежи ROW_COLUMNS,
+    iter_report_pages(compact=True)); повторные rrd_id перезаписываются.
+    Возвращает максимальный rrd_id среди сохранённых (0 — если строк нет).
+    """
+    max_rrdid = 0
+    records = []
+
+    for row in rows:
+        rrd_id = row[0]
+        if not rrd_id:
+            continue
+        max_rrdid = max(max_rrdid, rrd_id)
+
+        rr_dt = row[1] or ""
+        records.append((rrd_id, rr_dt[:10], *row[1:]))
+
+    conn.executemany(
+        f"INSERT OR REPLACE INTO report_rows (rrd_id, rr_date, {', '.join(ROW_COLUMNS[1:])}) "
+        f"VALUES ({', '.join('?' * (len(ROW_COLUMNS) + 1))})",
+        records,
+    )
+    conn.commit()
+    return max_rrdid
+
+
+def _download(conn: sqlite3.Connection, token: str, date_from: str, date_to: str,
+              rrdid: int = 0) -> tuple[bool, int]:
+    """
+    Качает отчёт за период (начиная после rrdid) и сразу пишет на диск.
+    Возвращает (получен ли отчёт до конца, максимальный rrd_id).
+    """
+    pages = iter_report_pages(token, date_from, date_to, rrdid=rrdid, compact=True)
+    max_rrdid = rrdid
+
+    while True:
+        try:
+            rows = next(pages)
+        except StopIteration as stop:
+            return bool(stop.value), max_rrdid
+
+        max_rrdid = max(max_rrdid, save_rows(conn, rows))
+
+
+# =============================================================
+# СИНХРОНИЗАЦИЯ
+# =============================================================
+
+def sync_report(conn: sqlite3.Connection, token: str, date_from: str, date_to: str) -> bool:
+    """
+    Доводит хранилище до актуального состояния для периода.
+
+    1) уже покрытый диапазон докачивается от сохранённого курсора rrdid —
+       приходят только строки, опубликованные после прошлой синхронизации;
+    2) непокрытые дни (до/после покрытого диапазона) качаются целиком,
+       покрытие остаётся сплошным.
+
+    Возвращает True, если все запросы дошли до конца.
+    """
+    state = get_sync_state(conn)
+    covered_from, covered_to, cursor = state["covered_from"], state["covered_to"], state["cursor"]
+
+    if not covered_from or not covered_to:
+        ok, max_rrdid = _download(conn, token, date_from, date_to)
+        if ok:
+            _set_sync_state(conn, covered_from=date_from, covered_to=date_to, cursor=max_rrdid)
+        return ok
+
+    # 1. Докачка покрытого диапазона от курсора
+    ok, cursor = _download(conn, token, covered_from, covered_to, rrdid=cursor)
+    # Строки идут по возрастанию rrd_id, так что даже частичная докачка
+    # сдвигает курсор корректно
+    _set_sync_state(conn, cursor=cursor)
+
+    # 2. Непокрытые отрезки: слева и справа от покрытия
+    gaps = []
+    if date_from < covered_from:
+        day_before = (date.fromisoformat(covered_from) - timedelta(days=1)).isoformat()
+        gaps.append((date_from, day_before))
+    if date_to > covered_to:
+        day_after = (date.fromisoformat(covered_to) + timedelta(days=1)).isoformat()
+        gaps.append((day_after, date_to))
+
+    for gap_from, gap_to in gaps:
+        gap_ok, gap_max = _download(conn, token, gap_from, gap_to)
+        if not gap_ok:
+            logger.warning(f"[finance:store] Не удалось докачать {gap_from} – {gap_to}")
+            ok = False
+            continue
+
+        covered_from = min(covered_from, gap_from)
+        covered_to = max(covered_to, gap_to)
+        cursor = max(cursor, gap_max)
+        _set_sync_state(conn, covered_from=covered_from, covered_to=covered_to, cursor=cursor)
+
+    return ok
+
+
+# =============================================================
+# ЧТЕНИЕ
+# =============================================================
+
+def iter_stored_pages(conn: sqlite3.Connection, date_from: str, date_to: str,
+                      page_size: int = PAGE_LIMIT, compact: bool = False) -> Iterator[list[dict] | list[tuple]]:
+    """
+    Отдаёт сохранённые строки за период страницами по page_size,
+    в порядке rrd_id — как их отдаёт API.
+    compact=True — кортежами ROW_COLUMNS, как iter_report_pages(compact=True).
+    """
+    columns = ", ".join(ROW_COLUMNS)
+    last_rrdid = 0
+
+    while True:
+        cur = conn.execute(
+            f"SELECT {columns} FROM report_rows "
+            "WHERE rr_date BETWEEN ? AND ? AND rrd_id > ? "
+            "ORDER BY rrd_id LIMIT ?",
+            (date_from, date_to, last_rrdid, page_size),
+        )
+        rows = cur.fetchall() if compact else [dict(zip(ROW_COLUMNS, record)) for record in cur]
+        if not rows:
+            break
+
+        yield rows
+
+        if len(rows) < page_size:
+            break
+        last_rrdid = rows[-1][0] if compact else rows[-1]["rrd_id"]
@@ -0,0 +1,118 @@
+# =============================================================
+# wb/forecast/benchmark.py
+#
+# Прогноз запаса для N SKU: векторный forecast_all()
+# против той же модели Хольта в цикле по SKU.
+#
+# Запуск из корня репозитория:
+#   python -m wb.forecast.benchmark            # 50 000 SKU × 90 дней
+#   python -m wb.forecast.benchmark 10000 60
+# =============================================================
+
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from wb.forecast.engine import (
+    DEFAULT_ALPHA,
+    DEFAULT_BETA,
+    DEFAULT_HORIZON,
+    WARMUP_DAYS,
+    build_units_matrix,
+    days_of_cover,
+    fit_holt,
+    forecast_all,
+)
+
+
+def make_units(n_skus: int, n_days: int, seed: int = 42) -> tuple[dict, dict]:
+    """
+    Синтетические ряды продаж (пуассон с трендом) и остатки.
+    """
+    rng = np.random.default_rng(seed)
+    start = date(2025, 1, 1)
+    days = [(start + timedelta(days=i)).isoformat() for i in range(n_days)]
+
+    base = rng.gamma(1.5, 2.0, n_skus)
+    slope = rng.normal(0, 0.02, n_skus)
+    rates = np.maximum(base[:, None] * (1 + slope[:, None] * np.arange(n_days)), 0)
+    sales = rng.poisson(rates)
+
+    units = {}
+    for sku in range(n_skus):
+        nonzero = np.flatnonzero(sales[sku])
+        units[100000 + sku] = {days[d]: int(sales[sku, d]) for d in nonzero}
+
+    stocks = {sku: int(rng.integers(0, 500)) for sku in units}
+    return units, stocks
+
+
+def forecast_loop(matrix: np.ndarray, stock: np.ndarray) -> list[int]:
+    """
+    Та же модель, но по одному SKU за раз на чистом Python.
+    """
+    result = []
+    for row, qty in zip(matrix.tolist(), stock.tolist()):
+        if qty <= 0:
+            # товара уже нет — ноль дней, как в days_of_cover()
+            result.append(0)
+            continue
+
+        level = sum(row[:WARMUP_DAYS]) / WARMUP_DAYS
+        trend = 0.0
+        for y in row[WARMUP_DAYS:]:
+            new_level = DEFAULT_ALPHA * y + (1 - DEFAULT_ALPHA) * (level + trend)
+            trend = DEFAULT_BETA * (new_level - level) + (1 - DEFAULT_BETA) * trend
+            level = new_level
+
+        total, days = 0.0, DEFAULT_HORIZON
+        for h in range(1, DEFAULT_HORIZON + 1):
+            total += max(level + trend * h, 0.0)
+            if total >= qty:
+                days = h
+                break
+        result.append(days)
+    return result
+
+
+def forecast_vectorized(matrix: np.ndarray, stock: np.ndarray) -> np.ndarray:
+    level, trend, sigma = fit_holt(matrix)
+    days_left, _, _ = days_of_cover(level, trend, sigma, stock)
+    return days_left
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main(n_skus: int, n_days: int) -> None:
+    print(f"Генерация {n_skus} SKU × {n_days} дней...")
+    units, stocks = make_units(n_skus, n_days)
+
+    t_build, (skus, _, matrix) = timed(build_units_matrix, units)
+    stock = np.array([stocks[sku] for sku in skus], dtype=np.float64)
+
+    t_loop, by_loop = timed(forecast_loop, matrix, stock)
+    t_vec, by_vec = timed(forecast_vectorized, matrix, stock)
+    mismatched = int(np.count_nonzero(np.asarray(by_loop) != by_vec))
+    t_all, forecasts = timed(forecast_all, units, stocks)
+
+    print(f"матрица SKU × день:        {t_build:6.2f} с")
+    print(f"модель, цикл по SKU:       {t_loop:6.2f} с")
+    print(f"модель, векторный вызов:   {t_vec:6.2f} с")
+    print(f"ускорение модели:          {t_loop / t_vec:6.1f}x")
+    print(f"forecast_all целиком:      {t_all:6.2f} с  ({len(forecasts)} прогнозов)")
+    print(f"результаты совпадают:      {mismatched == 0}")
+
+    if mismatched:
+        print(f"расхождений цикла и векторного вызова: {mismatched}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [50_000, 90][len(args):]))
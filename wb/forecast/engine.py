@@ -0,0 +1,180 @@
+# 🧠 Что делает этот код
+
+# ✔ строит матрицу продаж SKU × день (в штуках) из аналитики
+# ✔ подгоняет модель Хольта (уровень + тренд) сразу ко всем SKU —
+#   цикл идёт по дням, каждый шаг — операции над массивом всех SKU
+# ✔ считает дни до окончания остатка с доверительным интервалом
+# ✔ 50k SKU за один векторный вызов (см. benchmark.py)
+
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+DEFAULT_ALPHA = 0.3      # сглаживание уровня
+DEFAULT_BETA = 0.1       # сглаживание тренда (0 — простое экспоненциальное сглаживание)
+DEFAULT_HORIZON = 365    # дальше этого срока дни запаса не считаем
+DEFAULT_Z = 1.64         # ~90% доверительный интервал
+WARMUP_DAYS = 7          # дни для начального уровня; их ошибки не учитываем
+CHUNK_SKUS = 4096        # SKU на блок при расчёте дней запаса
+
+
+# -----------------------------
+# МАТРИЦА ПРОДАЖ
+# -----------------------------
+
+def build_units_matrix(units_by_sku_date, date_from=None, date_to=None):
+    """
+    {sku: {"YYYY-MM-DD": штук}} → (skus, days, matrix[SKU × день]).
+
+    Период по умолчанию — от первой до последней даты в данных,
+    дни без продаж заполняются нулями.
+    """
+    all_days = {day for days in units_by_sku_date.values() for day in days}
+    if not all_days:
+        return [], [], np.zeros((0, 0))
+
+    start = date.fromisoformat(date_from or min(all_days))
+    end = date.fromisoformat(date_to or max(all_days))
+    days = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+    day_index = {day: i for i, day in enumerate(days)}
+
+    skus = list(units_by_sku_date)
+    n_days = len(days)
+
+    # плоский индекс ячейки row * n_days + col; дни вне периода → -1
+    cells, values = [], []
+    for row, sku in enumerate(skus):
+        series = units_by_sku_date[sku]
+        offset = row * n_days
+        cells.extend(offset + day_index.get(day, -offset - 1) for day in series)
+        values.extend(series.values())
+
+    cells = np.array(cells, dtype=np.int64)
+    values = np.array(values, dtype=np.float64)
+    inside = cells >= 0
+
+    flat = np.bincount(cells[inside], weights=values[inside], minlength=len(skus) * n_days)
+    return skus, days, flat.reshape(len(skus), n_days)
+
+
+# -----------------------------
+# МОДЕЛЬ
+# -----------------------------
+
+def fit_holt(matrix, alpha=DEFAULT_ALPHA, beta=DEFAULT_BETA):
+    """
+    Модель Хольта для всех строк матрицы сразу.
+
+    Возвращает (level, trend, sigma) — массивы длины «кол-во SKU»:
+    последний уровень, последний тренд и СКО одношаговой ошибки.
+    """
+    n_skus, n_days = matrix.shape
+    warmup = min(WARMUP_DAYS, n_days)
+
+    level = matrix[:, :warmup].mean(axis=1) if warmup else np.zeros(n_skus)
+    trend = np.zeros(n_skus)
+    sq_err = np.zeros(n_skus)
+    n_err = 0
+
+    for t in range(warmup, n_days):
+        y = matrix[:, t]
+        forecast = level + trend
+        sq_err += (y - forecast) ** 2
+        n_err += 1
+
+        new_level = alpha * y + (1 - alpha) * forecast
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        level = new_level
+
+    sigma = np.sqrt(sq_err / n_err) if n_err else matrix.std(axis=1)
+    return level, trend, sigma
+
+
+def days_of_cover(level, trend, sigma, stock, horizon=DEFAULT_HORIZON, z=DEFAULT_Z):
+    """
+    Через сколько дней закончится остаток — по прогнозу и по границам интервала.
+
+    Прогноз на h дней вперёд: level + h * trend (не ниже нуля).
+    Накопленный спрос за h дней ± z * sigma * sqrt(h).
+    Если остатка хватает дольше horizon — возвращается horizon.
+
+    Матрица SKU × horizon считается блоками по CHUNK_SKUS строк,
+    чтобы 50k SKU × 365 дней не требовали гигабайт памяти.
+    """
+    steps = np.arange(1, horizon + 1)
+    sqrt_steps = np.sqrt(steps)
+
+    def first_day(cum, stock_chunk):
+        reached = cum >= stock_chunk[:, None]
+        days = np.where(reached.any(axis=1), reached.argmax(axis=1) + 1, horizon)
+        # товара уже нет — ноль дней
+        return np.where(stock_chunk > 0, days, 0)
+
+    days_left = np.empty(len(level), dtype=np.int64)
+    days_low = np.empty(len(level), dtype=np.int64)
+    days_high = np.empty(len(level), dtype=np.int64)
+
+    for start in range(0, len(level), CHUNK_SKUS):
+        chunk = slice(start, start + CHUNK_SKUS)
+        daily = np.maximum(level[chunk, None] + trend[chunk, None] * steps[None, :], 0.0)
+        cumulative = np.cumsum(daily, axis=1)
+        spread = z * sigma[chunk, None] * sqrt_steps[None, :]
+
+        days_left[chunk] = first_day(cumulative, stock[chunk])
+        # спрос выше ожидаемого — закончится раньше, ниже — позже
+        days_low[chunk] = first_day(cumulative + spread, stock[chunk])
+        days_high[chunk] = first_day(np.maximum(cumulative - spread, 0), stock[chunk])
+
+    return days_left, days_low, days_high
+
+
+# -----------------------------
+# ПУБЛИЧНЫЙ ИНТЕРФЕЙС
+# -----------------------------
+
+def forecast_all(units_by_sku_date, stocks, alpha=DEFAULT_ALPHA, beta=DEFAULT_BETA,
+                 horizon=DEFAULT_HORIZON, z=DEFAULT_Z, date_from=None, date_to=None):
+    """
+    Прогноз запаса для всех SKU одним векторным вызовом.
+
+    units_by_sku_date — analytics["units_by_sku_date"]
+    stocks            — warehouse["stocks"] (SKU → штук)
+
+    Формат элементов — как у forecast_replenishment(), плюс тренд
+    и границы интервала days_left_low / days_left_high.
+    """
+    skus, _, matrix = build_units_matrix(units_by_sku_date, date_from, date_to)
+    if not skus:
+        return []
+
+    level, trend, sigma = fit_holt(matrix, alpha, beta)
+    stock = np.array([stocks.get(sku, 0) for sku in skus], dtype=np.float64)
+
+    # спрос на завтра — он же «среднее в день»
+    avg_per_day = np.maximum(level + trend, 0.0)
+    active = avg_per_day > 0
+
+    days_left, days_low, days_high = days_of_cover(
+        level[active], trend[active], sigma[active], stock[active], horizon, z
+    )
+
+    forecasts = []
+    for i, sku_i in enumerate(np.flatnonzero(active)):
+        forecasts.append({
+            "sku": skus[sku_i],
+            "stock": int(stock[sku_i]),
+            "avg_per_day": round(float(avg_per_day[sku_i]), 2),
+            "trend": round(float(trend[sku_i]), 3),
+            "days_left": int(days_left[i]),
+            "days_left_low": int(days_low[i]),
+            "days_left_high": int(days_high[i]),
+        })
+
+    # сортируем по срочности (меньше дней — первые)
+    forecasts.sort(key=lambda x: x["days_left"])
+    return forecasts
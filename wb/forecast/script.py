@@ -9,6 +9,8 @@
 from datetime import datetime, timedelta
 import logging
 
+from wb.forecast.engine import HAS_NUMPY, forecast_all
+
 
 def forecast_replenishment(sales_analytics, stock_report):
     """
@@ -101,7 +103,12 @@ def process(sales_analytics, stock_report):
     if not sales_analytics or not stock_report:
         return {"forecasts": [], "recommendations": ["Нет данных для прогноза."]}
 
-    forecasts = forecast_replenishment(sales_analytics, stock_report)
+    units = sales_analytics.get("units_by_sku_date")
+    if HAS_NUMPY and units:
+        # ряды продаж по дням есть — модель Хольта сразу для всех SKU
+        forecasts = forecast_all(units, stock_report.get("stocks", {}))
+    else:
+        forecasts = forecast_replenishment(sales_analytics, stock_report)
     return {
         "forecasts": forecasts,
         "recommendations": generate_recommendations(forecasts)
@@ -1,51 +1,128 @@
-from wb.autoanswers.script import process as process_answers
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
 from wb.analytics.script import process as process_analytics
 from wb.warehouse.script import process as process_warehouse
 from wb.forecast.script import process as process_forecast
 from wb.recommendations.script import process as process_recommendations
 from wb.finance.script import process as process_finance
 from wb.finance.script import send_daily_digest
+from wb.client import configure_client
+from wb.utils import load_auto_answers
+from marketplace import metrics
+
+# wb/auto-answers — каталог с дефисом, грузится из файла (wb/utils.py)
+process_answers = load_auto_answers().process
+
+# -----------------------------
+# SCHEDULER
+# -----------------------------
+
+def run_stages(stages, max_workers=None):
+    """
+    Выполняет этапы с учётом зависимостей на пуле потоков.
+
+    stages — {имя: (зависимости, функция, значение при ошибке)}.
+    Функция получает словарь {зависимость: результат}.
+    Этап стартует, как только готовы все его зависимости;
+    независимые этапы идут параллельно.
+
+    Ошибка этапа не валит остальные: вместо результата — значение
+    по умолчанию, текст ошибки — в errors[имя].
+
+    Возвращает (results, errors).
+    """
+    results = {}
+    errors = {}
+    pending = dict(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages)) as pool:
+        while pending or running:
+            for name, (deps, fn, _) in list(pending.items()):
+                if all(dep in results for dep in deps):
+                    inputs = {dep: results[dep] for dep in deps}
+                    running[pool.submit(fn, inputs)] = name
+                    del pending[name]
+
+            if not running:
+                raise ValueError(f"Неизвестные зависимости этапов: {sorted(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logging.exception(f"Stage {name} failed")
+                    results[name] = stages[name][2]
+                    errors[name] = f"{type(e).__name__}: {e}"
+
+    # порядок ключей — как в описании этапов, а не как завершились
+    return {name: results[name] for name in stages}, errors
+
 
 # -----------------------------
 # ORCHESTRATOR
 # -----------------------------
 
-def run_wb_skill(config, date_from=None, date_to=None):
+def run_wb_skill(config, date_from=None, date_to=None, configure_http=True):
     """
     Главная точка входа.
 
-    Порядок:
-    1) автоответы
-    2) аналитика
-    3) склад
-    4) прогноз (использует аналитику + склад)
-    5) рекомендации
-    """
+    Этапы и зависимости:
+    - автоответы, аналитика, склад, финансы — независимы, идут параллельно
+    - прогноз — ждёт аналитику и склад
+    - рекомендации — ждут аналитику
 
-    results = {}
+    Ошибки отдельных этапов собираются в results["_errors"],
+    время и счётчики этапов — в results["_metrics"] (marketplace/metrics.py).
+
+    configure_http=False — не пересоздавать общий HTTP-клиент
+    (его уже настроил вызывающий, например marketplace/accounts.py).
+    """
 
-    # 1. автоответы
-    results["answers"] = process_answers(config)
+    # общий HTTP-клиент WB: свои лимиты/повторы, если заданы в конфиге
+    if configure_http and config.get("wb", {}).get("http"):
+        configure_client(config)
 
-    # 2. аналитика (только если переданы даты)
-    analytics = {}
-    if date_from and date_to:
-        analytics = process_analytics(config, date_from, date_to)
-        results["analytics"] = analytics
-    else:
-        results["analytics"] = {}
+    def analytics(_):
+        # аналитика — только если переданы даты
+        if date_from and date_to:
+            return process_analytics(config, date_from, date_to)
+        return {}
 
-    # 3. склад
-    stock = process_warehouse(config)
-    results["warehouse"] = stock
+    stages = {
+        # 1. автоответы
+        "answers": ((), lambda _: process_answers(config), []),
+        # 2. аналитика
+        "analytics": ((), analytics, {}),
+        # 3. склад
+        "warehouse": ((), lambda _: process_warehouse(config), {}),
+        # 4. прогноз — передаём и аналитику, и склад
+        "forecast": (
+            ("analytics", "warehouse"),
+            lambda deps: process_forecast(deps["analytics"], deps["warehouse"]),
+            {},
+        ),
+        # 5. рекомендации — на основе аналитики
+        "recommendations": (
+            ("analytics",),
+            lambda deps: process_recommendations(deps["analytics"]),
+            [],
+        ),
+        # 6. финансовый анализ
+        "finance": ((), lambda _: process_finance(config, date_from, date_to), {}),
+    }
 
-    # 4. прогноз — передаём и аналитику, и склад
-    results["forecast"] = process_forecast(analytics, stock)
+    run = metrics.RunMetrics("wb", metrics.run_labels(config))
+    stages = {name: (deps, run.wrap(name, fn), default) for name, (deps, fn, default) in stages.items()}
 
-    # 5. рекомендации — на основе аналитики
-    results["recommendations"] = process_recommendations(analytics)
+    results, errors = run_stages(stages)
+    if errors:
+        results["_errors"] = errors
 
-    # 6. финансовый анализ 
-    results["finance"] = process_finance(config, date_from, date_to)
+    results["_metrics"] = run.report()
+    metrics.export(results["_metrics"], config)
 
-    return results
\ No newline at end of file
+    return results
@@ -1,5 +1,43 @@
+import importlib.util
+import sys
+import threading
+from pathlib import Path
+
+# Каталог автоответов называется auto-answers (с дефисом) — обычным
+# import его не загрузить, поэтому модуль грузится из файла один раз
+# и кладётся в sys.modules под этим именем.
+AUTO_ANSWERS_MODULE = "wb_auto_answers_script"
+AUTO_ANSWERS_PATH = Path(__file__).resolve().parent / "auto-answers" / "script.py"
+
+_auto_answers_lock = threading.Lock()
+
+
 def get_wb_token(config):
     try:
         return config["wb"]["WB_API_TOKEN"]["apiKey"]
     except (KeyError, TypeError):
-        return None
\ No newline at end of file
+        return None
+
+
+def load_auto_answers():
+    """
+    Модуль wb/auto-answers/script.py. Загружается при первом вызове,
+    дальше отдаётся тот же объект — клиенты и кэши модуля живут
+    между вызовами.
+    """
+    module = sys.modules.get(AUTO_ANSWERS_MODULE)
+    if module is not None:
+        return module
+
+    with _auto_answers_lock:
+        module = sys.modules.get(AUTO_ANSWERS_MODULE)
+        if module is None:
+            spec = importlib.util.spec_from_file_location(AUTO_ANSWERS_MODULE, AUTO_ANSWERS_PATH)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[AUTO_ANSWERS_MODULE] = module
+            try:
+                spec.loader.exec_module(module)
+            except BaseException:
+                del sys.modules[AUTO_ANSWERS_MODULE]
+                raise
+    return module
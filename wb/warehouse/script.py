@@ -11,6 +11,10 @@ import logging
 from collections import defaultdict
 from datetime import datetime, timedelta
 
+from marketplace import metrics
+from marketplace.jsonstream import iter_response_items
+from wb.client import get_client
+
 
 # -----------------------------
 # CONFIG & TOKENS
@@ -30,16 +34,20 @@ def get_wb_token(config):
 # Лимит: 60 000 строк за запрос — нужна пагинация!
 # -----------------------------
 
-def get_stock_data(token):
+def get_stock_data(token, date_from=None):
     """
     Получаем актуальные остатки по всем складам.
     Пагинация через lastChangeDate последней записи.
+
+    date_from — отдать только строки, изменённые после этой отметки
+    (для дельта-обновления индекса остатков).
     """
     url = "https://statistics-api.wildberries.ru/api/v1/supplier/stocks"
     headers = {"Authorization": token}
 
-    # берём данные с изменениями за последние 90 дней
-    date_from = (datetime.utcnow() - timedelta(days=90)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    if not date_from:
+        # берём данные с изменениями за последние 90 дней
+        date_from = (datetime.utcnow() - timedelta(days=90)).strftime("%Y-%m-%dT%H:%M:%SZ")
 
     all_stocks = []
     current_date_from = date_from
@@ -48,7 +56,7 @@ def get_stock_data(token):
         params = {"dateFrom": current_date_from}
 
         try:
-            r = requests.get(url, headers=headers, params=params, timeout=30)
+            r = get_client().get(url, headers=headers, params=params, timeout=30, stream=True)
         except requests.RequestException as e:
             logging.error(f"Stock API error: {e}")
             break
@@ -58,7 +66,8 @@ def get_stock_data(token):
             break
 
         try:
-            data = r.json()
+            with r:
+                data = list(iter_response_items(r))
         except Exception:
             logging.error("Failed to parse stocks JSON")
             break
@@ -68,6 +77,7 @@ def get_stock_data(token):
             break
 
         all_stocks.extend(data)
+        metrics.record(rows=len(data))
 
         # если меньше 60 000 — это последняя страница
         if len(data) < 60000:
@@ -97,7 +107,13 @@ def analyze_stocks(data):
     stocks = defaultdict(int)       # SKU → суммарный остаток
     low_stock = []
     stale_stock = []
-    seen_stale = set()              # чтобы не дублировать SKU
+    seen_low = set()                # чтобы не дублировать SKU
+    seen_stale = set()
+
+    # отметка «30 дней назад» — одна на весь прогон,
+    # даты lastChangeDate часто повторяются — разбираем каждую один раз
+    stale_before = datetime.utcnow() - timedelta(days=30)
+    stale_cache = {}
 
     for item in data:
         sku = item.get("nmId") or item.get("nmID") or item.get("sku")
@@ -110,18 +126,24 @@ def analyze_stocks(data):
         stocks[sku] += stock
 
         # дефицит (проверяем по каждой записи — один склад может быть пустым)
-        if stock < 5 and sku not in low_stock:
+        if stock < 5 and sku not in seen_low:
             low_stock.append(sku)
+            seen_low.add(sku)
 
         # залежавшийся товар
         if updated and sku not in seen_stale:
-            try:
-                last = datetime.fromisoformat(updated.replace("Z", "+00:00").replace("Z", ""))
-                if datetime.utcnow() - last.replace(tzinfo=None) > timedelta(days=30):
-                    stale_stock.append(sku)
-                    seen_stale.add(sku)
-            except Exception:
-                pass
+            is_stale = stale_cache.get(updated)
+            if is_stale is None:
+                try:
+                    last = datetime.fromisoformat(updated.replace("Z", "+00:00").replace("Z", ""))
+                    is_stale = last.replace(tzinfo=None) < stale_before
+                except Exception:
+                    is_stale = False
+                stale_cache[updated] = is_stale
+
+            if is_stale:
+                stale_stock.append(sku)
+                seen_stale.add(sku)
 
     return {
         "total_skus": len(stocks),
@@ -163,11 +185,29 @@ def process(config):
         logging.warning("WB token not found")
         return {}
 
-    stocks = get_stock_data(token)
-    if not stocks:
-        return {}
+    index_path = config.get("warehouse", {}).get("index_path")
+    if index_path:
+        # персистентный индекс SKU × склад — из API только изменения
+        from wb.warehouse.index import open_index, sync_index, analyze_index
+
+        conn = open_index(index_path)
+        try:
+            index = sync_index(conn, token)
+        finally:
+            conn.close()
+
+        if not index.rows:
+            return {}
+        with metrics.timer("analyze_seconds"):
+            report = analyze_index(index)
+    else:
+        stocks = get_stock_data(token)
+        if not stocks:
+            return {}
+
+        with metrics.timer("analyze_seconds"):
+            report = analyze_stocks(stocks)
 
-    report = analyze_stocks(stocks)
     report["recommendations"] = generate_recommendations(report)
 
     return report
\ No newline at end of file